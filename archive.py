@@ -0,0 +1,229 @@
+# archive.py
+# Quick-Clip Clipboard Popup App
+#
+# Command-line bulk export and import of the clipboard history, streamed so that memory stays
+# bounded however long the history is:
+#   python archive.py export [FILE]   writes NDJSON, one clip per line, newest first (stdout without FILE)
+#   python archive.py import FILE     reads NDJSON, or a copy.json snapshot / legacy list
+# Both take --since / --until (a date or ISO date-time) and --kind filters. Imported clips are
+# deduplicated against the history and each other with the normalized fingerprint clipboard
+# capture uses, and go in front of the history in the file's order. Import refuses to run while
+# Quick-Clip is running (its history service answers), as its next save would drop the imported clips.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, sys, json, argparse
+from datetime import datetime, timedelta
+from clipmeta import KINDS
+
+def parse_time(value, end=False):
+    """Epoch seconds of a YYYY-MM-DD date or ISO date-time; with end=True a bare date means the end of that day."""
+    moment = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        moment += timedelta(days=1, seconds=-1)
+    return moment.timestamp()
+
+def matches(item, since=None, until=None, kinds=None):
+    """Whether a clip passes the date range (epoch seconds) and kind filters."""
+    if kinds and item.get("kind") not in kinds:
+        return False
+    captured = item.get("time")
+    if since is not None and (captured is None or captured < since):
+        return False
+    if until is not None and (captured is None or captured > until):
+        return False
+    return True
+
+def export_record(item):
+    """NDJSON record of a clip: its to_dict(), with the text of a large clip inlined so the file stands alone."""
+    from blobs import item_text
+    data = item.to_dict()
+    if "blob" in data:
+        data["text"] = item_text(item)
+        for key in ("blob", "size", "snippet"):
+            data.pop(key)
+    return data
+
+def export_history(store, out, since=None, until=None, kinds=None):
+    """Write the clips that pass the filters to out as NDJSON, newest first; returns how many."""
+    count = 0
+    for item in store.iter_items():
+        if matches(item, since, until, kinds):
+            out.write(json.dumps(export_record(item), ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+def _format(path, fmt):
+    if fmt == "auto":
+        return "json" if path.lower().endswith(".json") else "ndjson"
+    return fmt
+
+def read_records(path, fmt="auto"):
+    """Yield the clip dicts of an NDJSON file, or of a copy.json snapshot or legacy list (fmt "json")."""
+    if _format(path, fmt) == "json":
+        from store import iter_json_items
+        yield from iter_json_items(path)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{number}: {e}") from None
+
+def count_records(path, fmt="auto"):
+    """Number of records read_records() will yield, counted without decoding NDJSON lines."""
+    if _format(path, fmt) == "json":
+        return sum(1 for _ in read_records(path, fmt))
+    with open(path, 'rb') as f:
+        return sum(1 for line in f if line.strip())
+
+def record_time(data):
+    """Capture time of a record in epoch seconds (legacy records carry a display timestamp), or None."""
+    from history import parse_ts
+    return data["time"] if "time" in data else parse_ts(data.get("ts"))
+
+def import_clip(data, text):
+    """The Clip to import for a record, built from its text like a captured clip."""
+    from blobs import make_item
+    from store import RICH_KEYS
+    item = make_item(text, record_time(data), extras={key: data[key] for key in RICH_KEYS if key in data})
+    if "image" in item:
+        item["kind"] = item["sim"] = None
+        item.derive_meta()
+    for key in ("pinned", "last_paste", "pastes"):
+        if data.get(key):
+            item[key] = data[key]
+    return item
+
+class FingerprintIndex:
+    """
+    Set of dedup fingerprints kept in a temporary SQLite table instead of memory, so that
+    deduplicating an import into a journal history stays bounded however long it is.
+    """
+    def __init__(self, fingerprints=()):
+        import sqlite3, tempfile
+        from settings import IMPORT_BATCH
+        self._dir = tempfile.TemporaryDirectory(prefix="quickclip-import-")
+        self.conn = sqlite3.connect(os.path.join(self._dir.name, "fingerprints.db"))
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE fps (fp BLOB PRIMARY KEY) WITHOUT ROWID")
+        batch = []
+        for fp in fingerprints:
+            batch.append((fp,))
+            if len(batch) >= IMPORT_BATCH:
+                self.conn.executemany("INSERT OR IGNORE INTO fps VALUES (?)", batch)
+                batch = []
+        self.conn.executemany("INSERT OR IGNORE INTO fps VALUES (?)", batch)
+
+    def __contains__(self, fp):
+        return self.conn.execute("SELECT 1 FROM fps WHERE fp = ?", (fp,)).fetchone() is not None
+
+    def add(self, fp):
+        self.conn.execute("INSERT OR IGNORE INTO fps VALUES (?)", (fp,))
+
+    def close(self):
+        self.conn.close()
+        self._dir.cleanup()
+
+def import_history(store, path, fmt="auto", since=None, until=None, kinds=None):
+    """
+    Add the clips of an export or copy.json file to the history, in the file's order (newest
+    first) and in front of the clips already there. Returns counts of imported, duplicate,
+    filtered and invalid (textless) records.
+    """
+    from history import Clip
+    from store import SqliteStore, clip_fingerprint
+    from blobs import item_text, item_fingerprint
+    from clipmeta import detect_kind
+    # One id is set aside per record, so the file's first (newest) clip gets the highest
+    total = count_records(path, fmt)
+    next_id = store.next_id()
+    if isinstance(store, SqliteStore):
+        seen = None  # Stored and already imported clips are found through the fingerprint index
+    else:
+        seen = FingerprintIndex(item_fingerprint(item) for item in store.iter_items())
+    report = {"imported": 0, "duplicates": 0, "filtered": 0, "invalid": 0}
+
+    def clips():
+        for position, data in enumerate(read_records(path, fmt)):
+            text = data.get("text") if isinstance(data, dict) else None
+            if text is None and isinstance(data, dict) and "blob" in data:
+                text = item_text(Clip.from_dict(data)) or None  # Exported without inlining, from this machine
+            if not isinstance(text, str) or not text:
+                report["invalid"] += 1
+                continue
+            # Filter and dedup before building the clip, which writes large ones to the blob store
+            kind = "image" if "image" in data else data.get("kind") or detect_kind(text)
+            if not matches({"kind": kind, "time": record_time(data)}, since, until, kinds):
+                report["filtered"] += 1
+                continue
+            fp = clip_fingerprint(text)
+            if (fp in seen) if seen is not None else store.has_fingerprint(fp):
+                report["duplicates"] += 1
+                continue
+            if seen is not None:
+                seen.add(fp)
+            item = import_clip(data, text)
+            item["id"] = next_id + total - 1 - position
+            yield item
+
+    try:
+        report["imported"] = store.import_stream(clips())
+    finally:
+        if seen is not None:
+            seen.close()
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quick-Clip history export / import (streamed, for histories of any size)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write the history as NDJSON, newest first")
+    export.add_argument("file", nargs="?", default="-", help="output file (default: stdout)")
+    imported = commands.add_parser("import", help="add the clips of an NDJSON export or a copy.json file")
+    imported.add_argument("file")
+    imported.add_argument("--format", choices=("auto", "ndjson", "json"), default="auto",
+                          help='"json" for copy.json snapshots and legacy lists (auto: by the .json extension)')
+    for command in (export, imported):
+        command.add_argument("--since", type=parse_time, help="only clips captured at or after this date / ISO date-time")
+        command.add_argument("--until", type=lambda value: parse_time(value, end=True),
+                             help="only clips captured at or before this date / ISO date-time")
+        command.add_argument("--kind", action="append", choices=KINDS, help="only clips of this kind (repeatable)")
+    args = parser.parse_args(argv)
+    kinds = set(args.kind) if args.kind else None
+
+    if args.command == "import":
+        from settings import SERVICE_ENABLED
+        from service import service_running
+        if SERVICE_ENABLED and service_running():
+            print("Import failed: Quick-Clip is running; quit it first", file=sys.stderr)
+            return 1
+    from store import get_store
+    store = get_store()
+    try:
+        if args.command == "export":
+            if args.file == "-":
+                if hasattr(sys.stdout, "reconfigure"):
+                    sys.stdout.reconfigure(encoding="utf-8")
+                count = export_history(store, sys.stdout, args.since, args.until, kinds)
+            else:
+                with open(args.file, 'w', encoding='utf-8', newline='\n') as out:
+                    count = export_history(store, out, args.since, args.until, kinds)
+            print(f"Exported {count} clips", file=sys.stderr)
+        else:
+            report = import_history(store, args.file, args.format, args.since, args.until, kinds)
+            print(f"Imported {report['imported']} clips ({report['duplicates']} duplicates, {report['filtered']} filtered out, "
+                  f"{report['invalid']} without text skipped)", file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print(f"{args.command.capitalize()} failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if hasattr(store, "close"):
+            store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
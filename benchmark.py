@@ -0,0 +1,255 @@
+# benchmark.py
+# Quick-Clip Clipboard Popup App
+#
+# Headless benchmark suite for the capture, persistence and rendering hot paths.
+# Runs under QT_QPA_PLATFORM=offscreen against synthetic histories (small, large and
+# duplicate-heavy clips, 100 to 100k items) in a temporary directory, writes the timings
+# to JSON and optionally compares them with a stored baseline.
+#
+#   python benchmark.py --sizes 100,1000 --output results.json
+#   python benchmark.py --save-baseline benchmark_baseline.json
+#   python benchmark.py --baseline benchmark_baseline.json --threshold 0.25
+#
+# Exits with status 1 if a benchmark regressed past the threshold or the popup missed
+# POPUP_SHOW_TARGET_MS.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, sys, gc, json, time, random, shutil, tempfile, argparse, platform
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+SIZES = (100, 1000, 10000, 100000)
+PROFILES = ("small", "large", "duplicates")
+WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet",
+         "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango")
+LARGE_EVERY = 100  # One clip in LARGE_EVERY is large in the "large" profile
+LARGE_MAX = 200    # Cap on distinct large clips per history, to bound disk use
+MIN_DELTA_MS = 0.05  # Differences below this are noise, never regressions
+
+def synthetic_text(rng, i, profile):
+    """Text of the i-th synthetic clip for a profile."""
+    words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 30)))
+    if profile == "large" and i % LARGE_EVERY == 0 and i // LARGE_EVERY < LARGE_MAX:
+        import settings
+        line = f"{i} {words}\n"
+        return line * (settings.BLOB_THRESHOLD // len(line) + 2)
+    if profile == "large":
+        return f"{i} {words}\n" * rng.randint(1, 40)
+    return f"{i} {words}"
+
+def synthetic_history(n, profile, seed=0):
+    """Return n synthetic history items, newest first, with timestamps one minute apart."""
+    from blobs import make_item
+    rng = random.Random(seed)
+    start = int(time.time()) - 60 * n
+    items = [make_item(synthetic_text(rng, i, profile), start + 60 * i) for i in range(n)]
+    items.reverse()
+    return items
+
+def incoming_texts(items, profile, count, seed=1):
+    """Clipboard texts for capture ticks: new clips, or mostly reformatted duplicates of history."""
+    from blobs import item_snippet
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        if profile == "duplicates" and items and i % 10:
+            # Same clip with different case/whitespace: caught by the dedup index
+            texts.append("  " + item_snippet(rng.choice(items)).upper() + "\n")
+        else:
+            texts.append(f"new clip {i} " + ' '.join(rng.choice(WORDS) for _ in range(8)))
+    return texts
+
+def summarize(times):
+    times = sorted(times)
+    return {"median_ms": times[len(times) // 2], "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+            "min_ms": times[0], "runs": len(times)}
+
+def measure(fn, runs, setup=None):
+    """Time fn(i) for i in range(runs); setup(i), if given, runs untimed before each call."""
+    times = []
+    for i in range(runs):
+        if setup is not None:
+            setup(i)
+        start = time.perf_counter()
+        fn(i)
+        times.append((time.perf_counter() - start) * 1000)
+    return summarize(times)
+
+def configure(workdir):
+    """Point all persistent state at workdir and turn off behaviour that would skew timings."""
+    import settings, config
+    settings.COPY_FILE = os.path.join(workdir, 'copy.json')
+    settings.COPY_JOURNAL_FILE = os.path.join(workdir, 'copy.journal')
+    settings.HISTORY_DB_FILE = os.path.join(workdir, 'copy.db')
+    settings.BLOB_DIR = os.path.join(workdir, 'blobs')
+    settings.CONFIG_PATH = os.path.join(workdir, 'config.json')
+    settings.IMAGE_DIR = os.path.join(workdir, 'images')
+    settings.TRACE_FILE = os.path.join(workdir, 'trace.jsonl')
+    settings.HISTORY_BACKEND = "journal"
+    settings.PASTE_BACKEND = "fake"
+    # Synthetic histories go up to 100k clips; retention would evict them during the run
+    settings.RETENTION_MAX_ITEMS = settings.RETENTION_MAX_BYTES = settings.RETENTION_MAX_AGE_DAYS = None
+    config._config = None  # Created again on first use, from the redirected CONFIG_PATH
+
+def drain(app):
+    """Process pending events, including deleteLater() deletions, which processEvents() leaves queued."""
+    from PySide6.QtCore import QCoreApplication, QEvent
+    app.processEvents()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+def settle(app, listener):
+    """Finish the listener's background work (search index build, retention, popup pre-build, writes)."""
+    listener.search_index.build_step(None)
+    if listener.clusters is not None:
+        listener.clusters.build_step(None)
+    listener._create_popup()
+    while listener.retention.running:
+        app.processEvents()
+        time.sleep(0.001)
+    drain(app)
+    listener.store.flush()
+
+def run_case(app, workdir, n, profile, runs):
+    """Benchmark one synthetic history; returns {benchmark name: summary}."""
+    import settings, store
+    from text import HotkeyListener, DedupIndex, update_clipboard_item
+    from preview import PopupWindow
+    from blobs import item_text
+    casedir = os.path.join(workdir, f"{profile}-{n}")
+    os.makedirs(casedir)
+    settings.COPY_FILE = os.path.join(casedir, 'copy.json')
+    settings.COPY_JOURNAL_FILE = os.path.join(casedir, 'copy.journal')
+    settings.BLOB_DIR = os.path.join(casedir, 'blobs')
+    store._store = None
+    results = {}
+    items = synthetic_history(n, profile)
+
+    results["save_copies"] = measure(lambda i: settings.save_copies(items), max(3, runs // 5))
+    def load(i):
+        store._store = None
+        settings.load_copies()
+    results["load_copies"] = measure(load, max(3, runs // 5))
+    def load_indexed(i):
+        # What startup waits for: the history plus its dedup index (fingerprints are stored, not rehashed)
+        store._store = None
+        loaded = store.get_store()
+        loaded.load()
+        DedupIndex(fingerprints=loaded.fingerprints())
+    results["load_and_index"] = measure(load_indexed, max(3, runs // 5))
+
+    store._store = None
+    listener = HotkeyListener(hotkeys=False)
+    settle(app, listener)
+    texts = iter(incoming_texts(listener.items, profile, runs * 10))
+    results["check_clipboard"] = measure(lambda i: listener.check_clipboard(next(texts)), runs * 10)
+
+    built = []
+    def build(i):
+        built.append(PopupWindow(listener.items, theme="light", dedup=listener.dedup, store=listener.store,
+                                 search_index=listener.search_index))
+    def discard(i):
+        while built:
+            built.pop().deleteLater()
+        drain(app)
+    results["popup_init"] = measure(build, max(3, runs // 5), setup=discard)
+    discard(0)
+    settle(app, listener)
+    popup = listener.popup
+    def hide(i):
+        popup.hide()
+        app.processEvents()
+    results["show_at_cursor"] = measure(lambda i: popup.show_at_cursor(), runs, setup=hide)
+    targets = [listener.items[(i * 7919) % len(listener.items)]["id"] for i in range(runs)]
+    results["show_preview"] = measure(lambda i: popup.show_preview(targets[i]), runs)
+    results["show_edit_page"] = measure(lambda i: popup.show_edit_page(), runs)
+    # Saving without changes writes nothing and just goes back to the preview
+    results["save_edit_unchanged"] = measure(lambda i: popup.save_edit(), runs, setup=lambda i: popup.show_edit_page())
+    pastes = popup.paster.backend.pastes
+    def paste(i):
+        count = len(pastes)
+        popup.paste_content(targets[i])
+        while len(pastes) == count:
+            app.processEvents()
+    results["paste_content"] = measure(paste, runs)
+    middle = listener.items[len(listener.items) // 2]
+    current = [item_text(middle)]
+    def edit(i):
+        new_text = current[0] + " (edited)" if i % 2 == 0 else current[0][:-len(" (edited)")]
+        update_clipboard_item(listener.items, middle["id"], new_text, listener.dedup, listener.store, listener.search_index,
+                              listener.clusters)
+        current[0] = new_text
+    results["update_clipboard_item"] = measure(edit, runs)
+
+    popup.hide()
+    settle(app, listener)
+    listener.close()
+    popup.deleteLater()
+    drain(app)
+    # Collect the listener's reference cycles here, not whenever a background thread triggers the GC
+    listener = popup = None
+    gc.collect()
+    return results
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages (median slower than baseline by more than threshold)."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        ratio = current["median_ms"] / previous["median_ms"] if previous["median_ms"] else float('inf')
+        if ratio > 1 + threshold and current["median_ms"] - previous["median_ms"] > MIN_DELTA_MS:
+            regressions.append(f"{key}: {previous['median_ms']:.3f} ms -> {current['median_ms']:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quick-Clip headless benchmarks")
+    parser.add_argument("--sizes", default=','.join(map(str, SIZES)), help="comma-separated history sizes")
+    parser.add_argument("--profiles", default=','.join(PROFILES), help="comma-separated history profiles")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per benchmark")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    workdir = tempfile.mkdtemp(prefix="quickclip-bench-")
+    configure(workdir)
+    import settings
+    results = {}
+    try:
+        for profile in args.profiles.split(','):
+            for n in map(int, args.sizes.split(',')):
+                for name, summary in run_case(app, workdir, n, profile, args.runs).items():
+                    key = f"{profile}/{n}/{name}"
+                    results[key] = summary
+                    print(f"{key:<40} median {summary['median_ms']:9.3f} ms   p95 {summary['p95_ms']:9.3f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    from PySide6 import __version__ as pyside_version
+    report = {"meta": {"python": platform.python_version(), "pyside6": pyside_version, "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": args.runs},
+              "results": results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    failures = [f"{key}: p95 {summary['p95_ms']:.1f} ms exceeds POPUP_SHOW_TARGET_MS ({settings.POPUP_SHOW_TARGET_MS} ms)"
+                for key, summary in results.items()
+                if key.endswith("/show_at_cursor") and summary["p95_ms"] > settings.POPUP_SHOW_TARGET_MS]
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += compare(results, json.load(f)["results"], args.threshold)
+    for failure in failures:
+        print("FAIL " + failure)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# blobs.py
+# Quick-Clip Clipboard Popup App
+#
+# Content-addressed storage for large clips. Clips longer than BLOB_THRESHOLD characters are
+# written once to blobs/<hash> and the history only keeps the hash, size, fingerprint and a
+# precomputed snippet; the full text is loaded lazily when the clip is previewed, edited or pasted.
+# Setting a clip's text also computes its fingerprint and metadata (clipmeta.py) from the full text.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, hashlib, time
+import settings
+from store import clip_fingerprint, CONTENT_KEYS
+from history import Clip
+from clipmeta import clip_meta, is_file_list
+
+BLOB_PREFIX = "blob:"
+
+def text_digest(text):
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+def blob_path(digest):
+    return os.path.join(settings.BLOB_DIR, digest[:2], digest)
+
+def put_blob(text):
+    """Store text under its content hash (once) and return the hash."""
+    digest = text_digest(text)
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', errors='surrogatepass', newline='') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    return digest
+
+def get_blob(digest):
+    """Load the text stored under digest ("" if the blob is missing)."""
+    try:
+        with open(blob_path(digest), 'r', encoding='utf-8', errors='surrogatepass', newline='') as f:
+            return f.read()
+    except OSError:
+        return ""
+
+def delete_blob(digest):
+    try:
+        os.remove(blob_path(digest))
+        return True
+    except OSError:
+        return False
+
+def is_large(text):
+    return len(text) > settings.BLOB_THRESHOLD
+
+def item_key(item):
+    return BLOB_PREFIX + item["blob"] if "blob" in item else item["text"]
+
+def item_text(item):
+    """Full text of an item, loading it from the blob store if needed."""
+    return get_blob(item["blob"]) if "blob" in item else item["text"]
+
+def item_snippet(item):
+    """Leading text of an item without touching the blob store."""
+    return item["snippet"] if "blob" in item else item["text"]
+
+def item_fingerprint(item):
+    """Dedup fingerprint of an item without touching the blob store."""
+    if isinstance(item, Clip):
+        return item.fingerprint
+    return bytes.fromhex(item["fp"]) if "fp" in item else clip_fingerprint(item["text"])
+
+def set_item_text(item, text):
+    """Set an item's content, moving it into or out of the blob store as needed, and its fingerprint and metadata."""
+    for key in CONTENT_KEYS:
+        item.pop(key, None)
+    if is_large(text):
+        item["blob"] = put_blob(text)
+        item["size"] = len(text)
+        item["snippet"] = text[:settings.BLOB_SNIPPET_CHARS]
+    else:
+        item["text"] = text
+    item["fp"] = clip_fingerprint(text).hex()
+    item.update(clip_meta(text))
+    return item
+
+def make_item(text, created=None, extras=None):
+    """Build the Clip for a newly captured text (created: epoch seconds, default now); extras (html, uris) are kept for small clips."""
+    item = set_item_text(Clip(time=int(time.time()) if created is None else int(created)), text)
+    if extras and is_file_list(extras.get("uris")):
+        item["kind"] = "path"  # Local paths may contain spaces, which detect_kind() does not accept
+    if extras and "blob" not in item:
+        item.update(extras)
+    return item
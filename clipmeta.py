@@ -0,0 +1,89 @@
+# clipmeta.py
+# Quick-Clip Clipboard Popup App
+#
+# Metadata computed once per clip, when it is captured or edited: a one-line display label,
+# byte and line counts, a detected kind (url, json, code, path, plain, or image for image
+# clips) and the SimHash used to find near duplicates (neardup.py). It is stored on the Clip and persisted with it, so rendering the list, filtering by
+# kind and retention only ever read these few fields, never the full text.
+#
+# Author: Tof-O
+# License: MIT
+
+import re, json
+from settings import CLIP_LABEL_CHARS, KIND_SCAN_CHARS, KIND_JSON_MAX_CHARS
+from neardup import simhash
+
+KINDS = ("url", "json", "code", "path", "plain", "image")
+
+_FIRST_CHAR = re.compile(r"\S")
+_URL = re.compile(r"(?:[a-z][a-z0-9+.-]*://|www\.|mailto:)\S+\Z", re.I)
+# Windows drive or UNC paths may contain spaces; POSIX-style and file:// ones are a single token
+_PATH = re.compile(r"(?:[a-z]:[\\/]|\\\\\w)[^<>\"|?*]*\Z|(?:~|\.{1,2})?/\S*\Z|file://\S+\Z", re.I)
+_CODE_LINE = re.compile(r"^\s*(?:def |class |import |from \S+ import |function\b|const |let |var |return\b|"
+                        r"(?:if|for|while|switch)\s*\(|#include|#define|public |private |package |using |fn |func )"
+                        r"|[;{}]\s*$|=>|\)\s*:\s*$")
+
+def clip_label(text):
+    """Leading text with whitespace runs (newlines included) collapsed, at most CLIP_LABEL_CHARS long."""
+    first = _FIRST_CHAR.search(text)
+    if first is None:
+        return ""
+    return " ".join(text[first.start():first.start() + 2 * CLIP_LABEL_CHARS].split())[:CLIP_LABEL_CHARS]
+
+def detect_kind(text):
+    """Best guess at what a clip is: "url", "json", "code", "path" or "plain"."""
+    head = text[:KIND_SCAN_CHARS].strip()
+    if not head:
+        return "plain"
+    lines = head.splitlines()
+    if len(lines) == 1:
+        if _URL.match(head):
+            return "url"
+        if _PATH.match(head):
+            return "path"
+    if head[0] in "{[" and text.rstrip()[-1:] in "}]":
+        if len(text) > KIND_JSON_MAX_CHARS:
+            return "json"
+        try:
+            json.loads(text)
+            return "json"
+        except ValueError:
+            pass
+    if len(lines) > 1:
+        if all(_PATH.match(line.strip()) for line in lines if line.strip()):
+            return "path"  # A file list
+        marked = sum(1 for line in lines if _CODE_LINE.search(line))
+        if marked >= max(2, len(lines) // 5):
+            return "code"
+    return "plain"
+
+def is_file_list(uris):
+    """Whether a copied URI list names local files only (its clip is a "path", whatever the paths look like)."""
+    return bool(uris) and all(uri[:5].lower() == "file:" for uri in uris)
+
+def clip_meta(text):
+    """
+    Capture-time metadata of a clip's full text: label, bytes, lines, kind and sim. The label is None
+    when it would just repeat the leading text (most single-line clips), which then stands in for it.
+    """
+    label = clip_label(text)
+    return {"label": None if label == text[:CLIP_LABEL_CHARS] else label, "bytes": len(text.encode('utf-8', 'surrogatepass')),
+            "lines": text.count('\n') + 1 if text else 0, "kind": detect_kind(text), "sim": simhash(text)}
+
+def format_bytes(count):
+    """Human-readable byte count ("812 B", "3.4 KB", "6.1 MB")."""
+    if count < 1024:
+        return f"{count} B"
+    if count < 1024 * 1024:
+        return f"{count / 1024:.1f} KB"
+    return f"{count / 1024 / 1024:.1f} MB"
+
+def clip_detail(item):
+    """Second line of a history row: kind, line count and size, from the stored metadata only."""
+    parts = [item.get("kind") or "plain"]
+    lines = item.get("lines")
+    if lines and lines > 1:
+        parts.append(f"{lines:,} lines")
+    if item.get("bytes") is not None:
+        parts.append(format_bytes(item["bytes"]))
+    return " · ".join(parts)
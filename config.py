@@ -0,0 +1,109 @@
+# config.py
+# Quick-Clip Clipboard Popup App
+#
+# In-memory configuration service. The config file is read once at startup and then watched
+# with QFileSystemWatcher, so external edits are picked up without re-reading it on every popup.
+# Stylesheets for each theme in settings.THEME_COLORS are built once and cached, so switching
+# theme or opening the popup is a dictionary lookup.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, json
+from PySide6.QtCore import QObject, QFileSystemWatcher, Signal
+import settings
+from settings import DEFAULT_THEME, THEME_COLORS
+
+def build_stylesheet(theme):
+    """Stylesheet for the popup window in the given theme."""
+    colors = THEME_COLORS[theme]
+    return f"""
+            QMainWindow {{ background: {colors['bg']}; border-radius: 12px; border: 5px solid {colors['border']} !important; }}
+            QWidget {{ background: {colors['bg']}; border-radius: 12px; border: none !important; }}
+            QLabel {{ color: {colors['label']}; }}
+            QPushButton {{ background: {colors['btn_bg']}; color: {colors['btn_fg']}; border-radius: 8px; }}
+            QPushButton:hover {{ background: {colors['btn_hover']}; }}
+            QLineEdit {{ background: {colors['btn_bg']}; color: {colors['btn_fg']}; border-radius: 8px; padding: 4px 8px; }}
+            QPlainTextEdit {{ color: {colors['label']}; }}
+        """
+
+def build_editor_stylesheets(theme):
+    """Stylesheets for the edit page's text box and title label in the given theme."""
+    colors = THEME_COLORS[theme]
+    return (f"background: {colors['bg']}; color: {colors['label']}; padding: 10px;",
+            f"font-size:18px; color: {colors['label']};")
+
+class ConfigService(QObject):
+    """
+    Holds the user configuration ({"theme": ...}) in memory.
+    set() writes through to path (settings.CONFIG_PATH by default); changes made to the file by other programs are
+    reloaded by the watcher. theme_changed is emitted whenever the effective theme changes.
+    """
+    theme_changed = Signal(str)
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.path = path or settings.CONFIG_PATH
+        self.data = self._read()
+        self._stylesheets = {}
+        self._editor_stylesheets = {}
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._on_file_changed)
+        self._watch()
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+    def _watch(self):
+        if os.path.exists(self.path) and self.path not in self.watcher.files():
+            self.watcher.addPath(self.path)
+    def _on_file_changed(self, path):
+        # Editors often replace the file, which drops it from the watcher
+        self._watch()
+        old_theme = self.theme
+        self.data = self._read()
+        if self.theme != old_theme:
+            self.theme_changed.emit(self.theme)
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+    def set(self, key, value):
+        """Set a config value and save the config file."""
+        old_theme = self.theme
+        self.data[key] = value
+        try:
+            with open(self.path, "w") as f:
+                json.dump(self.data, f)
+        except Exception:
+            pass
+        self._watch()
+        if self.theme != old_theme:
+            self.theme_changed.emit(self.theme)
+    @property
+    def theme(self):
+        theme = self.data.get("theme", DEFAULT_THEME)
+        return theme if theme in THEME_COLORS else DEFAULT_THEME
+    def set_theme(self, theme):
+        self.set("theme", theme)
+    def stylesheet(self, theme=None):
+        """Cached popup stylesheet for theme (the current theme by default)."""
+        theme = theme or self.theme
+        if theme not in self._stylesheets:
+            self._stylesheets[theme] = build_stylesheet(theme)
+        return self._stylesheets[theme]
+    def editor_stylesheets(self, theme=None):
+        """Cached (text box, label) stylesheets of the edit page for theme."""
+        theme = theme or self.theme
+        if theme not in self._editor_stylesheets:
+            self._editor_stylesheets[theme] = build_editor_stylesheets(theme)
+        return self._editor_stylesheets[theme]
+
+_config = None
+
+def get_config():
+    """Return the shared config service for this process."""
+    global _config
+    if _config is None:
+        _config = ConfigService()
+    return _config
@@ -4,7 +4,10 @@
 # This file defines the EditPage widget, which provides a user interface for editing clipboard items.
 # Features:
 # - Top bar with back, label, and save buttons
-# - Text editor for modifying clipboard content
+# - Plain-text editor for modifying clipboard content; large clips are shown without line
+#   wrapping so only the visible lines are laid out
+# - Line count / size indicator
+# - Saving writes only the edited clip, and nothing at all if the text is unchanged
 # - Cancel functionality
 # - Dynamic theme support (light/dark)
 # - Integration with clipboard history
@@ -12,25 +15,42 @@
 # Author: Tof-O
 # License: MIT
 
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTextEdit
-from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QPlainTextEdit
+from PySide6.QtCore import Qt, QTimer
+from settings import EDIT_NO_WRAP_CHARS, EDIT_INDICATOR_DELAY_MS
 from text import update_clipboard_item
 
+def format_size(chars):
+    """Human-readable character count ("812 chars", "1.4 K chars", "6.1 M chars")."""
+    if chars < 1000:
+        return f"{chars} char{'s' if chars != 1 else ''}"
+    if chars < 1000 * 1000:
+        return f"{chars / 1000:.1f} K chars"
+    return f"{chars / 1000 / 1000:.1f} M chars"
+
 class EditPage(QWidget):
     """
     Widget for editing a clipboard entry.
     Allows users to modify, save, or cancel changes to clipboard text.
-    Applies current theme and updates clipboard history.
+    Applies current theme and updates the clip with id clip_id in the clipboard history;
+    on_show_preview is called with that id to return to the preview, on_saved (if given) after
+    each save that changed the clip.
     """
-    def __init__(self, original_text, items, preview_text, on_show_preview, theme='light'):
+    def __init__(self, original_text, items, clip_id, on_show_preview, theme='light', dedup=None, store=None, search_index=None, clusters=None, on_saved=None):
         super().__init__()
         self.original_text = original_text
         self.items = items
-        self.preview_text = preview_text
+        self.dedup = dedup
+        self.store = store
+        self.search_index = search_index
+        self.clusters = clusters
+        self.clip_id = clip_id
         self.on_show_preview = on_show_preview
+        self.on_saved = on_saved
         self.theme = theme
         self._init_ui()
         self.apply_theme()
+        self.set_clip(clip_id, original_text)
 
     def _init_ui(self):
         layout = QVBoxLayout(self)
@@ -50,12 +70,21 @@ class EditPage(QWidget):
         save_btn.clicked.connect(self._save_edit)
         top_bar.addWidget(save_btn, alignment=Qt.AlignRight)
         layout.addLayout(top_bar)
-        self.text_edit = QTextEdit()
-        self.text_edit.setText(self.original_text)
+        # QPlainTextEdit lays out lines lazily, unlike QTextEdit, so multi-megabyte clips open quickly
+        self.text_edit = QPlainTextEdit()
         self.text_edit.setStyleSheet("padding: 10px;")
         layout.addWidget(self.text_edit)
-        # Cancel button at the bottom, slightly above border
+        # Indicator is refreshed shortly after typing stops, not on every keystroke
+        self._indicator_timer = QTimer(self)
+        self._indicator_timer.setSingleShot(True)
+        self._indicator_timer.setInterval(EDIT_INDICATOR_DELAY_MS)
+        self._indicator_timer.timeout.connect(self._update_indicator)
+        self.text_edit.textChanged.connect(self._indicator_timer.start)
+        # Line/size indicator and cancel button at the bottom, slightly above border
         cancel_row = QHBoxLayout()
+        self.indicator = QLabel()
+        self.indicator.setStyleSheet("margin-bottom:16px;")
+        cancel_row.addWidget(self.indicator, alignment=Qt.AlignLeft)
         cancel_row.addStretch(1)
         cancel_btn = QPushButton("Cancel")
         cancel_btn.setFixedSize(80, 32)
@@ -64,29 +93,62 @@ class EditPage(QWidget):
         cancel_row.addWidget(cancel_btn, alignment=Qt.AlignRight)
         layout.addLayout(cancel_row)
 
+    def set_clip(self, clip_id, text):
+        """Load a clip into the editor, reusing the existing widgets; long clips are not wrapped."""
+        self.clip_id = clip_id
+        self.original_text = text or ""
+        wrap = QPlainTextEdit.NoWrap if len(self.original_text) > EDIT_NO_WRAP_CHARS else QPlainTextEdit.WidgetWidth
+        self.text_edit.setLineWrapMode(wrap)
+        self.text_edit.setPlainText(self.original_text)
+        self.text_edit.document().setModified(False)
+        self._indicator_timer.stop()
+        self._update_indicator()
+
+    def _update_indicator(self):
+        doc = self.text_edit.document()
+        lines = doc.blockCount()
+        chars = max(doc.characterCount() - 1, 0)  # characterCount() includes the final paragraph separator
+        self.indicator.setText(f"{lines:,} line{'s' if lines != 1 else ''} · {format_size(chars)}")
+
+    def save(self):
+        """
+        Write the edited text through to the clip and the history store. Returns False without
+        touching the history or the store if nothing changed since the clip was loaded.
+        """
+        if not self.text_edit.document().isModified():
+            return False
+        new_text = self.text_edit.toPlainText()
+        if new_text == self.original_text:
+            return False
+        update_clipboard_item(self.items, self.clip_id, new_text, self.dedup, self.store, self.search_index, self.clusters)
+        self.original_text = new_text
+        self.text_edit.document().setModified(False)
+        if self.on_saved is not None:
+            self.on_saved(self.clip_id)
+        return True
+
     def _save_edit(self):
         """Save the edited text to the clipboard history and return to preview."""
-        new_text = self.text_edit.toPlainText()
-        update_clipboard_item(self.items, self.preview_text, new_text)
-        self.preview_text = new_text
-        self.on_show_preview(new_text)
+        self.save()
+        self.on_show_preview(self.clip_id)
 
     def _on_cancel(self):
         """Cancel editing and return to preview."""
-        self.on_show_preview(self.preview_text)
+        self.on_show_preview(self.clip_id)
 
     def _on_back(self):
         """Go back to preview without saving changes."""
-        self.on_show_preview(self.preview_text)
+        self.on_show_preview(self.clip_id)
 
     def apply_theme(self):
         """Apply the current theme to the editor UI."""
-        bg_color = "#232629" if self.theme == "dark" else "#fff"
-        text_color = "#f0f0f0" if self.theme == "dark" else "#222"
-        self.text_edit.setStyleSheet(f"background: {bg_color}; color: {text_color}; padding: 10px;")
-        self.label.setStyleSheet(f"font-size:18px; color: {text_color};")
+        from config import get_config
+        text_style, label_style = get_config().editor_stylesheets(self.theme)
+        self.text_edit.setStyleSheet(text_style)
+        self.label.setStyleSheet(label_style)
 
     def set_theme(self, theme):
         """Set and apply a new theme."""
-        self.theme = theme
-        self.apply_theme()
+        if theme != self.theme:
+            self.theme = theme
+            self.apply_theme()
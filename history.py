@@ -0,0 +1,344 @@
+# history.py
+# Quick-Clip Clipboard Popup App
+#
+# The in-memory clipboard history: compact Clip records ordered newest first and indexed by a
+# stable id assigned at capture time. Lookup, move-to-front and delete by id are O(1) (amortized); row access
+# for the list view goes through a cached row list that new clips extend in place and that is
+# only rebuilt after a delete or reorder. Each clip carries the metadata computed at capture
+# (clipmeta.py), which the list view reads instead of the text, and the id of the near-duplicate
+# cluster it joined, if any (neardup.py).
+#
+# Author: Tof-O
+# License: MIT
+
+import functools
+from datetime import datetime
+from clipmeta import clip_meta, is_file_list, KINDS
+from neardup import simhash
+from settings import CLIP_LABEL_CHARS
+
+_MISSING = object()
+_KIND_NAMES = {kind: kind for kind in KINDS}
+# Fields stored in slots; "fp" (the fingerprint, as hex) and "ts" (display timestamp) are derived
+META_SLOTS = ("label", "bytes", "lines", "kind", "sim")  # Capture-time metadata, see clipmeta.py
+SLOT_KEYS = ("id", "text", "blob", "size", "snippet", "time", "pinned", "last_paste", "pastes", "cluster") + META_SLOTS
+CONTENT_SLOTS = ("id", "text", "blob", "size", "snippet") + META_SLOTS  # Serialized in this order, then fp and time
+PLAIN_KEYS = frozenset(("id", "blob", "snippet", "time", "pinned", "last_paste", "pastes", "cluster") + META_SLOTS)  # Slots with no derived state
+DICT_KEYS = frozenset(SLOT_KEYS + ("fp", "ts"))  # Anything else in an item dict is a rich-clip field
+
+def _clip_fingerprint(text):
+    # store imports this module, so its fingerprint function is bound on first use
+    global _clip_fingerprint
+    from store import clip_fingerprint as _clip_fingerprint
+    return _clip_fingerprint(text)
+
+@functools.lru_cache(maxsize=4096)
+def format_ts(epoch):
+    """Display timestamp of an epoch time ("" for None)."""
+    from store import TS_FORMAT
+    return "" if epoch is None else datetime.fromtimestamp(epoch).strftime(TS_FORMAT)
+
+@functools.lru_cache(maxsize=4096)
+def parse_ts(ts):
+    """Epoch seconds of a legacy display timestamp, or None if it can't be parsed."""
+    from store import TS_FORMAT
+    try:
+        return int(datetime.strptime(ts, TS_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+class Clip:
+    """
+    Compact history record: fields live in __slots__ rather than a per-clip dict, the capture
+    time is an integer epoch ("time") and the display timestamp ("ts") is only formatted when
+    asked for (i.e. when a row is painted). The length in characters and the dedup fingerprint
+    are kept alongside; the fields of rich clips (html, uris, image, ...) go in a small dict.
+    label, bytes, lines, kind and sim (the SimHash) are filled in at capture; clips saved before
+    they existed get them on load (large ones from their snippet, with unknown byte and line
+    counts). cluster is the id of the near-duplicate cluster the clip joined, if any; pastes counts
+    the times the clip was pasted.
+    Clips support the dict-style access used for history items (clip["text"], clip.get("pinned"),
+    "blob" in clip, pop, update) and serialize with to_dict(); a Clip built from a legacy item
+    with a "ts" string converts it to an epoch.
+    """
+    __slots__ = SLOT_KEYS + ("length", "_fingerprint", "rich")
+
+    def __init__(self, fields=(), fingerprint=None, **kwargs):
+        self.id = self.text = self.blob = self.size = self.snippet = self.time = None
+        self.pinned = self.last_paste = self.pastes = self.length = self.rich = self.cluster = None
+        self.label = self.bytes = self.lines = self.kind = self.sim = None
+        self._fingerprint = None
+        if fields:
+            self.update(fields)
+        if kwargs:
+            self.update(kwargs)
+        if fingerprint is not None:
+            self._fingerprint = fingerprint
+        if self.kind is None or self.sim is None:
+            if self.text is not None or self.snippet is not None:
+                self.derive_meta()
+
+    @property
+    def fingerprint(self):
+        """Dedup fingerprint, computed once from the text (blob clips carry theirs)."""
+        if self._fingerprint is None and self.text is not None:
+            self._fingerprint = _clip_fingerprint(self.text)
+        return self._fingerprint
+
+    def derive_meta(self):
+        """Fill in missing metadata from the text (or, for large clips, the snippet: counts stay unknown)."""
+        source = self.text if self.text is not None else self.snippet or ""
+        if self.kind is not None:
+            meta = {"sim": simhash(source)}  # Saved before near-duplicate detection existed
+        else:
+            meta = clip_meta(source)
+            if self.text is None:
+                meta["bytes"] = meta["lines"] = None
+        if self.rich is not None and "image" in self.rich:
+            meta["kind"] = "image"
+            meta["sim"] = 0  # The text of an image clip says nothing about the image
+        elif self.rich is not None and is_file_list(self.rich.get("uris")):
+            meta["kind"] = "path"
+        for key, value in meta.items():
+            if getattr(self, key) is None:
+                setattr(self, key, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a Clip from a to_dict() or legacy item dict (the fast path used when loading)."""
+        clip = cls.__new__(cls)
+        get = data.get
+        clip.id = get("id")
+        clip.text = text = get("text")
+        clip.blob = get("blob")
+        clip.size = size = get("size")
+        clip.snippet = get("snippet")
+        clip.pinned = get("pinned")
+        clip.last_paste = get("last_paste")
+        clip.pastes = get("pastes")
+        clip.cluster = get("cluster")
+        clip.length = size if text is None else len(text)
+        fp = get("fp")
+        clip._fingerprint = bytes.fromhex(fp) if fp else None
+        clip.time = get("time") if "time" in data else parse_ts(get("ts"))
+        clip.rich = None if data.keys() <= DICT_KEYS else {key: data[key] for key in data.keys() - DICT_KEYS}
+        clip.label = get("label")
+        clip.bytes = get("bytes")
+        clip.lines = get("lines")
+        kind = get("kind")
+        # Share one string per kind rather than one per clip from the JSON decoder
+        clip.kind = _KIND_NAMES.get(kind, kind)
+        clip.sim = get("sim")
+        if kind is None or clip.sim is None:
+            clip.derive_meta()
+        return clip
+
+    def get(self, key, default=None):
+        if key == "ts":
+            return format_ts(self.time)
+        if key == "label" and self.label is None:
+            # No stored label: it is the leading text (or snippet)
+            source = self.text if self.text is not None else self.snippet
+            return default if source is None else source[:CLIP_LABEL_CHARS]
+        if key == "fp":
+            fingerprint = self.fingerprint
+            return default if fingerprint is None else fingerprint.hex()
+        if key in SLOT_KEYS:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.rich is not None:
+            return self.rich.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        if key in PLAIN_KEYS:
+            setattr(self, key, value)
+        elif key == "ts":
+            self.time = parse_ts(value)
+        elif key == "fp":
+            self._fingerprint = bytes.fromhex(value)
+        elif key in SLOT_KEYS:
+            setattr(self, key, value)
+            if key == "text":
+                self._fingerprint = None
+                self.length = None if value is None else len(value)
+            elif key == "size":
+                self.length = value
+        else:
+            if self.rich is None:
+                self.rich = {}
+            self.rich[key] = value
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        if key == "ts":
+            key = "time"
+        if key == "fp":
+            self._fingerprint = None
+        elif key in SLOT_KEYS:
+            self[key] = None
+        elif self.rich is not None:
+            self.rich.pop(key, None)
+            if not self.rich:
+                self.rich = None
+        return value
+
+    def update(self, fields=()):
+        items = fields.items() if hasattr(fields, "items") else fields
+        for key, value in items:
+            # "time" wins over a legacy "ts" given alongside it
+            if key != "ts" or self.time is None:
+                self[key] = value
+
+    def keys(self):
+        return list(self.to_dict())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def __eq__(self, other):
+        if isinstance(other, Clip):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return f"Clip({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Plain dict for JSON (the timestamp as "time", in epoch seconds); unset fields are left out."""
+        data = {}
+        for key in CONTENT_SLOTS:
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        fingerprint = self.fingerprint
+        if fingerprint is not None:
+            data["fp"] = fingerprint.hex()
+        if self.time is not None:
+            data["time"] = self.time
+        if self.rich is not None:
+            data.update(self.rich)
+        if self.pinned is not None:
+            data["pinned"] = self.pinned
+        if self.last_paste is not None:
+            data["last_paste"] = self.last_paste
+        if self.pastes is not None:
+            data["pastes"] = self.pastes
+        if self.cluster is not None:
+            data["cluster"] = self.cluster
+        return data
+
+    def copy(self):
+        clip = Clip(self.to_dict())
+        clip._fingerprint = self._fingerprint
+        return clip
+
+def as_clip(item):
+    return item if isinstance(item, Clip) else Clip.from_dict(item)
+
+class ClipHistory:
+    """
+    Ordered id -> Clip store. Iteration, len() and integer / slice indexing see the clips
+    newest first, like the plain list it replaces; get(), prepend() and delete()
+    work by id. Plain dict items (legacy histories) are converted to Clips and,
+    if they have no id, get one on the way in, oldest first; new_id() hands out the ids
+    for newly captured clips.
+    """
+    def __init__(self, items=(), next_id=1):
+        items = [as_clip(item) for item in items]
+        self.next_id = max([next_id] + [item.id + 1 for item in items if isinstance(item.id, int)])
+        self._clips = {}  # id -> item in insertion order, oldest first: the front of the history is the end
+        self._rows = []              # Cached items oldest first, or None when stale
+        for item in reversed(items):
+            if not isinstance(item.id, int) or item.id in self._clips:
+                item.id = self.new_id()
+            self._clips[item.id] = item
+            self._rows.append(item)
+
+    def new_id(self):
+        clip_id = self.next_id
+        self.next_id += 1
+        return clip_id
+
+    def __len__(self):
+        return len(self._clips)
+
+    def __iter__(self):
+        return reversed(self._clips.values())
+
+    def __reversed__(self):
+        return iter(self._clips.values())
+
+    def _oldest_first(self):
+        if self._rows is None:
+            self._rows = list(self._clips.values())
+        return self._rows
+
+    def __getitem__(self, row):
+        """The row-th newest item (or a list of them for a slice)."""
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("history row out of range")
+        return self._oldest_first()[len(self) - 1 - row]
+
+    def get(self, clip_id, default=None):
+        return self._clips.get(clip_id, default)
+
+    def prepend(self, item):
+        """Insert an item as the newest clip, giving it an id if it has none; returns the stored Clip."""
+        item = as_clip(item)
+        if not isinstance(item.id, int):
+            item.id = self.new_id()
+        elif item.id in self._clips:
+            self.delete(item.id)
+        self.next_id = max(self.next_id, item.id + 1)
+        self._clips[item.id] = item
+        if self._rows is not None:
+            self._rows.append(item)
+        return item
+
+    def extend(self, items):
+        """Append older items (e.g. the next page of a paged store) after the oldest clip."""
+        older = {}
+        for item in reversed(list(items)):
+            if item.id not in self._clips:
+                older[item.id] = item
+        if older:
+            # A dict can't insert at its start, so this rebuilds it (once per page, not per clip)
+            older.update(self._clips)
+            self._clips = older
+            self._rows = None
+
+    def delete(self, clip_id):
+        """Remove a clip; returns it (None if there is no such clip)."""
+        item = self._clips.pop(clip_id, None)
+        if item is not None:
+            self._rows = None
+        return item
+
+    def __repr__(self):
+        return f"ClipHistory({self.to_list()!r})"
+
+    def to_list(self):
+        """Plain list of the items as dicts, newest first (for serialization)."""
+        return [item.to_dict() for item in self]
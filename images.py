@@ -0,0 +1,145 @@
+# images.py
+# Quick-Clip Clipboard Popup App
+#
+# Storage for image clips. Images are stored once as PNG under the hash of their pixels
+# (images/<hash>.png), so copying the same screenshot twice costs nothing. Hashing, PNG
+# encoding and thumbnail generation run on a worker thread; thumbnails are cached on disk
+# (images/thumbs/) and in memory, so the popup never decodes a full-size image to draw the list.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, hashlib, threading, queue, logging
+from collections import OrderedDict
+from PySide6.QtCore import QObject, Signal, Qt
+from PySide6.QtGui import QImage
+from history import Clip
+import settings
+
+log = logging.getLogger(__name__)
+
+IMAGE_PREFIX = "🖼 Image"
+
+def image_digest(image):
+    """Hash of an image's pixels (format-normalized), independent of how it would be encoded."""
+    image = image.convertToFormat(QImage.Format_ARGB32)
+    h = hashlib.sha256(b"%dx%d:" % (image.width(), image.height()))
+    for y in range(image.height()):
+        h.update(bytes(image.constScanLine(y))[:image.width() * 4])
+    return h.hexdigest()
+
+def image_path(digest):
+    return os.path.join(settings.IMAGE_DIR, digest[:2], digest + '.png')
+
+def thumbnail_path(digest, size):
+    return os.path.join(settings.IMAGE_DIR, 'thumbs', '%s-%d.png' % (digest, size))
+
+def image_label(digest, width, height):
+    """Display text of an image clip; it includes the hash so each image has a distinct key."""
+    return f"{IMAGE_PREFIX} {width}×{height} · {digest[:12]}"
+
+def put_image(image):
+    """Store image as PNG under its pixel hash (once) and return the hash."""
+    digest = image_digest(image)
+    path = image_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        if not image.save(tmp_path, 'PNG'):
+            raise OSError(f"could not encode image {digest}")
+        os.replace(tmp_path, path)
+    return digest
+
+def get_image(digest):
+    """Load a stored image (a null QImage if it is missing)."""
+    return QImage(image_path(digest))
+
+def delete_image(digest):
+    """Remove a stored image and its thumbnails."""
+    removed = False
+    for path in [image_path(digest)] + [thumbnail_path(digest, size) for size in (settings.THUMBNAIL_SIZE, settings.IMAGE_PREVIEW_SIZE)]:
+        try:
+            os.remove(path)
+            removed = True
+        except OSError:
+            pass
+    return removed
+
+def make_thumbnail(digest, size):
+    """Return the thumbnail of a stored image, generating and caching it on disk if needed."""
+    path = thumbnail_path(digest, size)
+    thumb = QImage(path)
+    if thumb.isNull():
+        image = get_image(digest)
+        if image.isNull():
+            return thumb
+        thumb = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        thumb.save(path + '.tmp', 'PNG')
+        os.replace(path + '.tmp', path)
+    return thumb
+
+class ImageWorker(QObject):
+    """
+    Runs image jobs on a background thread. store() hashes, saves and thumbnails a captured
+    image and emits stored(item) on the GUI thread; thumbnail() returns a cached thumbnail
+    or None, in which case it is loaded (or generated) in the background and
+    thumbnail_ready(digest) is emitted once it is available.
+    """
+    stored = Signal(object)
+    thumbnail_ready = Signal(str)
+    _loaded = Signal(object)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._jobs = queue.Queue()
+        self._thumbs = OrderedDict()  # (digest, size) -> QImage, most recently used last
+        self._requested = set()
+        self._loaded.connect(self._on_loaded)
+        self._thread = threading.Thread(target=self._run, name="quickclip-images", daemon=True)
+        self._thread.start()
+    def store(self, image, created):
+        """Queue a captured QImage (created: epoch seconds); stored(clip) follows once it is on disk."""
+        self._jobs.put(("store", image, created))
+    def thumbnail(self, digest, size=None):
+        size = size or settings.THUMBNAIL_SIZE
+        key = (digest, size)
+        thumb = self._thumbs.get(key)
+        if thumb is not None:
+            self._thumbs.move_to_end(key)
+            return thumb
+        if key not in self._requested:
+            self._requested.add(key)
+            self._jobs.put(("thumbnail", digest, size))
+        return None
+    def _on_loaded(self, result):
+        key, thumb = result
+        self._requested.discard(key)
+        self._thumbs[key] = thumb
+        while len(self._thumbs) > settings.THUMBNAIL_CACHE_ITEMS:
+            self._thumbs.popitem(last=False)
+        self.thumbnail_ready.emit(key[0])
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job[0] == "store":
+                    image, created = job[1], job[2]
+                    digest = put_image(image)
+                    thumb = make_thumbnail(digest, settings.THUMBNAIL_SIZE)
+                    self._loaded.emit(((digest, settings.THUMBNAIL_SIZE), thumb))
+                    self.stored.emit(Clip(text=image_label(digest, image.width(), image.height()), image=digest,
+                                          width=image.width(), height=image.height(), time=created))
+                else:
+                    digest, size = job[1], job[2]
+                    self._loaded.emit(((digest, size), make_thumbnail(digest, size)))
+            except Exception as e:
+                log.warning("Image job failed: %s", e)
+
+_images = None
+
+def get_images():
+    """Return the shared image worker for this process."""
+    global _images
+    if _images is None:
+        _images = ImageWorker()
+    return _images
@@ -2,16 +2,49 @@
 # Quick-Clip Clipboard Popup App
 #
 # Entry point for the application. Initializes the Qt application and starts the hotkey listener.
+# Only what is needed to start listening is imported here; the popup is built in the background.
+# Run with --startup-profile[=report.json] to print startup timings, and with --trace
+# (or --trace-overlay to also show the numbers in the popup) to record hot-path spans.
+# Only one instance runs: a second one asks the first (through its history service, service.py)
+# to show the popup and exits, before loading a copy of the history of its own.
 #
 # Author: Tof-O
 # License: MIT
 
-import sys
+import sys, time, logging
+_start = time.perf_counter()
 from PySide6.QtWidgets import QApplication
-from preview import PopupWindow
 from text import HotkeyListener
+import tracing
+_imported = time.perf_counter()
 
 if __name__ == "__main__":
+    from startup import profile_arg, StartupProfile
+    enabled, path = profile_arg(sys.argv[1:])
+    profile = StartupProfile(_start, path) if enabled else None
+    if "--trace" in sys.argv or "--trace-overlay" in sys.argv:
+        tracing.enable(with_overlay="--trace-overlay" in sys.argv)
+    from settings import LOG_LEVEL
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
+    _app_created = time.perf_counter()
+    from settings import SERVICE_ENABLED
+    if SERVICE_ENABLED:
+        from service import HistoryService, show_running
+        if show_running():
+            print("Quick-Clip is already running")
+            sys.exit(0)
     listener = HotkeyListener()
-    sys.exit(app.exec())
\ No newline at end of file
+    app.aboutToQuit.connect(listener.close)
+    if SERVICE_ENABLED:
+        service = HistoryService(listener)
+        if not service.start():
+            logging.getLogger("main").warning("History service unavailable: %s", service.server.errorString())
+        app.aboutToQuit.connect(service.close)
+    app.aboutToQuit.connect(tracing.flush)
+    if profile is not None:
+        profile.mark("imports", _imported)
+        profile.mark("qapplication", _app_created)
+        profile.mark("listening")
+        profile.attach(app, listener)
+    sys.exit(app.exec())
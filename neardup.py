@@ -0,0 +1,260 @@
+# neardup.py
+# Quick-Clip Clipboard Popup App
+#
+# Near-duplicate clustering, off unless NEARDUP_ENABLED is set. Every clip gets a 63-bit SimHash
+# of its word tokens at capture. Clips within NEARDUP_MAX_DISTANCE bits of each other are candidate
+# near duplicates: split into NEARDUP_MAX_DISTANCE + 1 bands, two such hashes agree on at least one
+# whole band, so a new clip only compares against the clips sharing one of its band values instead
+# of the whole history. A SimHash of a few words is coarse, so a candidate must also share
+# NEARDUP_MIN_SIMILARITY of its distinct words (numbers included) with the new clip. A clip that
+# matches joins the match's cluster (its "cluster" field, persisted with the clip), and the popup
+# shows each cluster as one collapsible entry. With the sqlite backend only the pages of the
+# history loaded so far are clustered; older rows keep the cluster they were given at capture.
+#
+# Author: Tof-O
+# License: MIT
+
+import re, sys, hashlib, functools
+from array import array
+from collections import Counter, deque
+from settings import (NEARDUP_MAX_DISTANCE, NEARDUP_MIN_TOKENS, NEARDUP_SCAN_CHARS, NEARDUP_MAX_CANDIDATES,
+                      NEARDUP_MIN_SIMILARITY, SEARCH_BUILD_CHUNK)
+
+SIMHASH_BITS = 63  # Fits SQLite's signed INTEGER
+_LANE = 16  # Bits per counter when the per-bit counts are summed as one packed integer
+_TOKEN = re.compile(r"\w+")
+# _SPREAD[b] puts bit i of the byte b in lane i
+_SPREAD = [sum(1 << (i * _LANE) for i in range(8) if b >> i & 1) for b in range(256)]
+
+@functools.lru_cache(maxsize=8192)
+def _spread_token(token):
+    """The token's hash with every bit moved into its own lane, ready to be summed."""
+    digest = hashlib.blake2b(token.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    spread = 0
+    for k, byte in enumerate(digest):
+        spread |= _SPREAD[byte] << (8 * k * _LANE)
+    return spread
+
+def simhash(text):
+    """SimHash of a clip's leading NEARDUP_SCAN_CHARS characters; 0 if it has too few words to compare."""
+    tokens = _TOKEN.findall(text[:NEARDUP_SCAN_CHARS].lower())
+    if len(tokens) < NEARDUP_MIN_TOKENS:
+        return 0
+    # Summing spread hashes counts, per bit, the tokens that have it set (lanes can't overflow:
+    # NEARDUP_SCAN_CHARS is far below 2**_LANE)
+    packed = 0
+    for token, count in Counter(tokens).items():
+        packed += _spread_token(token) * count
+    half = len(tokens) // 2
+    lanes = array('H', packed.to_bytes(64 * _LANE // 8, sys.byteorder))[:SIMHASH_BITS]
+    return int(''.join('1' if count > half else '0' for count in reversed(lanes)), 2)
+
+try:
+    _popcount = int.bit_count  # Python 3.10+
+except AttributeError:
+    def _popcount(value):
+        return bin(value).count("1")
+
+def distance(a, b):
+    """Number of differing bits between two SimHashes."""
+    return _popcount(a ^ b)
+
+def _words(item):
+    """Distinct word tokens of the part of a clip its SimHash covers (a large clip's snippet)."""
+    text = item.get("text")
+    if text is None:
+        text = item.get("snippet") or ""
+    return set(_TOKEN.findall(text[:NEARDUP_SCAN_CHARS].lower()))
+
+def similarity(a, b):
+    """Jaccard similarity of two clips' word sets."""
+    a, b = _words(a), _words(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def _band_masks(bands):
+    """(shift, mask) of each band; band widths differ by at most one bit."""
+    masks, shift = [], 0
+    for i in range(bands):
+        width = SIMHASH_BITS // bands + (1 if i < SIMHASH_BITS % bands else 0)
+        masks.append((shift, (1 << width) - 1))
+        shift += width
+    return masks
+
+def cluster_key(item):
+    """Id that names an item's cluster: the first clip of the cluster (the item itself if it joined none; None before it has an id)."""
+    return item.get("cluster") or item.get("id")
+
+class NearDupIndex:
+    """
+    Band index over the SimHashes of a ClipHistory, plus the cluster membership recorded in
+    the clips' "cluster" fields. match() and add() only scan the buckets of the new clip's
+    bands, reading SimHashes from the index itself. remove() forgets a deleted clip's SimHash;
+    its ids are dropped from buckets and clusters lazily, when met.
+    With deferred=True the band index is filled through build_step() in chunks, like the
+    search index; add() finishes any remaining work first.
+    """
+    def __init__(self, items, deferred=False, max_distance=NEARDUP_MAX_DISTANCE):
+        self.items = items
+        self.max_distance = max_distance
+        self._masks = _band_masks(max_distance + 1)
+        self._buckets = [{} for _ in self._masks]  # Per band: band value -> ids, oldest first
+        self._sims = {}  # Id -> SimHash as indexed
+        self._clusters = {}  # Cluster key -> ids of the clips that joined it, oldest first
+        for item in reversed(list(items)):
+            if item.get("cluster"):
+                self._clusters.setdefault(item["cluster"], {})[item["id"]] = None
+        self._pending = deque(reversed(list(items)))
+        if not deferred:
+            self.build_step(None)
+
+    def build_step(self, count=SEARCH_BUILD_CHUNK):
+        """Index up to count pending items (all if None); return True while work remains."""
+        while self._pending and (count is None or count > 0):
+            item = self._pending.popleft()
+            if self.items.get(item["id"]) is not None:  # Not deleted while pending
+                self._index(item)
+            if count is not None:
+                count -= 1
+        return bool(self._pending)
+
+    def _index(self, item):
+        sim = item.get("sim")
+        if not sim:
+            return
+        clip_id = item["id"]
+        self._sims[clip_id] = sim
+        for (shift, mask), buckets in zip(self._masks, self._buckets):
+            buckets.setdefault((sim >> shift) & mask, []).append(clip_id)
+
+    def match(self, item):
+        """The closest earlier clip within max_distance of item that shares enough of its words (newest on ties), or None."""
+        sim = item.get("sim")
+        if not sim:
+            return None
+        if self._pending:
+            self.build_step(None)
+        best, best_distance, checked = None, self.max_distance + 1, 0
+        words = _words(item)
+        seen = {item["id"]}
+        sims = self._sims
+        for (shift, mask), buckets in zip(self._masks, self._buckets):
+            bucket = buckets.get((sim >> shift) & mask)
+            if not bucket:
+                continue
+            dead = False
+            for clip_id in reversed(bucket):
+                if clip_id in seen:
+                    continue
+                seen.add(clip_id)
+                other_sim = sims.get(clip_id)
+                if other_sim is None:
+                    dead = True
+                    continue
+                d = _popcount(sim ^ other_sim)
+                if d < best_distance:
+                    # Only a would-be match is looked up in the history
+                    other = self.items.get(clip_id)
+                    if other is None:
+                        dead = True
+                        continue
+                    other_words = _words(other)
+                    union = len(words | other_words)
+                    if union and len(words & other_words) / union < NEARDUP_MIN_SIMILARITY:
+                        checked += 1
+                        if checked >= NEARDUP_MAX_CANDIDATES:
+                            break
+                        continue
+                    best, best_distance = other, d
+                    if d == 0:
+                        break
+                checked += 1
+                if checked >= NEARDUP_MAX_CANDIDATES:
+                    break
+            if dead:
+                bucket[:] = [clip_id for clip_id in bucket if clip_id in sims and self.items.get(clip_id) is not None]
+            if best_distance == 0 or checked >= NEARDUP_MAX_CANDIDATES:
+                break
+        return best
+
+    def add(self, item):
+        """Index a newly captured clip, putting it in the cluster of its closest near duplicate; returns that clip or None."""
+        match = self.match(item)
+        if match is not None:
+            key = cluster_key(match)
+            item["cluster"] = key
+            self._clusters.setdefault(key, {})[item["id"]] = None
+        self._index(item)
+        return match
+
+    def remove(self, clip_id):
+        """Forget a deleted or evicted clip: it is no longer a match for new clips."""
+        self._sims.pop(clip_id, None)
+
+    def update(self, item):
+        """
+        Re-cluster an edited clip by its new SimHash: it leaves its cluster and joins the one of
+        its closest near duplicate, if any. If other clips had joined its cluster, the oldest of
+        them now names it. Returns {id: cluster} for every clip whose cluster changed (None: no
+        cluster), for the store's set_meta.
+        """
+        clip_id = item["id"]
+        self.remove(clip_id)
+        if self._pending:
+            self.build_step(None)
+        old = item.get("cluster")
+        changes = {}
+        if old:
+            self._clusters.get(old, {}).pop(clip_id, None)
+        else:
+            joined = [self.items.get(member) for member in self._clusters.pop(clip_id, ())]
+            joined = [member for member in joined if member is not None]
+            if joined:
+                root = joined[0]
+                root.pop("cluster", None)
+                changes[root["id"]] = None
+                if len(joined) > 1:
+                    self._clusters[root["id"]] = dict.fromkeys(member["id"] for member in joined[1:])
+                    for member in joined[1:]:
+                        member["cluster"] = root["id"]
+                        changes[member["id"]] = root["id"]
+        item.pop("cluster", None)
+        self.add(item)
+        if item.get("cluster") != old:
+            changes[clip_id] = item.get("cluster")
+        return changes
+
+    def extend(self, items):
+        """Index older items loaded after the index was built (the next page of a paged store)."""
+        changed = set()
+        for item in reversed(list(items)):
+            if item.get("cluster"):
+                self._clusters.setdefault(item["cluster"], {})[item["id"]] = None
+                changed.add(item["cluster"])
+            self._index(item)
+        for key in changed:
+            self._clusters[key] = dict.fromkeys(sorted(self._clusters[key]))  # Ids grow with capture time
+
+    def members(self, key):
+        """Live clips of a cluster, newest first (a lone clip's cluster is just itself)."""
+        joined = self._clusters.get(key)
+        if not joined:
+            root = self.items.get(key)
+            return [root] if root is not None else []
+        clips = []
+        for clip_id in reversed(joined):
+            clip = self.items.get(clip_id)
+            if clip is not None:
+                clips.append(clip)
+        if len(clips) < len(joined):
+            for clip_id in [clip_id for clip_id in joined if self.items.get(clip_id) is None]:
+                del joined[clip_id]
+        root = self.items.get(key)
+        if root is not None:
+            clips.append(root)
+        return clips
+
+    def size(self, key):
+        """Number of live clips in a cluster."""
+        if key not in self._clusters:
+            return 1 if self.items.get(key) is not None else 0
+        return len(self.members(key))
@@ -0,0 +1,215 @@
+# paste.py
+# Quick-Clip Clipboard Popup App
+#
+# Sends the paste keystroke to the window that was focused when the popup opened. Backends:
+# win32 (keybd_event), xtest (X11 XTest through python-xlib), uinput (Linux without X, through
+# python-evdev; needs write access to /dev/uinput) and fake (records pastes, for tests).
+# Instead of sleeping a fixed time after the popup hides, PasteDispatcher polls the backend
+# until focus is back on the target window and pastes right away, or after
+# PASTE_READY_TIMEOUT_MS at the latest. Hotkey-to-paste latency is traced per backend.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, sys, time, logging
+from PySide6.QtCore import QObject, QTimer, Signal, Qt
+from PySide6.QtGui import QGuiApplication
+import settings, tracing
+
+log = logging.getLogger(__name__)
+
+class PasteBackend:
+    """
+    Interface of a paste backend. capture_target() is called before the popup shows and
+    returns a handle of the focused window; once the popup has hidden, restore_focus(target)
+    is called once and is_ready(target) is polled until it is true (or the timeout passes),
+    then send_paste() types Ctrl+V.
+    """
+    name = "none"
+    def capture_target(self):
+        return None
+    def restore_focus(self, target):
+        pass
+    def is_ready(self, target):
+        # Without a way to ask the window system: ready once this app no longer has focus
+        return QGuiApplication.applicationState() != Qt.ApplicationActive
+    def send_paste(self):
+        raise NotImplementedError
+
+class Win32PasteBackend(PasteBackend):
+    name = "win32"
+    def __init__(self):
+        import win32gui, win32con, win32api
+        self.win32gui, self.win32con, self.win32api = win32gui, win32con, win32api
+    def capture_target(self):
+        return self.win32gui.GetForegroundWindow()
+    def restore_focus(self, target):
+        try:
+            if target and self.win32gui.GetForegroundWindow() != target:
+                self.win32gui.SetForegroundWindow(target)
+        except Exception as e:
+            log.warning("Restoring focus failed: %s", e)
+    def is_ready(self, target):
+        if not target:
+            return super().is_ready(target)
+        return self.win32gui.GetForegroundWindow() == target
+    def send_paste(self):
+        win32con, win32api = self.win32con, self.win32api
+        for vk in [win32con.VK_MENU, win32con.VK_SHIFT]:
+            win32api.keybd_event(vk, 0, win32con.KEYEVENTF_KEYUP, 0)
+        win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
+        win32api.keybd_event(0x56, 0, 0, 0)
+        win32api.keybd_event(0x56, 0, win32con.KEYEVENTF_KEYUP, 0)
+        win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+
+class XTestPasteBackend(PasteBackend):
+    name = "xtest"
+    def __init__(self):
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+        self.X, self.xtest = X, xtest
+        self.display = display.Display()
+        self.ctrl = self.display.keysym_to_keycode(XK.XK_Control_L)
+        self.v = self.display.keysym_to_keycode(XK.XK_v)
+    def _focus(self):
+        focus = self.display.get_input_focus().focus
+        return getattr(focus, "id", None)
+    def capture_target(self):
+        return self._focus()
+    def restore_focus(self, target):
+        try:
+            if target and self._focus() != target:
+                self.display.create_resource_object('window', target).set_input_focus(self.X.RevertToParent, self.X.CurrentTime)
+                self.display.sync()
+        except Exception as e:
+            log.warning("Restoring focus failed: %s", e)
+    def is_ready(self, target):
+        if not target:
+            return super().is_ready(target)
+        return self._focus() == target
+    def send_paste(self):
+        X, xtest = self.X, self.xtest
+        xtest.fake_input(self.display, X.KeyPress, self.ctrl)
+        xtest.fake_input(self.display, X.KeyPress, self.v)
+        xtest.fake_input(self.display, X.KeyRelease, self.v)
+        xtest.fake_input(self.display, X.KeyRelease, self.ctrl)
+        self.display.sync()
+
+class UinputPasteBackend(PasteBackend):
+    """Virtual keyboard through /dev/uinput; focus can't be queried, so it only waits for this app to lose it."""
+    name = "uinput"
+    def __init__(self):
+        from evdev import UInput, ecodes
+        self.ecodes = ecodes
+        self.device = UInput({ecodes.EV_KEY: [ecodes.KEY_LEFTCTRL, ecodes.KEY_V]}, name="quickclip-paste")
+    def send_paste(self):
+        e = self.ecodes
+        for key, value in ((e.KEY_LEFTCTRL, 1), (e.KEY_V, 1), (e.KEY_V, 0), (e.KEY_LEFTCTRL, 0)):
+            self.device.write(e.EV_KEY, key, value)
+        self.device.syn()
+
+class FakePasteBackend(PasteBackend):
+    """
+    Records pastes instead of typing them: pastes gets {"text", "time"} per paste, with the
+    clipboard text at that moment. The target counts as focused ready_after_ms after
+    restore_focus(), or never with ready_after_ms=None (to exercise the timeout).
+    """
+    name = "fake"
+    def __init__(self, ready_after_ms=0):
+        self.ready_after_ms = ready_after_ms
+        self.pastes = []
+        self._restored = None
+    def capture_target(self):
+        return "target"
+    def restore_focus(self, target):
+        self._restored = time.perf_counter()
+    def is_ready(self, target):
+        if self.ready_after_ms is None or self._restored is None:
+            return False
+        return (time.perf_counter() - self._restored) * 1000 >= self.ready_after_ms
+    def send_paste(self):
+        self.pastes.append({"text": QGuiApplication.instance().clipboard().text(), "time": time.perf_counter()})
+
+BACKENDS = {"win32": Win32PasteBackend, "xtest": XTestPasteBackend, "uinput": UinputPasteBackend,
+            "fake": FakePasteBackend}
+
+def make_backend(name=None):
+    """Create the backend named by PASTE_BACKEND; "auto" picks one for this platform."""
+    name = name or settings.PASTE_BACKEND
+    if name == "auto":
+        if sys.platform == "win32":
+            candidates = ["win32"]
+        elif os.environ.get("DISPLAY"):
+            candidates = ["xtest", "uinput"]
+        else:
+            candidates = ["uinput"]
+    else:
+        candidates = [name]
+    for candidate in candidates:
+        try:
+            return BACKENDS[candidate]()
+        except Exception as e:
+            log.warning("Paste backend %s unavailable: %s", candidate, e)
+    return None
+
+class PasteDispatcher(QObject):
+    """
+    Times the paste keystroke. remember_target() runs before the popup shows; paste() runs
+    once it has hidden and polls the backend every PASTE_POLL_MS until focus is back on the
+    target (or PASTE_READY_TIMEOUT_MS passes), then pastes and emits
+    pasted(backend name, Ctrl+V-to-paste ms, or -1 if the popup was not opened by the hotkey).
+    """
+    pasted = Signal(str, float)
+    def __init__(self, backend=None, parent=None):
+        super().__init__(parent)
+        self.backend = backend if backend is not None else make_backend()
+        self.target = None
+        self.last_latency_ms = None
+        self.timeouts = 0  # Pastes sent because focus did not return in time
+        self._hotkey_time = None
+        self._deadline = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(settings.PASTE_POLL_MS)
+        self._timer.timeout.connect(self._poll)
+    @property
+    def name(self):
+        return self.backend.name if self.backend is not None else "none"
+    def remember_target(self):
+        """Remember the window to paste into (the one focused before the popup shows)."""
+        try:
+            self.target = self.backend.capture_target() if self.backend is not None else None
+        except Exception as e:
+            self.target = None
+            log.warning("Reading the focused window failed: %s", e)
+    def paste(self, hotkey_time=None):
+        """Paste into the remembered window as soon as it has focus again."""
+        if self.backend is None:
+            return
+        self._hotkey_time = hotkey_time
+        self._deadline = time.perf_counter() + settings.PASTE_READY_TIMEOUT_MS / 1000
+        self.backend.restore_focus(self.target)
+        self._timer.start()
+        self._poll()
+    def _poll(self):
+        try:
+            ready = self.backend.is_ready(self.target)
+        except Exception as e:
+            log.warning("Checking focus failed: %s", e)
+            ready = False
+        if not ready and time.perf_counter() < self._deadline:
+            return
+        self._timer.stop()
+        if not ready:
+            self.timeouts += 1
+        try:
+            self.backend.send_paste()
+        except Exception as e:
+            log.warning("Paste failed: %s", e)
+            return
+        latency = -1.0
+        if self._hotkey_time is not None:
+            latency = self.last_latency_ms = (time.perf_counter() - self._hotkey_time) * 1000
+            if tracing.enabled:
+                # Ctrl+V to the paste keystroke, end to end, per backend
+                tracing.record("hotkey_to_paste." + self.backend.name, latency)
+        self.pasted.emit(self.backend.name, latency)
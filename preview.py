@@ -9,23 +9,28 @@
 
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QGridLayout, QScrollArea
+    QGridLayout, QScrollArea, QListView, QAbstractItemView, QStackedWidget, QLineEdit, QPlainTextEdit
 )
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QCursor
+from PySide6.QtCore import Qt, Signal
+import time
+from PySide6.QtGui import QCursor, QTextCursor
 from edit import EditPage
-from settings import WINDOW_WIDTH, WINDOW_HEIGHT, load_theme, save_theme, THEME_COLORS, BUTTON_CONFIG
-from text import create_tab_row
+from settings import WINDOW_WIDTH, WINDOW_HEIGHT, SEARCH_RESULT_LIMIT, PREVIEW_LABEL_MAX_CHARS, PREVIEW_CHUNK_CHARS, BUTTON_CONFIG, TRACE_OVERLAY, IMAGE_PREVIEW_SIZE
+import tracing
+from tracing import traced
+from config import get_config
+from text import HistoryModel, HistoryDelegate, find_clip, set_clipboard_item_meta, record_paste
+from search import TrigramIndex, parse_query
+from store import set_meta
+from blobs import item_text
+from images import get_images, get_image
+from paste import PasteDispatcher
 
 class PopupWindow(QMainWindow):
+    painted = Signal()  # First paint after show_at_cursor(): the popup is on screen
     def toggle_theme(self):
-        """Toggle the theme between light and dark modes."""
-        self.theme = 'dark' if self.theme == 'light' else 'light'
-        self.save_theme()
-        self.apply_theme()
-        if hasattr(self, 'border_widget'):
-            self.border_widget.theme = self.theme
-            self.border_widget.update()
+        """Toggle the theme between light and dark modes; the config service calls back set_theme."""
+        self.config.set_theme('dark' if self.theme == 'light' else 'light')
     class BorderWidget(QWidget):
         def __init__(self, parent, theme):
             super().__init__(parent)
@@ -43,33 +48,38 @@ class PopupWindow(QMainWindow):
             rect = self.rect()
             rect.adjust(2, 2, -2, -2)
             painter.drawRoundedRect(rect, 12, 12)
+            # Drawn over the whole window, so its first paint after a show is the popup's
+            popup = self.parent()
+            if popup.awaiting_paint:
+                popup.awaiting_paint = False
+                popup.painted.emit()
     def show_edit_page(self):
         """Switch to edit mode and display the edit page."""
         self.edit_mode = True
-        self._init_ui()
-        self.apply_theme()
+        self.edit_page.set_clip(self.preview_id, self.preview_text)
+        self.stack.setCurrentWidget(self.edit_page)
     def show_preview_from_edit(self):
         """Switch from edit mode to preview mode."""
         self.edit_mode = False
-        self._init_ui()
-        self.apply_theme()
+        self.show_preview(self.preview_id)
     def save_edit(self):
         """Save the edited text and switch back to preview mode."""
-        new_text = self.text_edit.toPlainText()
-        for idx, item in enumerate(self.items):
-            if item["text"] == self.preview_text:
-                self.items[idx]["text"] = new_text
-                self.preview_text = new_text
-                break
+        self.edit_page.save()
         self.edit_mode = False
-        self.show_preview(new_text)
+        self.show_preview(self.preview_id)
+    @traced("init_ui")
     def _init_ui(self):
-        """Initialize the user interface components."""
+        """Build the top bar and the list, preview and edit pages once; pages are switched, not rebuilt."""
         central = QWidget()
         self.main_layout = QVBoxLayout(central)
         self.main_layout.setContentsMargins(0, 0, 0, 0)
         top_bar = QHBoxLayout()
         top_bar.setAlignment(Qt.AlignRight)
+        # Latest span timings, shown when tracing with the overlay enabled
+        self.trace_overlay = QLabel()
+        self.trace_overlay.setStyleSheet("font-family: monospace; font-size: 9px; padding-left: 10px;")
+        self.trace_overlay.setVisible(False)
+        top_bar.addWidget(self.trace_overlay, 1)
         theme_btn = QPushButton(BUTTON_CONFIG['theme']['text_light'] if self.theme == 'light' else BUTTON_CONFIG['theme']['text_dark'])
         theme_btn.setFixedSize(*BUTTON_CONFIG['theme']['size'])
         theme_btn.setStyleSheet("border:none;font-size:18px;")
@@ -82,86 +92,144 @@ class PopupWindow(QMainWindow):
         top_bar.addWidget(theme_btn)
         top_bar.addWidget(close_btn)
         self.main_layout.addLayout(top_bar)
-        self.tab_layout = QVBoxLayout()
-        self.tab_layout.setAlignment(Qt.AlignTop)
-        if getattr(self, 'edit_mode', False):
-            def show_preview_callback(new_text):
-                self.edit_mode = False
-                self.show_preview(new_text)
-            self.edit_page = EditPage(self.preview_text, self.items, self.preview_text, show_preview_callback, theme=self.theme)
-            self.main_layout.addWidget(self.edit_page)
-        elif self.preview_mode:
-            preview_layout = QVBoxLayout()
-            preview_layout.setContentsMargins(10, 10, 10, 10)
-            top_bar = QGridLayout()
-            back_btn = QPushButton(BUTTON_CONFIG['back']['text'])
-            back_btn.setFixedSize(*BUTTON_CONFIG['back']['size'])
-            back_btn.setStyleSheet("border:none;font-size:18px;")
-            back_btn.clicked.connect(self.show_main_page)
-            top_bar.addWidget(back_btn, 0, 0, alignment=Qt.AlignLeft)
-            preview_label = QLabel("<b>Preview</b>")
-            preview_label.setStyleSheet("font-size:18px;")
-            top_bar.addWidget(preview_label, 0, 1, alignment=Qt.AlignHCenter)
-            paste_btn = QPushButton(BUTTON_CONFIG['paste']['text'])
-            paste_btn.setFixedSize(*BUTTON_CONFIG['paste']['size'])
-            paste_btn.setStyleSheet("margin-left:12px;")
-            paste_btn.clicked.connect(lambda checked, i=self.preview_text: self.paste_content(i))
-            top_bar.addWidget(paste_btn, 0, 2, alignment=Qt.AlignRight)
-            edit_btn = QPushButton(BUTTON_CONFIG['edit']['text'])
-            edit_btn.setFixedSize(*BUTTON_CONFIG['edit']['size'])
-            edit_btn.setStyleSheet("margin-right:8px;")
-            edit_btn.clicked.connect(self.show_edit_page)
-            top_bar.addWidget(edit_btn, 0, 3, alignment=Qt.AlignRight)
-            top_bar.setColumnStretch(0, 1)
-            top_bar.setColumnStretch(1, 2)
-            top_bar.setColumnStretch(2, 1)
-            preview_layout.addLayout(top_bar)
-            scroll = QScrollArea()
-            scroll.setWidgetResizable(True)
-            preview_content = QWidget()
-            preview_content_layout = QVBoxLayout(preview_content)
-            preview_content_layout.setContentsMargins(10, 10, 10, 10)
-            preview_content_layout.setAlignment(Qt.AlignTop)
-            # Show the actual text and timestamp
-            preview_item = next((item for item in self.items if item["text"] == self.preview_text), None)
-            if preview_item:
-                preview_text_label = QLabel(preview_item["text"])
-                preview_text_label.setWordWrap(True)
-                preview_text_label.setAlignment(Qt.AlignTop)
-                preview_text_label.setStyleSheet("padding: 10px;")
-                preview_content_layout.addWidget(preview_text_label)
-                ts_label = QLabel(f"<i>{preview_item['ts']}</i>")
-                ts_label.setStyleSheet("padding-left:10px; color: #888;")
-                preview_content_layout.addWidget(ts_label)
-            else:
-                preview_text_label = QLabel(self.preview_text)
-                preview_text_label.setWordWrap(True)
-                preview_text_label.setAlignment(Qt.AlignTop)
-                preview_text_label.setStyleSheet("padding: 10px;")
-                preview_content_layout.addWidget(preview_text_label)
-            scroll.setWidget(preview_content)
-            preview_layout.addWidget(scroll)
-            self.main_layout.addLayout(preview_layout)
-        else:
-            scroll = QScrollArea()
-            scroll.setWidgetResizable(True)
-            tab_content = QWidget()
-            tab_content_layout = QVBoxLayout(tab_content)
-            tab_content_layout.setAlignment(Qt.AlignTop)
-            for idx, item in enumerate(self.items):
-                tab_widget = create_tab_row(
-                    item["text"], item["ts"],
-                    on_preview=self.show_preview,
-                    on_paste=self.paste_content
-                )
-                tab_content_layout.addWidget(tab_widget)
-            scroll.setWidget(tab_content)
-            self.main_layout.addWidget(scroll)
+        self.stack = QStackedWidget()
+        self.list_page = self._build_list_page()
+        self.preview_page = self._build_preview_page()
+        def show_preview_callback(clip_id):
+            self.edit_mode = False
+            self.show_preview(clip_id)
+        self.edit_page = EditPage(self.preview_text, self.items, self.preview_id, show_preview_callback, theme=self.theme, dedup=self.dedup, store=self.store, search_index=self.search_index,
+                                  clusters=self.clusters, on_saved=self.clip_changed)
+        self.stack.addWidget(self.list_page)
+        self.stack.addWidget(self.preview_page)
+        self.stack.addWidget(self.edit_page)
+        self.main_layout.addWidget(self.stack)
         self.setCentralWidget(central)
         self.border_widget = self.BorderWidget(self, self.theme)
         self.border_widget.setGeometry(0, 0, self.width(), self.height())
         self.border_widget.raise_()
         self.border_widget.show()
+    def _build_list_page(self):
+        """Build the search field and history list; only the visible rows are painted, so open time doesn't grow with history length."""
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+        page_layout.setContentsMargins(8, 0, 8, 8)
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText("Search… (filter with kind:url, json, code, path)")
+        self.search_field.setClearButtonEnabled(True)
+        self.search_field.textChanged.connect(self.filter_history)
+        page_layout.addWidget(self.search_field)
+        self.history_model = HistoryModel(self.items, self.store, clusters=self.clusters)
+        self.search_model = HistoryModel([])
+        self.history_delegate = HistoryDelegate(self.theme)
+        self.history_delegate.preview_requested.connect(self.show_preview)
+        self.history_delegate.paste_requested.connect(self.paste_content)
+        self.history_delegate.toggle_requested.connect(self.history_model.toggle_cluster)
+        self.history_view = QListView()
+        self.history_view.setModel(self.history_model)
+        self.history_view.setItemDelegate(self.history_delegate)
+        self.history_view.setUniformItemSizes(True)
+        self.history_view.setMouseTracking(True)
+        self.history_view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.history_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        page_layout.addWidget(self.history_view)
+        get_images().thumbnail_ready.connect(self._on_thumbnail_ready)
+        return page
+    def _load_preview_chunk(self, value):
+        """Append the next chunk of a large preview once the viewer is scrolled near its end."""
+        bar = self.preview_viewer.verticalScrollBar()
+        if self._preview_rest and value >= bar.maximum() - bar.pageStep():
+            chunk, self._preview_rest = self._preview_rest[:PREVIEW_CHUNK_CHARS], self._preview_rest[PREVIEW_CHUNK_CHARS:]
+            cursor = QTextCursor(self.preview_viewer.document())
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(chunk)
+    def filter_history(self, query):
+        """Show the clips matching query, ranked by the search index; an empty query shows the full history."""
+        if not query.strip():
+            self.history_view.setModel(self.history_model)
+            return
+        query, kind = parse_query(query)
+        if self.store is not None and self.store.paged:
+            results = self.store.search(query, SEARCH_RESULT_LIMIT, kind=kind)
+        else:
+            if self.search_index is None:
+                self.search_index = TrigramIndex(self.items)
+            results = self.search_index.search(query, SEARCH_RESULT_LIMIT, kind=kind)
+        self.search_model.set_items(results)
+        if self.history_view.model() is not self.search_model:
+            self.history_view.setModel(self.search_model)
+        self.history_view.scrollToTop()
+    def _build_preview_page(self):
+        """Build the preview page; show_preview only swaps the label texts."""
+        page = QWidget()
+        preview_layout = QVBoxLayout(page)
+        preview_layout.setContentsMargins(10, 10, 10, 10)
+        top_bar = QGridLayout()
+        back_btn = QPushButton(BUTTON_CONFIG['back']['text'])
+        back_btn.setFixedSize(*BUTTON_CONFIG['back']['size'])
+        back_btn.setStyleSheet("border:none;font-size:18px;")
+        back_btn.clicked.connect(self.show_main_page)
+        top_bar.addWidget(back_btn, 0, 0, alignment=Qt.AlignLeft)
+        preview_label = QLabel("<b>Preview</b>")
+        preview_label.setStyleSheet("font-size:18px;")
+        top_bar.addWidget(preview_label, 0, 1, alignment=Qt.AlignHCenter)
+        paste_btn = QPushButton(BUTTON_CONFIG['paste']['text'])
+        paste_btn.setFixedSize(*BUTTON_CONFIG['paste']['size'])
+        paste_btn.setStyleSheet("margin-left:12px;")
+        paste_btn.clicked.connect(lambda checked: self.paste_content(self.preview_id))
+        top_bar.addWidget(paste_btn, 0, 2, alignment=Qt.AlignRight)
+        edit_btn = QPushButton(BUTTON_CONFIG['edit']['text'])
+        edit_btn.setFixedSize(*BUTTON_CONFIG['edit']['size'])
+        edit_btn.setStyleSheet("margin-right:8px;")
+        edit_btn.clicked.connect(self.show_edit_page)
+        top_bar.addWidget(edit_btn, 0, 3, alignment=Qt.AlignRight)
+        self.edit_btn = edit_btn
+        top_bar.setColumnStretch(0, 1)
+        top_bar.setColumnStretch(1, 2)
+        top_bar.setColumnStretch(2, 1)
+        preview_layout.addLayout(top_bar)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        preview_content = QWidget()
+        preview_content_layout = QVBoxLayout(preview_content)
+        preview_content_layout.setContentsMargins(10, 10, 10, 10)
+        preview_content_layout.setAlignment(Qt.AlignTop)
+        self.preview_text_label = QLabel()
+        self.preview_text_label.setWordWrap(True)
+        self.preview_text_label.setAlignment(Qt.AlignTop)
+        self.preview_text_label.setStyleSheet("padding: 10px;")
+        preview_content_layout.addWidget(self.preview_text_label)
+        scroll.setWidget(preview_content)
+        preview_layout.addWidget(scroll)
+        self.preview_scroll = scroll
+        # Large clips go into a read-only plain-text viewer, which only lays out what is visible
+        self.preview_viewer = QPlainTextEdit()
+        self.preview_viewer.setReadOnly(True)
+        self.preview_viewer.setStyleSheet("padding: 10px;")
+        self.preview_viewer.hide()
+        self.preview_viewer.verticalScrollBar().valueChanged.connect(self._load_preview_chunk)
+        self._preview_rest = ""
+        preview_layout.addWidget(self.preview_viewer)
+        bottom_bar = QHBoxLayout()
+        self.preview_ts_label = QLabel()
+        self.preview_ts_label.setStyleSheet("padding-left:10px; color: #888;")
+        bottom_bar.addWidget(self.preview_ts_label)
+        bottom_bar.addStretch(1)
+        # Pinned clips are exempt from retention
+        self.pin_btn = QPushButton(BUTTON_CONFIG['pin']['text_pin'])
+        self.pin_btn.setFixedSize(*BUTTON_CONFIG['pin']['size'])
+        self.pin_btn.clicked.connect(self.toggle_pin)
+        bottom_bar.addWidget(self.pin_btn)
+        preview_layout.addLayout(bottom_bar)
+        return page
+    def toggle_pin(self):
+        """Pin or unpin the previewed clip."""
+        pinned = not self._preview_item.get("pinned")
+        set_clipboard_item_meta(self.items, self.preview_id, {"pinned": pinned}, self.store)
+        # A search result of a paged store may not be in the loaded history
+        set_meta(self._preview_item, {"pinned": pinned})
+        self.pin_btn.setText(BUTTON_CONFIG['pin']['text_unpin' if pinned else 'text_pin'])
+        self.history_view.viewport().update()
     def resizeEvent(self, event):
         """Handle the window resize event."""
         super().resizeEvent(event)
@@ -173,81 +241,171 @@ class PopupWindow(QMainWindow):
         if hasattr(self, 'border_widget'):
             self.border_widget.setGeometry(0, 0, self.width(), self.height())
             self.border_widget.raise_()
+    @traced("apply_theme")
     def apply_theme(self):
         """Apply the current theme to the UI components."""
-        colors = THEME_COLORS[self.theme]
-        self.setStyleSheet(f"""
-            QMainWindow {{ background: {colors['bg']}; border-radius: 12px; border: 5px solid {colors['border']} !important; }}
-            QWidget {{ background: {colors['bg']}; border-radius: 12px; border: none !important; }}
-            QLabel {{ color: {colors['label']}; }}
-            QPushButton {{ background: {colors['btn_bg']}; color: {colors['btn_fg']}; border-radius: 8px; }}
-            QPushButton:hover {{ background: {colors['btn_hover']}; }}
-        """)
+        self.setStyleSheet(self.config.stylesheet(self.theme))
         if hasattr(self, 'theme_btn') and self.theme_btn is not None:
             try:
-                self.theme_btn.setText("☀️" if self.theme == "dark" else "🌙")
+                self.theme_btn.setText(BUTTON_CONFIG['theme']['text_dark' if self.theme == 'dark' else 'text_light'])
             except RuntimeError:
                 pass
-        if getattr(self, 'edit_mode', False) and hasattr(self, 'edit_page'):
+        if hasattr(self, 'edit_page'):
             self.edit_page.set_theme(self.theme)
-    def __init__(self, items, theme=None):
-        """Initialize the PopupWindow with clipboard items and an optional theme."""
+        if hasattr(self, 'history_delegate'):
+            self.history_delegate.theme = self.theme
+            try:
+                self.history_view.viewport().update()
+            except RuntimeError:
+                pass
+    def __init__(self, items, theme=None, dedup=None, store=None, search_index=None, paste_backend=None, clusters=None):
+        """Initialize the PopupWindow with clipboard items, an optional theme, dedup/search indexes, history store, paste backend and near-duplicate clusters."""
         super().__init__()
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
         self.setFixedSize(WINDOW_WIDTH, WINDOW_HEIGHT)
         self.setAttribute(Qt.WA_TranslucentBackground)
-        self.theme = load_theme() if theme is None else theme
+        self.config = get_config()
+        self.theme = self.config.theme if theme is None else theme
         self.items = items
+        self.dedup = dedup
+        self.store = store
+        self.search_index = search_index
+        self.clusters = clusters
         self.preview_mode = False
+        self.edit_mode = False
+        self.preview_id = None
         self.preview_text = ""
+        self._preview_item = None
+        self._preview_image = None
+        self.last_show_ms = None
+        self.awaiting_paint = False
+        self.hotkey_time = None  # perf_counter() of the Ctrl+V that opened the popup, set by HotkeyListener
+        self.paster = PasteDispatcher(paste_backend, self)
         self._init_ui()
         self.apply_theme()
-    def load_theme(self):
-        """Load the theme from settings."""
-        return load_theme()
-    def save_theme(self):
-        """Save the current theme to settings."""
-        save_theme(self.theme)
+        # Follows theme changes from the toggle button and from external edits of the config file
+        self.config.theme_changed.connect(self.set_theme)
     def show_main_page(self):
         """Show the main page with clipboard history."""
         self.preview_mode = False
-        self._init_ui()
-        self.apply_theme()
-    def paste_content(self, text):
-        """Paste the given text to the clipboard and simulate a paste action."""
+        self.edit_mode = False
+        self.stack.setCurrentWidget(self.list_page)
+    def add_item(self, item):
+        """Insert a newly captured clip at the top of the list without rebuilding the page."""
+        self.history_model.prepend(item)
+    def clip_changed(self, clip_id):
+        """
+        Repaint after a clip was edited (here or through the history service), reloading its preview
+        if shown. With clusters the rows are rebuilt, as the edit may have moved the clip to another cluster.
+        """
+        if self.clusters is not None:
+            self.history_model.set_items(self.items)
+        else:
+            self.history_view.viewport().update()
+        if self.preview_mode and not self.edit_mode and self.preview_id == clip_id:
+            self.show_preview(clip_id)
+    def set_theme(self, theme):
+        """Switch to the given theme, restyling only if it actually changed."""
+        if theme != self.theme:
+            self.theme = theme
+            self.apply_theme()
+            self.border_widget.theme = self.theme
+            self.border_widget.update()
+    @traced("paste_content")
+    def paste_content(self, clip_id):
+        """Put the clip with the given id on the clipboard and simulate a paste action."""
         from PySide6.QtGui import QGuiApplication
+        item = find_clip(self.items, clip_id, self.store)
+        if item is None:
+            return
         clipboard = QGuiApplication.instance().clipboard()
-        clipboard.setText(text)
+        text = item_text(item)
+        if "image" in item:
+            clipboard.setImage(get_image(item["image"]))
+        elif "html" in item or "uris" in item:
+            from PySide6.QtCore import QMimeData, QUrl
+            mime = QMimeData()
+            mime.setText(text)
+            if "html" in item:
+                mime.setHtml(item["html"])
+            if "uris" in item:
+                mime.setUrls([QUrl(uri) for uri in item["uris"]])
+            clipboard.setMimeData(mime)
+        else:
+            clipboard.setText(text)
         self.hide()
-        from PySide6.QtCore import QTimer
-        def do_paste():
-            try:
-                import win32gui, win32con, win32api, time
-                hwnd = win32gui.GetForegroundWindow()
-                win32gui.SetForegroundWindow(hwnd)
-                for vk in [win32con.VK_MENU, win32con.VK_SHIFT]:
-                    win32api.keybd_event(vk, 0, win32con.KEYEVENTF_KEYUP, 0)
-                win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-                win32api.keybd_event(0x56, 0, 0, 0)
-                win32api.keybd_event(0x56, 0, win32con.KEYEVENTF_KEYUP, 0)
-                win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
-            except Exception as e:
-                print(f"Paste failed: {e}")
-        QTimer.singleShot(200, do_paste)
-    def show_preview(self, text):
-        """Show the preview of the given text."""
+        record_paste(self.items, clip_id, self.store)
+        # Fires as soon as focus is back on the window the popup was opened over
+        hotkey_time, self.hotkey_time = self.hotkey_time, None
+        self.paster.paste(hotkey_time)
+    def _on_thumbnail_ready(self, digest):
+        """Repaint the list (and the previewed image) once a thumbnail has been loaded off-thread."""
+        self.history_view.viewport().update()
+        if self.preview_mode and self._preview_image == digest:
+            self._show_preview_image(digest)
+    def _show_preview_image(self, digest):
+        from PySide6.QtGui import QPixmap
+        image = get_images().thumbnail(digest, IMAGE_PREVIEW_SIZE)
+        if image is None:
+            self.preview_text_label.setText("<i>Loading image…</i>")
+        elif image.isNull():
+            self.preview_text_label.setText("<i>Image not found</i>")
+        else:
+            self.preview_text_label.setPixmap(QPixmap.fromImage(image))
+    def show_preview(self, clip_id):
+        """Show the preview of the clip with the given id."""
+        preview_item = find_clip(self.items, clip_id, self.store)
+        if preview_item is None:
+            self.show_main_page()
+            return
         self.preview_mode = True
+        self.edit_mode = False
+        self.preview_id = clip_id
+        self._preview_item = preview_item
+        # Show the actual text and timestamp
+        text = item_text(preview_item)
         self.preview_text = text
-        self._init_ui()
-        self.apply_theme()
-        if hasattr(self, 'border_widget'):
-            self.border_widget.theme = self.theme
-            self.border_widget.update()
+        self._preview_image = preview_item.get("image")
+        large = len(text) > PREVIEW_LABEL_MAX_CHARS
+        if large:
+            self.preview_text_label.clear()
+            self.preview_viewer.setPlainText(text[:PREVIEW_CHUNK_CHARS])
+            self._preview_rest = text[PREVIEW_CHUNK_CHARS:]
+        else:
+            self.preview_viewer.clear()
+            self._preview_rest = ""
+            if self._preview_image:
+                self._show_preview_image(self._preview_image)
+            else:
+                self.preview_text_label.setText(text)
+            self.preview_scroll.verticalScrollBar().setValue(0)
+        self.preview_viewer.setVisible(large)
+        self.preview_scroll.setVisible(not large)
+        self.preview_ts_label.setText(f"<i>{preview_item['ts']}</i>")
+        self.pin_btn.setText(BUTTON_CONFIG['pin']['text_unpin' if preview_item.get("pinned") else 'text_pin'])
+        self.edit_btn.setVisible(self._preview_image is None)
+        self.stack.setCurrentWidget(self.preview_page)
+    def update_trace_overlay(self):
+        """Show the latest / p95 timings of the main spans in the top bar."""
+        visible = tracing.enabled and (TRACE_OVERLAY or tracing.overlay)
+        self.trace_overlay.setVisible(visible)
+        if visible:
+            stats = tracing.stats()
+            lines = [f"{name} {s['latest_ms']:.1f}/{s['p95_ms']:.1f}ms" for name, s in stats.items()
+                     if name in ("show_at_cursor", "check_clipboard", "store_write") or name.startswith("hotkey_to_paste")]
+            self.trace_overlay.setText('\n'.join(lines) or "no spans yet")
+    @traced("show_at_cursor")
     def show_at_cursor(self):
         """Show the popup window at the current cursor position."""
+        start = time.perf_counter()
+        self.show_main_page()
+        self.search_field.clear()
+        self.history_view.scrollToTop()
         pos = QCursor.pos()
         self.move(pos.x(), pos.y())
+        self.paster.remember_target()
+        self.awaiting_paint = True
         self.show()
-        self.preview_mode = False
-        self._init_ui()
-        self.apply_theme()
+        self.border_widget.update()  # Repainted even if the popup was already showing
+        self.last_show_ms = (time.perf_counter() - start) * 1000
+        self.update_trace_overlay()
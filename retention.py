@@ -0,0 +1,138 @@
+# retention.py
+# Quick-Clip Clipboard Popup App
+#
+# Retention policy for the clipboard history. Clips are ranked by recency (the later of when
+# they were copied and when they were last pasted, so pasting a clip keeps it around) and the
+# least recently used ones are evicted once the history exceeds RETENTION_MAX_ITEMS clips or
+# RETENTION_MAX_BYTES, or are older than RETENTION_MAX_AGE_DAYS. The limits are opt-in (None by
+# default), so nothing is evicted unless one is set. Pinned clips are never evicted.
+# The eviction plan is computed on a background thread and applied on the GUI thread in chunks.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, time, threading, logging
+from PySide6.QtCore import QObject, QTimer, Signal
+import settings
+from blobs import item_snippet, item_fingerprint, blob_path
+from images import image_path
+
+log = logging.getLogger(__name__)
+
+def item_row(item, now=None):
+    """Describe an in-memory item the way SqliteStore.retention_rows() describes a row."""
+    now = time.time() if now is None else now
+    size = item.get("bytes")  # Measured at capture
+    if "blob" in item:
+        if size is None:
+            try:
+                size = os.path.getsize(blob_path(item["blob"]))
+            except OSError:
+                size = 0
+    else:
+        if size is None:
+            size = len(item["text"].encode('utf-8', 'surrogatepass'))
+        size += len(item.get("html", ""))
+        if "image" in item:
+            try:
+                size += os.path.getsize(image_path(item["image"]))
+            except OSError:
+                pass
+    return {"id": item["id"], "blob": item.get("blob"), "image": item.get("image"),
+            "fp": item_fingerprint(item), "bytes": size,
+            "recency": max(item.get("time", now), item.get("last_paste") or 0),
+            "pinned": bool(item.get("pinned")), "snippet": item_snippet(item)[:60], "ts": item.get("ts", "")}
+
+def plan_eviction(rows, now=None, max_items=None, max_bytes=None, max_age_days=None):
+    """
+    Return the rows to evict, least recently used first, each tagged with the limit it broke
+    ("age", "count" or "bytes"). A limit of None is not enforced; pinned rows are skipped
+    and don't count towards the limits.
+    """
+    now = time.time() if now is None else now
+    oldest = None if max_age_days is None else now - max_age_days * 86400
+    kept = kept_bytes = 0
+    evicted = []
+    for row in sorted(rows, key=lambda r: r["recency"], reverse=True):
+        if row["pinned"]:
+            continue
+        if oldest is not None and row["recency"] < oldest:
+            row["reason"] = "age"
+        elif max_items is not None and kept >= max_items:
+            row["reason"] = "count"
+        elif max_bytes is not None and kept_bytes + row["bytes"] > max_bytes:
+            row["reason"] = "bytes"
+        else:
+            kept += 1
+            kept_bytes += row["bytes"]
+            continue
+        evicted.append(row)
+    evicted.reverse()
+    return evicted
+
+class RetentionManager(QObject):
+    """
+    Runs the retention policy over a history. schedule() plans on a background thread;
+    the plan is handed back to the GUI thread and applied RETENTION_CHUNK clips per
+    event-loop tick through evict(rows), which must remove the clips from the history,
+    its indexes and the store and return the rows it actually evicted.
+    When a run finishes, evicted is emitted with a report:
+    {"evicted": count, "bytes": reclaimed, "reasons": {reason: count}, "items": [row, ...]}.
+    """
+    evicted = Signal(dict)
+    _planned = Signal(object)
+    def __init__(self, items, store, evict, parent=None):
+        super().__init__(parent)
+        self.items = items
+        self.store = store
+        self.evict = evict
+        self.running = False
+        self.last_report = None
+        self._pending = []
+        self._report = None
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._apply_chunk)
+        self._planned.connect(self._start)
+    @staticmethod
+    def limits():
+        """The limits currently set in settings, as plan_eviction() keyword arguments."""
+        return {"max_items": settings.RETENTION_MAX_ITEMS, "max_bytes": settings.RETENTION_MAX_BYTES,
+                "max_age_days": settings.RETENTION_MAX_AGE_DAYS}
+    def schedule(self):
+        """Start a retention run unless one is already in progress or no limit is set."""
+        limits = self.limits()
+        if self.running or all(limit is None for limit in limits.values()):
+            return
+        self.running = True
+        # Paged stores are planned from the database; otherwise from a copy of the list
+        snapshot = None if self.store.paged else list(self.items)
+        threading.Thread(target=self._plan, args=(snapshot, limits), name="quickclip-retention", daemon=True).start()
+    def _plan(self, snapshot, limits):
+        try:
+            if snapshot is None:
+                rows = plan_eviction(self.store.retention_rows(), **limits)
+            else:
+                now = time.time()
+                rows = plan_eviction((item_row(item, now) for item in snapshot), now, **limits)
+        except Exception as e:
+            log.warning("Retention failed: %s", e)
+            rows = []
+        # Delivered to the GUI thread through a queued connection
+        self._planned.emit(rows)
+    def _start(self, rows):
+        self._pending = rows
+        self._report = {"evicted": 0, "bytes": 0, "reasons": {}, "items": []}
+        self._timer.start(0)
+    def _apply_chunk(self):
+        chunk, self._pending = self._pending[:settings.RETENTION_CHUNK], self._pending[settings.RETENTION_CHUNK:]
+        if chunk:
+            for row in self.evict(chunk):
+                self._report["evicted"] += 1
+                self._report["bytes"] += row["bytes"]
+                self._report["reasons"][row["reason"]] = self._report["reasons"].get(row["reason"], 0) + 1
+                self._report["items"].append(row)
+        if not self._pending:
+            self._timer.stop()
+            self.running = False
+            self.last_report = self._report
+            self.evicted.emit(self._report)
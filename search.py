@@ -0,0 +1,225 @@
+# search.py
+# Quick-Clip Clipboard Popup App
+#
+# Incremental search over the clipboard history. A trigram index maps every three-character
+# sequence to the clips containing it, so a query only looks at clips sharing its trigrams.
+# Results are ranked with exact substring matches first (newest first), then fuzzy matches: clips
+# holding every query word give or take SEARCH_TYPO_EDITS typos, found through the words' trigrams
+# (padded with spaces, so a word's first and last letters count). A search stops walking candidates
+# after SEARCH_TIME_BUDGET_MS and returns what it has, so a long query can't stall typing.
+# A "kind:<kind>" term in the query (kind:url, kind:json, ...) keeps only clips of that kind; the
+# kind comes from the clip's capture-time metadata, so filtering never reads the text, and the
+# index keeps the ids of each kind so a filter only walks the clips of that kind.
+#
+# Author: Tof-O
+# License: MIT
+
+import re, time
+from collections import deque
+from blobs import item_snippet
+from clipmeta import KINDS
+from settings import (SEARCH_INDEX_CHARS, SEARCH_TYPO_EDITS, SEARCH_FUZZY_MAX_CANDIDATES, SEARCH_TIME_BUDGET_MS,
+                      SEARCH_BUILD_CHUNK)
+
+_KIND_TERM = re.compile(r"(?:^|\s)kind:(\w+)(?=\s|$)", re.I)
+_WORD = re.compile(r"\w+")
+_SEPARATORS = re.compile(r"[^\w ]+")
+_CHECK_EVERY = 128  # Candidates walked between looks at the clock
+
+def parse_query(query):
+    """Split a "kind:<kind>" term off a search query; returns (rest of the query, kind or None)."""
+    match = _KIND_TERM.search(query)
+    if match is None or match.group(1).lower() not in KINDS:
+        return query, None
+    return (query[:match.start()] + query[match.end():]).strip(), match.group(1).lower()
+
+def trigrams(s):
+    """Return the set of trigrams of an already lowercased string."""
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def indexed_grams(lowered):
+    """Trigrams indexed for a clip: those of its text plus, with punctuation and line breaks read as
+    spaces, those that start or end its words."""
+    grams = trigrams(" " + lowered + " ")
+    if _SEPARATORS.search(lowered):
+        grams |= trigrams(" " + _SEPARATORS.sub(" ", lowered) + " ")
+    return grams
+
+def word_grams(word):
+    """Trigrams of a query word padded with spaces (as many as the word has letters), and how many of
+    them a clip word at most SEARCH_TYPO_EDITS typos away still contains: a typo breaks at most four
+    (a swap of two letters; an added, dropped or changed letter breaks three)."""
+    grams = trigrams(" " + word + " ")
+    if len(word) <= 3:
+        return grams, len(grams)  # Too short to tell a typo from another word
+    return grams, max(1, len(word) - 4 * SEARCH_TYPO_EDITS)
+
+class TrigramIndex:
+    """
+    Trigram index over clips, keyed by clip id and kept up to date as clips are
+    added, edited or removed. Only the first SEARCH_INDEX_CHARS characters of each clip
+    (the stored snippet for large clips) are indexed.
+    With deferred=True the initial items are indexed in chunks through build_step(),
+    so a large history doesn't block startup; a search finishes any remaining work first.
+    """
+    def __init__(self, items=(), deferred=False):
+        self._docs = {}      # id -> (seq, lowercased indexed prefix, item), oldest first
+        self._postings = {}  # trigram -> dict of ids (insertion order = oldest first)
+        self._kinds = {}     # kind -> dict of ids, like a posting
+        self._seq = 0
+        # Items are given newest first; index oldest first so newer clips get higher seq
+        self._pending = deque(reversed(list(items)))
+        self._dropped = set()  # Ids removed before their pending item was indexed
+        if not deferred:
+            self.build_step(None)
+
+    def __len__(self):
+        return len(self._docs) + len(self._pending)
+
+    def build_step(self, count=SEARCH_BUILD_CHUNK):
+        """Index up to count pending items (all if None); return True while work remains."""
+        while self._pending and (count is None or count > 0):
+            item = self._pending.popleft()
+            if item["id"] in self._dropped:
+                self._dropped.discard(item["id"])
+            else:
+                self._index(item)
+            if count is not None:
+                count -= 1
+        if not self._pending:
+            self._dropped.clear()
+        return bool(self._pending)
+
+    def add(self, item):
+        if self._pending:
+            # Keep recency order: newer clips are indexed after the pending older ones
+            self._pending.append(item)
+        else:
+            self._index(item)
+
+    def _index(self, item):
+        key = item["id"]
+        if key in self._docs:
+            self._unindex(key)
+        self._seq += 1
+        lowered = item_snippet(item)[:SEARCH_INDEX_CHARS].lower()
+        self._docs[key] = (self._seq, lowered, item, item.get("kind"))
+        self._kinds.setdefault(item.get("kind"), {})[key] = None
+        for gram in indexed_grams(lowered):
+            self._postings.setdefault(gram, {})[key] = None
+
+    def remove(self, clip_id):
+        if self._pending:
+            self._dropped.add(clip_id)
+        self._unindex(clip_id)
+
+    def _unindex(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        # The kind as indexed: an edited clip already carries its new one
+        self._kinds[doc[3]].pop(key, None)
+        for gram in indexed_grams(doc[1]):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.pop(key, None)
+                if not posting:
+                    del self._postings[gram]
+
+    def update(self, item):
+        """Re-index an edited item."""
+        self.remove(item["id"])
+        self.add(item)
+
+    def search(self, query, limit=50, kind=None):
+        """Return up to limit items matching query, best match first; with kind, only clips of that kind."""
+        query = query.lower()
+        if not query.strip() and kind is None:
+            return []
+        if self._pending:
+            self.build_step(None)
+        if len(query) < 3:
+            return self._search_short(query, limit, kind)
+        deadline = time.perf_counter() + SEARCH_TIME_BUDGET_MS / 1000
+        kinds = self._kinds.get(kind, {}) if kind is not None else None
+        results, seen = self._search_exact(query, limit, kinds, deadline)
+        if len(results) < limit:
+            results.extend(self._search_fuzzy(query, limit - len(results), kinds, seen, deadline))
+        return results
+
+    def _search_exact(self, query, limit, kinds, deadline):
+        """Clips containing query, newest first: walks the rarest trigram's posting (or the clips of
+        the kind, if fewer) backwards. Returns them and the set of their ids."""
+        grams = sorted(trigrams(query), key=lambda g: len(self._postings.get(g, ())))
+        postings = [self._postings.get(g, {}) for g in grams]
+        walk = kinds if kinds is not None and len(kinds) < len(postings[0]) else postings[0]
+        results, seen = [], set()
+        docs = self._docs
+        for n, key in enumerate(reversed(walk), 1):
+            if all(key in posting for posting in postings) and query in docs[key][1] and \
+                    (kinds is None or key in kinds):
+                results.append(docs[key][2])
+                seen.add(key)
+                if len(results) >= limit:
+                    break
+            if not n % _CHECK_EVERY and time.perf_counter() > deadline:
+                break
+        return results, seen
+
+    def _search_fuzzy(self, query, limit, kinds, seen, deadline):
+        """
+        Clips that hold every query word, give or take SEARCH_TYPO_EDITS typos per word, ranked by
+        the share of the words' trigrams they contain, then newest first. A match has at least the
+        required number of each word's trigrams, so it is in one of the rarest few postings of the
+        most selective word: only those are walked, newest first, up to SEARCH_FUZZY_MAX_CANDIDATES
+        clips or the deadline.
+        """
+        words = []
+        for word in dict.fromkeys(_WORD.findall(query)):
+            grams, needed = word_grams(word)
+            postings = sorted((self._postings.get(g, {}) for g in grams), key=len)
+            words.append((postings, needed))
+        if not words:
+            return []
+        walks = min((postings[:len(postings) - needed + 1] for postings, needed in words),
+                    key=lambda walk: sum(map(len, walk)))
+        if kinds is not None and len(kinds) < sum(map(len, walks)):
+            walks = [kinds]
+        total = sum(len(postings) for postings, needed in words)
+        scores = {}
+        checked = 0
+        for posting in walks:
+            for key in reversed(posting):
+                if key in seen or key in scores:
+                    continue
+                checked += 1
+                if checked > SEARCH_FUZZY_MAX_CANDIDATES or (not checked % _CHECK_EVERY and time.perf_counter() > deadline):
+                    break
+                if kinds is not None and key not in kinds:
+                    continue
+                shared = 0
+                for postings, needed in words:
+                    count = sum(1 for p in postings if key in p)
+                    if count < needed:
+                        break
+                    shared += count
+                else:
+                    scores[key] = shared / total
+            else:
+                continue
+            break
+        docs = self._docs
+        fuzzy = sorted(scores, key=lambda key: (-scores[key], -docs[key][0]))
+        return [docs[key][2] for key in fuzzy[:limit]]
+
+    def _search_short(self, query, limit, kind=None):
+        """Queries under three characters (or just a kind): walk clips newest first and stop at limit hits."""
+        hits = []
+        docs = self._docs
+        for key in reversed(self._kinds.get(kind, {}) if kind is not None else docs):
+            lowered, item = docs[key][1], docs[key][2]
+            if query in lowered:
+                hits.append(item)
+                if len(hits) >= limit:
+                    break
+        return hits
@@ -0,0 +1,354 @@
+# service.py
+# Quick-Clip Clipboard Popup App
+#
+# Local history service. The running app serves its history (store, dedup, search and
+# near-duplicate indexes, all already in memory) over a QLocalServer named SERVICE_NAME, so other
+# front-ends query and change that one copy instead of re-reading copy.json, and only one
+# instance ever writes the history: a second one asks the first to show its popup and exits.
+# Requests are handled on the GUI thread between events, so they see exactly what the popup does.
+#
+# The protocol is one JSON value per line. A request is {"op": ..., ...}; a line holding a list
+# of requests is a batch, answered with one line holding the list of responses, in order.
+# Responses are {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+#   {"op": "query", "q": "kind:url github", "limit": 20, "offset": 0}   row summaries, best match first
+#   {"op": "get", "ids": [12, 15]}       full clips (null for a missing id)
+#   {"op": "insert", "text": "..."}      {"id": new id or null, "duplicate": bool}
+#   {"op": "edit", "id": 12, "text": "..."}
+#   {"op": "paste", "id": 12}            record a paste of the clip, as pasting from the popup does:
+#                                        {"id", "last_paste", "pastes" (the clip's paste count)}
+#   {"op": "delete", "id": 12}           remove the clip (pinned or not): {"id"}
+#   {"op": "count"}                      number of clips
+#   {"op": "show"}                       open the popup
+#
+#   python service.py query github --limit 5
+#   python service.py get 12
+#   echo hello | python service.py insert
+#
+# Author: Tof-O
+# License: MIT
+
+import sys, json, argparse, logging
+from PySide6.QtCore import QObject
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+from settings import SERVICE_NAME, SERVICE_TIMEOUT_MS, SERVICE_QUERY_LIMIT
+
+log = logging.getLogger(__name__)
+
+class ServiceError(Exception):
+    """A request the history service answered with an error."""
+
+def summary(item):
+    """What a query returns per clip: the fields a history row shows, without the text."""
+    return {"id": item["id"], "label": item.get("label", ""), "kind": item.get("kind"), "bytes": item.get("bytes"),
+            "lines": item.get("lines"), "time": item.get("time"), "pinned": bool(item.get("pinned")),
+            "last_paste": item.get("last_paste"), "pastes": item.get("pastes", 0)}
+
+class HistoryService(QObject):
+    """Serves the history of a HotkeyListener to local clients; see the protocol above."""
+    def __init__(self, listener, name=SERVICE_NAME, parent=None):
+        super().__init__(parent)
+        self.listener = listener
+        self.name = name
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)  # Only this user may connect
+        self.server.newConnection.connect(self._on_new_connection)
+        self._buffers = {}  # Connected socket -> bytes received after its last complete line
+        self.ops = {"query": self.query, "get": self.get, "insert": self.insert, "edit": self.edit,
+                    "paste": self.paste, "delete": self.delete, "count": self.count, "show": self.show}
+
+    def start(self):
+        """Start listening; False if another instance already serves the name."""
+        # Checked first: with UserAccessOption, listen() on Unix replaces a live socket instead of failing
+        if service_running(self.name):
+            return False
+        if self.server.listen(self.name):
+            return True
+        # Left behind by an instance that did not shut down cleanly
+        QLocalServer.removeServer(self.name)
+        return self.server.listen(self.name)
+
+    def close(self):
+        self.server.close()
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self._buffers[socket] = bytearray()
+            socket.readyRead.connect(lambda socket=socket: self._on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self._on_disconnected(socket))
+
+    def _on_ready_read(self, socket):
+        buffer = self._buffers.get(socket)
+        if buffer is None:
+            return
+        buffer += bytes(socket.readAll())
+        replies = []
+        while True:
+            end = buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(buffer[:end])
+            del buffer[:end + 1]
+            if line.strip():
+                replies.append(self.handle_line(line))
+        if replies:
+            socket.write(b"".join(replies))
+
+    def _on_disconnected(self, socket):
+        self._buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def handle_line(self, line):
+        """Encoded reply line for a request line (a request or a batch of them)."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {"ok": False, "error": f"invalid JSON: {e}"}
+        else:
+            response = [self.handle(r) for r in request] if isinstance(request, list) else self.handle(request)
+        return json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n"
+
+    def handle(self, request):
+        """Response to a single request."""
+        op = request.get("op") if isinstance(request, dict) else None
+        if op not in self.ops:
+            return {"ok": False, "error": f"unknown op: {op!r}"}
+        try:
+            return {"ok": True, "result": self.ops[op](request)}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": f"bad {op} request: {e}"}
+        except Exception as e:
+            log.warning("History service failed on %s: %s", op, e)
+            return {"ok": False, "error": str(e)}
+
+    def _clip(self, request):
+        from text import find_clip
+        clip_id = int(request["id"])
+        item = find_clip(self.listener.items, clip_id, self.listener.store)
+        if item is None:
+            raise ValueError(f"no clip {clip_id}")
+        return item
+
+    @staticmethod
+    def _text(request):
+        text = request["text"]
+        if not isinstance(text, str) or not text:
+            raise ValueError("text must be a non-empty string")
+        return text
+
+    def _paged_store(self):
+        """The store if reads go to it (paged backends), with queued writes applied first; else None."""
+        store = self.listener.store
+        if not store.paged:
+            return None
+        if store.pending:
+            store.flush()
+        return store
+
+    def query(self, request):
+        from search import parse_query
+        listener = self.listener
+        limit = int(request.get("limit", SERVICE_QUERY_LIMIT))
+        offset = int(request.get("offset", 0))
+        text, kind = parse_query(request.get("q", ""))
+        store = self._paged_store()
+        if not text.strip() and kind is None:
+            clips = listener.items[offset:offset + limit]
+            if len(clips) < limit and store is not None:
+                clips += store.recent(limit - len(clips), offset + len(clips))
+        elif store is not None:
+            clips = store.search(text, offset + limit, kind=kind)[offset:]
+        else:
+            clips = listener.search_index.search(text, offset + limit, kind=kind)[offset:]
+        return [summary(item) for item in clips]
+
+    def get(self, request):
+        from archive import export_record
+        from text import find_clip
+        ids = request["ids"] if "ids" in request else [request["id"]]
+        clips = [find_clip(self.listener.items, int(clip_id), self.listener.store) for clip_id in ids]
+        return [export_record(item) if item is not None else None for item in clips]
+
+    def insert(self, request):
+        item = self.listener.add_text(self._text(request))
+        return {"id": item["id"] if item is not None else None, "duplicate": item is None}
+
+    def edit(self, request):
+        from text import update_clipboard_item
+        listener = self.listener
+        text = self._text(request)
+        clip_id = self._clip(request)["id"]
+        update_clipboard_item(listener.items, clip_id, text, listener.dedup, listener.store, listener.search_index,
+                              listener.clusters)
+        if listener.popup is not None:
+            listener.popup.clip_changed(clip_id)
+        return summary(self._clip(request))
+
+    def paste(self, request):
+        from text import record_paste
+        item = record_paste(self.listener.items, self._clip(request)["id"], self.listener.store)
+        return {"id": item["id"], "last_paste": item["last_paste"], "pastes": item["pastes"]}
+
+    def delete(self, request):
+        from text import remove_clipboard_item
+        listener = self.listener
+        item = remove_clipboard_item(listener.items, self._clip(request)["id"], listener.dedup, listener.store,
+                                     listener.search_index, listener.clusters)
+        if listener.popup is not None:
+            listener.popup.history_model.set_items(listener.items)
+        return {"id": item["id"]}
+
+    def count(self, request):
+        store = self._paged_store()
+        return store.count() if store is not None else len(self.listener.items)
+
+    def show(self, request):
+        self.listener.show_popup_signal.emit("")
+
+class ServiceClient:
+    """Blocking connection to the history service of a running instance; raises ConnectionError if there is none."""
+    def __init__(self, name=SERVICE_NAME, timeout_ms=SERVICE_TIMEOUT_MS):
+        self.timeout_ms = timeout_ms
+        self.socket = QLocalSocket()
+        self.socket.connectToServer(name)
+        if not self.socket.waitForConnected(timeout_ms):
+            raise ConnectionError("Quick-Clip is not running")
+        self._buffer = bytearray()
+
+    def batch(self, requests):
+        """Send requests in one round trip; returns their responses in order."""
+        self._send(list(requests))
+        return self._receive()
+
+    def call(self, op, **args):
+        """Send one request; returns its result, or raises ServiceError."""
+        response = self.batch([dict(args, op=op)])[0]
+        if not response["ok"]:
+            raise ServiceError(response["error"])
+        return response["result"]
+
+    def _send(self, request):
+        self.socket.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b"\n")
+        while self.socket.bytesToWrite() > 0:
+            if not self.socket.waitForBytesWritten(self.timeout_ms):
+                raise ConnectionError(f"Sending to Quick-Clip failed ({self.socket.errorString()})")
+
+    def _receive(self):
+        self._buffer += bytes(self.socket.readAll())
+        while b"\n" not in self._buffer:
+            if not self.socket.waitForReadyRead(self.timeout_ms):
+                raise ConnectionError(f"No reply from Quick-Clip ({self.socket.errorString()})")
+            self._buffer += bytes(self.socket.readAll())
+        end = self._buffer.index(b"\n")
+        line = bytes(self._buffer[:end])
+        del self._buffer[:end + 1]
+        return json.loads(line)
+
+    def close(self):
+        self.socket.disconnectFromServer()
+
+def service_running(name=SERVICE_NAME):
+    """Whether an instance is serving the history under name."""
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    running = socket.waitForConnected(SERVICE_TIMEOUT_MS)
+    socket.abort()
+    return running
+
+def show_running(name=SERVICE_NAME):
+    """Ask a running instance to show its popup; False if none is running."""
+    try:
+        client = ServiceClient(name)
+    except ConnectionError:
+        return False
+    try:
+        client.call("show")
+    except (ConnectionError, ServiceError):
+        return False
+    finally:
+        client.close()
+    return True
+
+def _text_arg(text):
+    """The text argument of insert / edit, or stdin when it is omitted."""
+    if text is not None:
+        return text
+    if hasattr(sys.stdin, "reconfigure"):
+        sys.stdin.reconfigure(encoding="utf-8")
+    return sys.stdin.read()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query and change the history of the running Quick-Clip")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query = commands.add_parser("query", help="list clips matching a search (newest clips without one)")
+    query.add_argument("q", nargs="?", default="", help='search text; "kind:<kind>" filters by kind')
+    query.add_argument("--limit", type=int, default=SERVICE_QUERY_LIMIT)
+    query.add_argument("--offset", type=int, default=0)
+    get = commands.add_parser("get", help="print the text of clips")
+    get.add_argument("ids", type=int, nargs="+")
+    insert = commands.add_parser("insert", help="add a clip (text from stdin if omitted)")
+    insert.add_argument("text", nargs="?")
+    edit = commands.add_parser("edit", help="replace the text of a clip (from stdin if omitted)")
+    edit.add_argument("id", type=int)
+    edit.add_argument("text", nargs="?")
+    paste = commands.add_parser("paste", help="record a paste of a clip")
+    paste.add_argument("id", type=int)
+    delete = commands.add_parser("delete", help="remove a clip")
+    delete.add_argument("id", type=int)
+    commands.add_parser("count", help="print the number of clips")
+    commands.add_parser("show", help="open the popup")
+    for command in commands.choices.values():
+        command.add_argument("--json", action="store_true", help="print the raw JSON result")
+    args = parser.parse_args(argv)
+
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(encoding="utf-8")
+    try:
+        client = ServiceClient()
+    except ConnectionError as e:
+        print(e, file=sys.stderr)
+        return 1
+    try:
+        if args.command == "query":
+            result = client.call("query", q=args.q, limit=args.limit, offset=args.offset)
+        elif args.command == "get":
+            result = client.call("get", ids=args.ids)
+        elif args.command in ("insert", "edit"):
+            fields = {"text": _text_arg(args.text)}
+            if args.command == "edit":
+                fields["id"] = args.id
+            result = client.call(args.command, **fields)
+        elif args.command in ("paste", "delete"):
+            result = client.call(args.command, id=args.id)
+        else:
+            result = client.call(args.command)
+    except (ConnectionError, ServiceError) as e:
+        print(f"{args.command.capitalize()} failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+    elif args.command == "query":
+        from history import format_ts
+        for row in result:
+            print(f"{row['id']:>7}  {format_ts(row['time']).strip() if row['time'] else '':<17}  {row['kind'] or '':<5}  {row['label']}")
+    elif args.command == "get":
+        for clip_id, clip in zip(args.ids, result):
+            if clip is None:
+                print(f"No clip {clip_id}", file=sys.stderr)
+            else:
+                print(clip["text"])
+        if None in result:
+            return 1
+    elif args.command == "insert":
+        print("Already in the history" if result["duplicate"] else f"Added clip {result['id']}")
+    elif args.command == "delete":
+        print(f"Deleted clip {result['id']}")
+    elif args.command == "count":
+        print(result)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
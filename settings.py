@@ -10,6 +10,8 @@
 WINDOW_WIDTH = 350
 WINDOW_HEIGHT = 400
 DEFAULT_THEME = "light"
+POPUP_SHOW_TARGET_MS = 50  # Ctrl+V-to-visible latency budget for the popup
+POPUP_PREWARM_DELAY_MS = 250  # Delay after startup before the popup is built in the background
 
 THEME_COLORS = {
     "light": {
@@ -30,6 +32,14 @@ THEME_COLORS = {
     }
 }
 
+# Clipboard capture: "signal" listens to QClipboard.dataChanged, "poll" uses an
+# adaptive timer, "auto" picks "poll" only on platforms where the signal is unreliable.
+CLIPBOARD_CAPTURE_MODE = "auto"
+CLIPBOARD_UNRELIABLE_PLATFORMS = ("wayland", "wayland-egl")
+CLIPBOARD_POLL_MIN_MS = 100
+CLIPBOARD_POLL_MAX_MS = 2000
+CLIPBOARD_POLL_BACKOFF = 1.5
+
 BUTTON_CONFIG = {
     "theme": {"text_light": "🌙", "text_dark": "☀️", "size": (32, 32)},
     "close": {"text": "✕", "size": (32, 32)},
@@ -39,16 +49,97 @@ BUTTON_CONFIG = {
     "save": {"text": "💾 Save", "size": (70, 32)},
     "cancel": {"text": "Cancel", "size": (80, 32)},
     "tab_paste": {"text": "📋", "size": (32, 28)},
-    "tab_bullet": {"text": "⋮"}
+    "tab_bullet": {"text": "⋮"},
+    "tab_pinned": {"text": "📌"},
+    "tab_collapsed": {"text": "▸"},
+    "tab_expanded": {"text": "▾"},
+    "tab_member": {"text": "↳"},
+    "pin": {"text_pin": "📌 Pin", "text_unpin": "📌 Unpin", "size": (80, 28)}
 }
 
-import os, json
+import os
 try:
     import winshell
 except ImportError:
     winshell = None
 
 COPY_FILE = os.path.join(os.path.dirname(__file__), 'copy.json')
+COPY_JOURNAL_FILE = os.path.join(os.path.dirname(__file__), 'copy.journal')
+JOURNAL_COMPACT_EVERY = 200  # Journal records before compacting into a new snapshot
+PERSIST_DEBOUNCE_MS = 500  # Quiet period before the background writer saves a burst of changes
+PERSIST_MAX_DELAY_MS = 5000  # Longest a change may wait while a burst keeps going
+# History backend: "journal" (copy.json + copy.journal) or "sqlite" (copy.db)
+HISTORY_BACKEND = "journal"
+HISTORY_DB_FILE = os.path.join(os.path.dirname(__file__), 'copy.db')
+HISTORY_PAGE_SIZE = 200  # Items loaded at startup by paged backends
+# Bulk import/export (archive.py) streams the history instead of loading it
+STREAM_CHUNK_CHARS = 1024 * 1024  # Characters read at a time from a snapshot or import file
+IMPORT_BATCH = 1000  # Rows per sqlite transaction on import, and per read on export
+# History service (service.py): the running app serves its history to other front-ends over a
+# local socket, and a second instance hands over to the first instead of loading its own copy
+SERVICE_ENABLED = True
+SERVICE_NAME = "quick-clip-" + (os.environ.get("USERNAME") or os.environ.get("USER") or "user")
+SERVICE_TIMEOUT_MS = 2000  # Longest a client waits to connect or for a reply
+SERVICE_QUERY_LIMIT = 50  # Clips a query returns unless it gives a limit
+# Clips longer than this many characters are stored once in BLOB_DIR and loaded lazily
+BLOB_DIR = os.path.join(os.path.dirname(__file__), 'blobs')
+BLOB_THRESHOLD = 64 * 1024
+BLOB_SNIPPET_CHARS = 1024  # Leading characters kept in the history for large clips
+PREVIEW_LABEL_MAX_CHARS = 10000  # Longer previews use a scrollable read-only viewer
+PREVIEW_CHUNK_CHARS = 200000  # The viewer loads large previews in chunks of this size
+SEARCH_INDEX_CHARS = 4096  # Leading characters of each clip covered by the search index
+SEARCH_TYPO_EDITS = 1  # Typos (letters added, dropped, changed or swapped) a fuzzy match may have per query word
+SEARCH_FUZZY_MAX_CANDIDATES = 2000  # Most recent candidates scored per fuzzy query
+SEARCH_TIME_BUDGET_MS = 8  # A search returns what it has found after this long (the budget per keystroke is 10 ms)
+SEARCH_BUILD_CHUNK = 500  # Items indexed per event-loop tick while building the search index
+SEARCH_RESULT_LIMIT = 100
+# Retention: least recently copied/pasted clips beyond these limits are evicted (None = no limit).
+# Pinned clips are exempt.
+# All off by default: a limit set here evicts older clips on the next start, e.g.
+# RETENTION_MAX_ITEMS = 10000, RETENTION_MAX_BYTES = 256 * 1024 * 1024
+RETENTION_MAX_ITEMS = None
+RETENTION_MAX_BYTES = None
+RETENTION_MAX_AGE_DAYS = None
+RETENTION_CHECK_EVERY = 50  # New clips between retention runs
+RETENTION_INTERVAL_MS = 60 * 60 * 1000  # Periodic run, so the age limit applies while idle
+RETENTION_CHUNK = 1000  # Clips evicted per event-loop tick
+# Capture-time clip metadata (clipmeta.py)
+CLIP_LABEL_CHARS = 60  # One-line label shown in the history list
+KIND_SCAN_CHARS = 4096  # Leading characters looked at to detect a clip's kind (url, json, code, path, plain)
+KIND_JSON_MAX_CHARS = 64 * 1024  # Longer clips that look like JSON are not parsed to confirm it
+# Near-duplicate clustering (neardup.py): similar clips are grouped under one collapsible entry.
+# Off by default; with the sqlite backend only the loaded pages of the history are clustered
+NEARDUP_ENABLED = False
+NEARDUP_MAX_DISTANCE = 5  # Most SimHash bits (of 63) two clips may differ in to be near duplicates
+NEARDUP_MIN_TOKENS = 4  # Clips with fewer words are only ever exact duplicates
+NEARDUP_SCAN_CHARS = 2048  # Leading characters hashed
+NEARDUP_MAX_CANDIDATES = 200  # Most clips compared per new clip
+NEARDUP_MIN_SIMILARITY = 0.75  # Share of distinct words (Jaccard) a SimHash match must have in common to join its cluster
+# Rich clipboard capture: images (stored as PNG in IMAGE_DIR), HTML and file/URI lists
+CAPTURE_IMAGES = True
+CAPTURE_HTML = True
+CAPTURE_URIS = True
+HTML_MAX_CHARS = 64 * 1024  # Longer HTML is dropped; the clip keeps its plain text
+IMAGE_DIR = os.path.join(os.path.dirname(__file__), 'images')
+THUMBNAIL_SIZE = 40  # Pixels; list thumbnails, generated off the GUI thread and cached on disk
+IMAGE_PREVIEW_SIZE = 320  # Pixels; image shown on the preview page
+THUMBNAIL_CACHE_ITEMS = 200  # Decoded thumbnails kept in memory
+# Level of the log messages written to stderr (background failures: WARNING; retention reports: INFO)
+LOG_LEVEL = "WARNING"
+# Hot-path tracing (tracing.py); also enabled with main.py --trace / --trace-overlay
+TRACING_ENABLED = False
+TRACE_WINDOW = 1000  # Recent samples per span used for the p50/p95/p99 histograms
+TRACE_FILE = os.path.join(os.path.dirname(__file__), 'trace.jsonl')  # JSON-lines export (None to disable)
+TRACE_FLUSH_EVERY = 64  # Spans buffered before the background writer appends them to TRACE_FILE
+TRACE_OVERLAY = False  # Show the latest span timings in the popup
+# Paste keystroke (paste.py): "win32", "xtest" (X11, needs python-xlib), "uinput" (Linux, needs
+# python-evdev and /dev/uinput access), "fake" (records pastes, for tests) or "auto"
+PASTE_BACKEND = "auto"
+PASTE_POLL_MS = 5  # How often focus is checked after the popup hides
+PASTE_READY_TIMEOUT_MS = 250  # Paste anyway if focus hasn't returned to the target window by then
+# Edit page
+EDIT_NO_WRAP_CHARS = 256 * 1024  # Longer clips are edited without line wrapping, so only visible lines are laid out
+EDIT_INDICATOR_DELAY_MS = 150  # Line/size indicator refresh after typing stops
 
 def add_to_startup():
     """Add this app to Windows startup using a shortcut."""
@@ -67,39 +158,25 @@ def add_to_startup():
     return True
 
 def load_copies():
-    """Load clipboard history from copy.json."""
-    if os.path.exists(COPY_FILE):
-        try:
-            with open(COPY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return []
-    return []
+    """Load clipboard history from copy.json, replaying the journal on top of it."""
+    from store import get_store
+    from tracing import span
+    with span("load_copies"):
+        return get_store().load()
 
 def save_copies(items):
-    """Save clipboard history to copy.json."""
-    try:
-        with open(COPY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(items, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    """Save the full clipboard history to copy.json and clear the journal."""
+    from store import get_store
+    get_store().compact(items)
+
 CONFIG_PATH = os.path.join(os.path.expanduser("~"), ".clipboard_popup_theme.json")
 
 def load_theme():
-    """Load the theme from the configuration file."""
-    if os.path.exists(CONFIG_PATH):
-        try:
-            with open(CONFIG_PATH, "r") as f:
-                data = json.load(f)
-                return data.get("theme", DEFAULT_THEME)
-        except Exception:
-            return DEFAULT_THEME
-    return DEFAULT_THEME
+    """Return the current theme from the config service (no disk access after startup)."""
+    from config import get_config
+    return get_config().theme
 
 def save_theme(theme):
-    """Save the selected theme to the configuration file."""
-    try:
-        with open(CONFIG_PATH, "w") as f:
-            json.dump({"theme": theme}, f)
-    except Exception:
-        pass
+    """Save the selected theme through the config service."""
+    from config import get_config
+    get_config().set_theme(theme)
@@ -0,0 +1,70 @@
+# startup.py
+# Quick-Clip Clipboard Popup App
+#
+# Startup timing report for `python main.py --startup-profile[=report.json]`.
+# Records how long imports, QApplication and HotkeyListener construction take, when the
+# event loop starts, how long the background popup build takes and the first popup latency.
+#
+# Author: Tof-O
+# License: MIT
+
+import json, time, logging
+
+log = logging.getLogger(__name__)
+
+PROFILE_FLAG = "--startup-profile"
+
+def profile_arg(argv):
+    """Return (enabled, report path or None) for the --startup-profile flag."""
+    for arg in argv:
+        if arg == PROFILE_FLAG:
+            return True, None
+        if arg.startswith(PROFILE_FLAG + "="):
+            return True, arg.split("=", 1)[1]
+    return False, None
+
+class StartupProfile:
+    """
+    Startup milestones in ms since start (a time.perf_counter() value taken first thing in main.py).
+    The report is printed once the first popup has been shown, or on quit if it never was.
+    """
+    def __init__(self, start, path=None):
+        self.start = start
+        self.path = path
+        self.marks = {}
+        self.durations = {}
+        self.reported = False
+    def mark(self, name, at=None):
+        self.marks[name] = ((time.perf_counter() if at is None else at) - self.start) * 1000
+    def attach(self, app, listener):
+        """Follow the listener until the first popup is shown."""
+        from PySide6.QtCore import QTimer
+        QTimer.singleShot(0, lambda: self.mark("event_loop"))
+        def on_ready(build_ms):
+            self.mark("popup_ready")
+            self.durations["popup_build"] = build_ms
+        def on_shown(latency_ms):
+            if "first_popup" not in self.durations:
+                self.mark("first_popup")
+                self.durations["first_popup"] = latency_ms
+                self.report()
+        listener.popup_ready.connect(on_ready)
+        listener.popup_shown.connect(on_shown)
+        app.aboutToQuit.connect(self.report)
+    def as_dict(self):
+        return {"marks_ms": self.marks, "durations_ms": self.durations}
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        print("Startup profile (ms since start):")
+        for name, ms in self.marks.items():
+            print(f"  {name:<16} {ms:9.1f}")
+        for name, ms in self.durations.items():
+            print(f"  {name + ' took':<16} {ms:9.1f}")
+        if self.path:
+            try:
+                with open(self.path, "w") as f:
+                    json.dump(self.as_dict(), f, indent=2)
+            except Exception as e:
+                log.warning("Writing startup profile failed: %s", e)
@@ -0,0 +1,978 @@
+# store.py
+# Quick-Clip Clipboard Popup App
+#
+# Persistent clipboard history storage. New clips, edits and deletions are appended to a
+# small journal file; the journal is periodically compacted into a snapshot that is written
+# to a temp file and atomically renamed over copy.json. Loading replays the journal onto the
+# last good snapshot, and legacy copy.json files (a bare JSON list, or an older snapshot whose
+# clips have no ids or carry display timestamps instead of epoch times) are migrated on load.
+# Clips are identified by the stable id they get at capture.
+# An optional SQLite backend (WAL mode, FTS5 search, paged loading) offers the same surface,
+# and PersistWorker applies writes to either backend on a background thread. Both backends can
+# also be read and bulk-imported as a stream (iter_items / import_stream, used by archive.py)
+# without holding the history in memory.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, re, json, hashlib, time, logging
+import settings, tracing
+from history import ClipHistory, Clip
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 5  # 4: clips carry capture-time metadata, 5: and a SimHash (older snapshots are rewritten once with it)
+TS_FORMAT = ' %d-%m-%Y, %H:%M'
+
+def normalize_text(s):
+    """Normalize text for deduplication: drop whitespace and NUL chars, lowercase."""
+    return ''.join(s.split()).replace('\u0000', '').lower()
+
+def clip_fingerprint(s):
+    """Return a short hash of the normalized text, used as the dedup key."""
+    data = normalize_text(s).encode('utf-8', 'surrogatepass')
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+_WHITESPACE = re.compile(r'\s*')
+
+class _JsonStream:
+    """Reads JSON values one at a time from a text file through a buffer that only grows to fit the current value."""
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size):
+        chunk = self.f.read(size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return bool(chunk)
+
+    def peek(self):
+        """Next non-whitespace character ("" at the end of the file), without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(settings.STREAM_CHUNK_CHARS):
+                return ''
+
+    def value(self):
+        """Decode the next value."""
+        self.peek()
+        size = settings.STREAM_CHUNK_CHARS
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number running up to the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+def iter_json_items(path, header=None):
+    """
+    Yield the items of a snapshot ({"version": ..., "next_id": ..., "items": [...]}) or of a
+    legacy copy.json list one at a time, with memory bounded by the largest item rather than
+    the file. Top-level snapshot fields before "items" are put in header.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        first = stream.peek()
+        if first == '{':
+            stream.pos += 1
+            while True:
+                c = stream.peek()
+                if c == ',':
+                    stream.pos += 1
+                    continue
+                if c in ('}', ''):
+                    return
+                key = stream.value()
+                if stream.peek() != ':':
+                    raise ValueError(f"{path}: malformed snapshot")
+                stream.pos += 1
+                if key == "items":
+                    first = stream.peek()
+                    break
+                value = stream.value()
+                if header is not None:
+                    header[key] = value
+        if first == '':
+            return
+        if first != '[':
+            raise ValueError(f"{path}: not a clip list or snapshot")
+        stream.pos += 1
+        while True:
+            c = stream.peek()
+            if c == ',':
+                stream.pos += 1
+            elif c == ']':
+                return  # Anything after the items is not needed
+            elif c == '':
+                raise ValueError(f"{path}: truncated")
+            else:
+                yield stream.value()
+
+class JournalStore:
+    """
+    Append-only journaled history store.
+    The snapshot holds {"version": ..., "next_id": ..., "items": [...]} with Clip.to_dict() items;
+    the journal holds one JSON record per line: {"op": "add", "item": {...}}, {"op": "edit", "id": <id>, "text": ...},
+    {"op": "meta", "id": <id>, "fields": {...}} or {"op": "del", "id": <id>}, where edits of
+    large clips carry blob/size/snippet instead of text, and all edits the new fp and
+    metadata (label/bytes/lines/kind). Version 1 journals, which name
+    clips by their content key instead of an id, are still replayed.
+    """
+    paged = False  # load() returns the whole history
+
+    def __init__(self, snapshot_path, journal_path, compact_every=settings.JOURNAL_COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.items = None  # ClipHistory returned by load(), used for periodic compaction
+        self._journal_records = 0
+
+    def load(self):
+        """Load the snapshot, replay the journal onto it and return the history."""
+        items, next_id, legacy = self._read_snapshot()
+        # Legacy clips without an id get one here, oldest first
+        items = ClipHistory(items, next_id)
+        replayed, torn = self._replay_journal(items)
+        self.items = items
+        self._journal_records = replayed
+        if legacy or torn or replayed >= self.compact_every:
+            self.compact()
+        return items
+
+    def _read_snapshot(self):
+        """Return (items, next id, needs migration) from the snapshot file."""
+        if not os.path.exists(self.snapshot_path):
+            return [], 1, False
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            # Keep the unreadable file around instead of overwriting it on the next compaction
+            try:
+                os.replace(self.snapshot_path, self.snapshot_path + '.corrupt')
+            except OSError:
+                pass
+            return [], 1, False
+        if isinstance(data, list):
+            return data, 1, True
+        return data.get("items", []), data.get("next_id", 1), data.get("version", 1) < SNAPSHOT_VERSION
+
+    def _read_journal(self):
+        """Journal records, up to a torn last line."""
+        records = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        return records
+
+    def iter_items(self):
+        """
+        Yield the history newest first without loading it: the snapshot is streamed and the
+        journal (the few hundred records since the last compaction) is applied on the way.
+        """
+        records = self._read_journal()
+        if any("id" not in record and record.get("op") != "add" for record in records):
+            yield from self.load()  # Version 1 records name clips by content; replay them properly
+            return
+        recent = ClipHistory()  # Clips added since the snapshot
+        patches = {}  # Id of a snapshot clip -> records that change it
+        for record in records:
+            if record.get("op") == "add" or recent.get(record["id"]) is not None:
+                apply_record(recent, record)
+            else:
+                patches.setdefault(record["id"], []).append(record)
+        yield from recent
+        if not os.path.exists(self.snapshot_path):
+            return
+        for data in iter_json_items(self.snapshot_path):
+            item = Clip.from_dict(data)
+            if item.id in patches:
+                single = ClipHistory([item])
+                for record in patches[item.id]:
+                    apply_record(single, record)
+                item = single.get(item.id)
+                if item is None:
+                    continue
+            yield item
+
+    def next_id(self):
+        """First id not used by the snapshot or the journal, read without loading the history."""
+        header = {}
+        first = None
+        if os.path.exists(self.snapshot_path):
+            items = iter_json_items(self.snapshot_path, header)
+            first = next(items, None)  # The header comes before it
+            items.close()
+        next_id = header.get("next_id", 1)
+        if isinstance(first, dict) and isinstance(first.get("id"), int):
+            # After import_stream() the newest clips are the imported ones, with ids past the header's
+            next_id = max(next_id, first["id"] + 1)
+        for record in self._read_journal():
+            if record.get("op") == "add" and isinstance(record["item"].get("id"), int):
+                next_id = max(next_id, record["item"]["id"] + 1)
+        return next_id
+
+    def import_stream(self, items):
+        """
+        Put items (newest first, with ids that no clip uses) in front of the history by
+        streaming a new snapshot: the items, then the current snapshot's clips as they are.
+        The journal is left alone and still applies on top. Returns the number imported.
+        """
+        header = {}
+        snapshot = os.path.exists(self.snapshot_path)
+        existing = iter_json_items(self.snapshot_path, header) if snapshot else iter(())
+        first = next(existing, None)
+        # An older snapshot keeps its version, so the next load still migrates its clips
+        version = min(header.get("version", 1), SNAPSHOT_VERSION) if snapshot else SNAPSHOT_VERSION
+        tmp_path = self.snapshot_path + '.tmp'
+        count = 0
+        next_id = header.get("next_id", 1)
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # The header comes first, so next_id is left to the ids in the items (ClipHistory goes past them)
+                f.write('{"version": %d, "next_id": %d, "items": [' % (version, next_id))
+                separator = ''
+                for item in items:
+                    f.write(separator + json.dumps(item.to_dict(), ensure_ascii=False))
+                    separator = ', '
+                    count += 1
+                if first is not None:
+                    f.write(separator + json.dumps(first, ensure_ascii=False))
+                    for data in existing:
+                        f.write(', ' + json.dumps(data, ensure_ascii=False))
+                f.write(']}')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        finally:
+            if snapshot:
+                existing.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return count
+
+    def _replay_journal(self, items):
+        """Apply journal records to items in order; return (records applied, torn tail found)."""
+        if not os.path.exists(self.journal_path):
+            return 0, False
+        count = 0
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append; nothing after it is trustworthy
+                    return count, True
+                apply_record(items, record)
+                count += 1
+        return count, False
+
+    def _write(self, records):
+        """Append records to the journal in a single write."""
+        if not records:
+            return True
+        try:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+        except Exception:
+            return False
+        self._journal_records += len(records)
+        return True
+
+    def _append(self, record):
+        if self._write([record]) and self._journal_records >= self.compact_every and self.items is not None:
+            self.compact()
+
+    def apply(self, ops):
+        """
+        Apply a batch of queued (op, args) operations from the persistence worker.
+        Consecutive journal records go out in one write; compaction is left to the caller.
+        """
+        records = []
+        for op, args in ops:
+            if op == "compact":
+                self._write(records)
+                records = []
+                if args[0] is not None:
+                    self._write_snapshot(args[0])
+            elif op in ("delete_blob", "delete_image"):
+                # Only once the removal is in the journal, and only if no clip still uses the file
+                self._write(records)
+                records = []
+                (self._delete_blob if op == "delete_blob" else self._delete_image)(*args)
+            else:
+                records.append(journal_record(op, *args))
+        self._write(records)
+
+    def snapshot(self):
+        """Copy of the history for a compaction queued from the GUI thread."""
+        return None if self.items is None else ClipHistory([item.copy() for item in self.items], self.items.next_id)
+
+    def append(self, item):
+        """Record a new clip inserted at the front of the history."""
+        self._append(journal_record("append", item))
+
+    def edit(self, item):
+        """Record that the clip with item's id now has item's content."""
+        self._append(journal_record("edit", item))
+
+    def remove(self, clip_id):
+        """Record the removal of a clip."""
+        self._append(journal_record("remove", clip_id))
+
+    def set_meta(self, clip_id, fields):
+        """Record metadata changes (pinned, last_paste, pastes, cluster) of a clip."""
+        self._append(journal_record("meta", clip_id, fields))
+
+    def evict(self, clip_id, blob=None, image=None):
+        """Record the removal of a clip and drop its blob or image."""
+        self._append(journal_record("evict", clip_id))
+        self.release(blob, image)
+
+    def release(self, blob=None, image=None):
+        """Drop a blob / image that a removed or edited clip used, unless another clip still uses it."""
+        if blob:
+            self._delete_blob(blob)
+        if image:
+            self._delete_image(image)
+
+    def _referenced(self, field, digest):
+        """Whether any clip still uses a blob / image (runs on the persistence worker)."""
+        for attempt in range(3):
+            try:
+                return any(item.get(field) == digest for item in list(self.items or []))
+            except RuntimeError:
+                # The GUI thread changed the history mid-copy; try again
+                pass
+        return True
+
+    def _delete_blob(self, digest):
+        from blobs import delete_blob
+        if not self._referenced("blob", digest):
+            delete_blob(digest)
+
+    def _delete_image(self, digest):
+        from images import delete_image
+        if not self._referenced("image", digest):
+            delete_image(digest)
+
+    def recent(self, limit, offset=0):
+        """Return up to limit of the most recent items, skipping the first offset."""
+        return (self.items or [])[offset:offset + limit]
+
+    def between(self, start, end, limit=None):
+        """Return items captured between two epoch times, newest first."""
+        found = [item for item in self.items or [] if item.time is not None and start <= item.time <= end]
+        return found if limit is None else found[:limit]
+
+    def search(self, query, limit=50, kind=None):
+        """Return up to limit items containing query (case-insensitive), only clips of kind if given."""
+        from blobs import item_snippet
+        query = query.lower()
+        return [item for item in (self.items or []) if (kind is None or item.get("kind") == kind)
+                and query in item_snippet(item).lower()][:limit]
+
+    def fingerprints(self):
+        """Yield the dedup fingerprint of every stored item."""
+        from blobs import item_fingerprint
+        for item in self.items or []:
+            yield item_fingerprint(item)
+
+    def compact(self, items=None):
+        """Write a full snapshot via temp file + atomic rename, then truncate the journal."""
+        if items is not None:
+            self.items = items if isinstance(items, ClipHistory) else ClipHistory(items)
+        if self.items is None:
+            return False
+        return self._write_snapshot(self.items)
+
+    def close(self):
+        """Nothing to release: the snapshot and journal are only open while they are written."""
+
+    @tracing.traced("save_copies")
+    def _write_snapshot(self, items):
+        if not isinstance(items, ClipHistory):
+            items = ClipHistory(items)
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # dumps() runs the C encoder; dump() to a file streams through the pure-Python one
+                f.write(json.dumps({"version": SNAPSHOT_VERSION, "next_id": items.next_id, "items": items.to_list()},
+                                   ensure_ascii=False))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # The snapshot now contains everything in the journal
+            open(self.journal_path, 'w').close()
+        except Exception:
+            return False
+        self._journal_records = 0
+        return True
+
+# Rich clips (images.py, HTML, URI lists) carry these on top of their plain-text "text"
+RICH_KEYS = ("html", "uris", "image", "width", "height")
+# Capture-time metadata (clipmeta.py); recomputed whenever the content changes
+DERIVED_KEYS = ("label", "bytes", "lines", "kind", "sim")
+CONTENT_KEYS = ("text", "blob", "size", "snippet", "fp") + DERIVED_KEYS + RICH_KEYS
+META_KEYS = ("pinned", "last_paste", "pastes", "cluster")
+
+def journal_record(op, *args):
+    """Build the journal record for a store operation."""
+    if op == "append":
+        return {"op": "add", "item": args[0].to_dict()}
+    if op == "edit":
+        record = {"op": "edit", "id": args[0]["id"]}
+        record.update((k, v) for k, v in args[0].to_dict().items() if k in CONTENT_KEYS)
+        return record
+    if op == "meta":
+        return {"op": "meta", "id": args[0], "fields": args[1]}
+    return {"op": "del", "id": args[0]}
+
+def set_meta(item, fields):
+    """Apply metadata fields to an item; a None value removes the field."""
+    for k, v in fields.items():
+        if k in META_KEYS:
+            if v is None or v is False:
+                item.pop(k, None)
+            else:
+                item[k] = v
+
+def _legacy_target(items, record):
+    """The clip a version 1 record names by content key: the newest one with that key."""
+    from blobs import item_key
+    key = record.get("old", record.get("key", record.get("text")))
+    return next((item for item in items if item_key(item) == key), None)
+
+def apply_record(items, record):
+    """Apply a single journal record to a ClipHistory."""
+    op = record.get("op")
+    if op == "add":
+        items.prepend(Clip.from_dict(record["item"]))
+        return
+    item = items.get(record["id"]) if "id" in record else _legacy_target(items, record)
+    if item is None:
+        return
+    if op == "edit":
+        for k in CONTENT_KEYS:
+            item.pop(k, None)
+        item.update((k, record[k]) for k in CONTENT_KEYS if k in record)
+        if item.get("kind") is None or item.get("sim") is None:
+            item.derive_meta()  # Edit recorded before clips had metadata
+    elif op == "meta":
+        set_meta(item, record["fields"])
+    elif op == "del":
+        items.delete(item["id"])
+
+class SqliteStore:
+    """
+    SQLite-backed history store (stdlib sqlite3, WAL mode).
+    Rows are indexed by id, timestamp and dedup fingerprint, and an FTS5 table mirrors the
+    clip text for full-text search. load() only returns the most recent page of items;
+    older rows are fetched on demand with recent(), search(), get() and between().
+    """
+    paged = True  # load() returns only the most recent page
+    COLUMNS = ("id, text, ts, blob, size, fp, pinned, last_paste, pastes, extra, created, label, bytes, lines, kind, sim, "
+               "cluster")
+
+    def __init__(self, db_path, page_size=settings.HISTORY_PAGE_SIZE):
+        import sqlite3, threading
+        self.db_path = db_path
+        self.page_size = page_size
+        self.compact_every = settings.JOURNAL_COMPACT_EVERY
+        self.items = None
+        # conn is the persistence worker's (writes); self.lock serializes its users
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS clips (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL,
+                ts TEXT NOT NULL DEFAULT '',
+                created REAL NOT NULL,
+                fp BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS clips_created ON clips(created);
+            CREATE INDEX IF NOT EXISTS clips_fp ON clips(fp);
+        """)
+        # Large clips live in the blob store: text holds their snippet, blob their hash
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(clips)")}
+        if "blob" not in columns:
+            self.conn.execute("ALTER TABLE clips ADD COLUMN blob TEXT")
+            self.conn.execute("ALTER TABLE clips ADD COLUMN size INTEGER")
+        if "pinned" not in columns:
+            self.conn.execute("ALTER TABLE clips ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0")
+            self.conn.execute("ALTER TABLE clips ADD COLUMN last_paste REAL")
+        if "extra" not in columns:
+            # JSON object with the RICH_KEYS of image / HTML / URI-list clips
+            self.conn.execute("ALTER TABLE clips ADD COLUMN extra TEXT")
+        if "kind" not in columns:
+            # Capture-time metadata (clipmeta.py); NULL in rows written before it existed
+            for column in ("label TEXT", "bytes INTEGER", "lines INTEGER", "kind TEXT"):
+                self.conn.execute("ALTER TABLE clips ADD COLUMN " + column)
+        if "sim" not in columns:
+            # SimHash and near-duplicate cluster id (neardup.py)
+            self.conn.execute("ALTER TABLE clips ADD COLUMN sim INTEGER")
+            self.conn.execute("ALTER TABLE clips ADD COLUMN cluster INTEGER")
+        if "pastes" not in columns:
+            self.conn.execute("ALTER TABLE clips ADD COLUMN pastes INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS clips_blob ON clips(blob)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS clips_kind ON clips(kind)")
+        self.has_fts = self._create_fts()
+        self._backfill_meta()
+        # Reads (GUI thread, retention planning) go through their own connection: under WAL they see
+        # the last commit without waiting for a write batch in progress on conn
+        self.read_lock = threading.Lock()
+        self.reader = sqlite3.connect(db_path, check_same_thread=False)
+        self.reader.row_factory = sqlite3.Row
+
+    def _backfill_meta(self):
+        """Compute the metadata of rows written before it existed, once, so loading never has to."""
+        rows = self.conn.execute("SELECT " + self.COLUMNS + " FROM clips WHERE kind IS NULL OR sim IS NULL").fetchall()
+        if rows:
+            with self.conn:
+                self.conn.executemany("UPDATE clips SET label = ?, bytes = ?, lines = ?, kind = ?, sim = ? WHERE id = ?",
+                                      [(item.label, item.get("bytes"), item.get("lines"), item.get("kind"), item.sim,
+                                        item["id"]) for item in map(self._item, rows)])
+
+    def _create_fts(self):
+        """Create the FTS5 mirror of clips.text; False if this sqlite lacks FTS5."""
+        import sqlite3
+        try:
+            self.conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS clips_fts USING fts5(text, content='clips', content_rowid='id');
+                CREATE TRIGGER IF NOT EXISTS clips_ai AFTER INSERT ON clips BEGIN
+                    INSERT INTO clips_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS clips_ad AFTER DELETE ON clips BEGIN
+                    INSERT INTO clips_fts(clips_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS clips_au AFTER UPDATE OF text ON clips BEGIN
+                    INSERT INTO clips_fts(clips_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    INSERT INTO clips_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+            """)
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    @staticmethod
+    def _item(row):
+        # The fingerprint and metadata columns save recomputing them from the text
+        meta = {"label": row["label"], "bytes": row["bytes"], "lines": row["lines"], "kind": row["kind"], "sim": row["sim"]}
+        if row["blob"]:
+            item = Clip(meta, id=row["id"], blob=row["blob"], size=row["size"], snippet=row["text"],
+                        time=int(row["created"]), fingerprint=bytes(row["fp"]))
+        else:
+            item = Clip(meta, id=row["id"], text=row["text"], time=int(row["created"]), fingerprint=bytes(row["fp"]))
+        if row["extra"]:
+            item.update(json.loads(row["extra"]))
+        set_meta(item, {"pinned": bool(row["pinned"]), "last_paste": row["last_paste"], "pastes": row["pastes"] or None,
+                        "cluster": row["cluster"]})
+        return item
+
+    def _query(self, sql, params=()):
+        with self.read_lock:
+            return self.reader.execute(sql, params).fetchall()
+
+    def load(self):
+        """Return the most recent page of items, newest first."""
+        self.items = ClipHistory(self.recent(self.page_size), self.next_id())
+        return self.items
+
+    def next_id(self):
+        """First id never used by a row (ids of deleted rows are not handed out again)."""
+        used = self._query("SELECT MAX(id) FROM clips")[0][0] or 0
+        seq = self._query("SELECT seq FROM sqlite_sequence WHERE name = 'clips'")
+        return max(used, seq[0][0] if seq else 0) + 1
+
+    def recent(self, limit, offset=0):
+        """Return up to limit of the most recent items, skipping the first offset."""
+        rows = self._query("SELECT " + self.COLUMNS + " FROM clips ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset))
+        return [self._item(row) for row in rows]
+
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM clips")[0][0]
+
+    def get(self, clip_id):
+        """Return the item with the given id, or None."""
+        rows = self._query("SELECT " + self.COLUMNS + " FROM clips WHERE id = ?", (clip_id,))
+        return self._item(rows[0]) if rows else None
+
+    def between(self, start, end, limit=None):
+        """Return items created between two epoch times, newest first."""
+        rows = self._query(
+            "SELECT " + self.COLUMNS + " FROM clips WHERE created BETWEEN ? AND ? ORDER BY created DESC LIMIT ?",
+            (start, end, -1 if limit is None else limit))
+        return [self._item(row) for row in rows]
+
+    def search(self, query, limit=50, kind=None):
+        """Full-text search over clip text; the last word is matched as a prefix. kind restricts it to clips of that kind."""
+        words = query.split()
+        kinds = "" if kind is None else " AND c.kind = ?"
+        kind_args = () if kind is None else (kind,)
+        if not words:
+            if kind is None:
+                return self.recent(limit)
+            rows = self._query("SELECT " + self.COLUMNS + " FROM clips c WHERE c.kind = ? ORDER BY id DESC LIMIT ?",
+                               (kind, limit))
+        elif self.has_fts:
+            match = ' '.join('"%s"' % w.replace('"', '""') for w in words) + '*'
+            rows = self._query(
+                "SELECT c." + self.COLUMNS.replace(", ", ", c.") + " FROM clips_fts JOIN clips c ON c.id = clips_fts.rowid "
+                "WHERE clips_fts MATCH ?" + kinds + " ORDER BY rank LIMIT ?", (match,) + kind_args + (limit,))
+        else:
+            rows = self._query(
+                "SELECT " + self.COLUMNS + " FROM clips c WHERE text LIKE ?" + kinds + " ORDER BY id DESC LIMIT ?",
+                ('%' + query + '%',) + kind_args + (limit,))
+        return [self._item(row) for row in rows]
+
+    def fingerprints(self):
+        """Return the dedup fingerprint of every stored item without loading clip text."""
+        return [fp for (fp,) in self._query("SELECT fp FROM clips")]
+
+    def has_fingerprint(self, fp):
+        """Whether a stored clip has this dedup fingerprint (an index lookup)."""
+        # On the writing connection, so that rows import_stream() has not committed yet count too
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM clips WHERE fp = ? LIMIT 1", (fp,)).fetchone() is not None
+
+    def iter_items(self):
+        """Yield every clip newest first, reading settings.IMPORT_BATCH rows at a time."""
+        last = None
+        while True:
+            if last is None:
+                rows = self._query("SELECT " + self.COLUMNS + " FROM clips ORDER BY id DESC LIMIT ?", (settings.IMPORT_BATCH,))
+            else:
+                rows = self._query("SELECT " + self.COLUMNS + " FROM clips WHERE id < ? ORDER BY id DESC LIMIT ?",
+                                   (last, settings.IMPORT_BATCH))
+            for row in rows:
+                yield self._item(row)
+            if len(rows) < settings.IMPORT_BATCH:
+                return
+            last = rows[-1]["id"]
+
+    def retention_rows(self):
+        """Return one row per clip for retention.plan_eviction(), without loading clip text."""
+        from blobs import blob_path
+        from images import image_path
+        rows = []
+        # The bytes column spares a stat() per large clip; only rows from before it existed need one
+        for row in self._query("SELECT id, blob, COALESCE(bytes, length(CAST(text AS BLOB))), created, last_paste, pinned, fp, "
+                               "json_extract(extra, '$.image'), substr(text, 1, 60), ts, bytes FROM clips"):
+            clip_id, blob, size, created, last_paste, pinned, fp, image, snippet, ts, known = row
+            try:
+                if blob and known is None:
+                    size = os.path.getsize(blob_path(blob))
+                elif image:
+                    size += os.path.getsize(image_path(image))
+            except OSError:
+                pass
+            rows.append({"id": clip_id, "blob": blob, "image": image, "fp": fp, "bytes": size,
+                         "recency": max(created, last_paste or 0), "pinned": bool(pinned), "snippet": snippet, "ts": ts})
+        return rows
+
+    @staticmethod
+    def _content(item):
+        from blobs import item_snippet, item_fingerprint
+        extra = {k: item[k] for k in RICH_KEYS if k in item}
+        # NULL label: the leading text stands in for it (Clip.get("label") would fill that in)
+        label = item.label if isinstance(item, Clip) else item.get("label")
+        return (item_snippet(item), item.get("blob"), item.get("size"), item_fingerprint(item),
+                json.dumps(extra, ensure_ascii=False) if extra else None,
+                label, item.get("bytes"), item.get("lines"), item.get("kind"), item.get("sim"))
+
+    def _insert(self, item):
+        # The id was assigned at capture time; rows without one (None) get the next rowid
+        cur = self.conn.execute(
+            "INSERT INTO clips(id, text, blob, size, fp, extra, label, bytes, lines, kind, sim, ts, created, pinned, "
+            "last_paste, pastes, cluster) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (item.get("id"),) + self._content(item) + (item.get("ts", ""), item.get("time", time.time()),
+                                                       1 if item.get("pinned") else 0, item.get("last_paste"),
+                                                       item.get("pastes", 0), item.get("cluster")))
+        item["id"] = cur.lastrowid
+
+    def _edit(self, item):
+        self.conn.execute("UPDATE clips SET text = ?, blob = ?, size = ?, fp = ?, extra = ?, label = ?, bytes = ?, "
+                          "lines = ?, kind = ?, sim = ? WHERE id = ?",
+                          self._content(item) + (item["id"],))
+
+    def _remove(self, clip_id):
+        self.conn.execute("DELETE FROM clips WHERE id = ?", (clip_id,))
+
+    def _set_meta(self, clip_id, fields):
+        if "pinned" in fields:
+            self.conn.execute("UPDATE clips SET pinned = ? WHERE id = ?", (1 if fields["pinned"] else 0, clip_id))
+        if "last_paste" in fields:
+            self.conn.execute("UPDATE clips SET last_paste = ? WHERE id = ?", (fields["last_paste"], clip_id))
+        if "pastes" in fields:
+            self.conn.execute("UPDATE clips SET pastes = ? WHERE id = ?", (fields["pastes"] or 0, clip_id))
+        if "cluster" in fields:
+            self.conn.execute("UPDATE clips SET cluster = ? WHERE id = ?", (fields["cluster"], clip_id))
+
+    def _delete_blob(self, digest):
+        from blobs import delete_blob
+        if self.conn.execute("SELECT 1 FROM clips WHERE blob = ? LIMIT 1", (digest,)).fetchone() is None:
+            delete_blob(digest)
+
+    def _delete_image(self, digest):
+        from images import delete_image
+        if self.conn.execute("SELECT 1 FROM clips WHERE json_extract(extra, '$.image') = ? LIMIT 1", (digest,)).fetchone() is None:
+            delete_image(digest)
+
+    def apply(self, ops):
+        """Apply a batch of queued (op, args) operations in a single transaction."""
+        with self.lock:
+            with self.conn:
+                for op, args in ops:
+                    if op == "append":
+                        self._insert(*args)
+                    elif op == "edit":
+                        self._edit(*args)
+                    elif op == "remove":
+                        self._remove(*args)
+                    elif op == "meta":
+                        self._set_meta(*args)
+                    elif op == "evict":
+                        self._remove(*args)
+            # Blobs are deleted once the rows referencing them are committed
+            for op, args in ops:
+                if op == "delete_blob":
+                    self._delete_blob(*args)
+                elif op == "delete_image":
+                    self._delete_image(*args)
+            if any(op == "compact" for op, args in ops):
+                with tracing.span("save_copies"):
+                    self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def append(self, item):
+        """Insert a new clip under its id (the next rowid if it has none)."""
+        self.apply([("append", (item,))])
+
+    def edit(self, item):
+        """Give the clip with item's id the content of item."""
+        self.apply([("edit", (item,))])
+
+    def remove(self, clip_id):
+        """Delete a clip."""
+        self.apply([("remove", (clip_id,))])
+
+    def set_meta(self, clip_id, fields):
+        """Update the pinned / last_paste / pastes / cluster columns of a clip."""
+        self.apply([("meta", (clip_id, fields))])
+
+    def evict(self, clip_id, blob=None, image=None):
+        """Delete a clip and, if unused, its blob or image."""
+        self.apply([("evict", (clip_id,))] + self._release_ops(blob, image))
+
+    def release(self, blob=None, image=None):
+        """Delete a blob / image that a removed or edited clip used, unless another clip still uses it."""
+        self.apply(self._release_ops(blob, image))
+
+    @staticmethod
+    def _release_ops(blob, image):
+        return ([("delete_blob", (blob,))] if blob else []) + ([("delete_image", (image,))] if image else [])
+
+    def snapshot(self):
+        """Rows are written in place, so compaction only needs to checkpoint the WAL."""
+        return None
+
+    def import_items(self, items):
+        """Bulk insert items given newest first (used for migration)."""
+        with self.lock, self.conn:
+            for item in reversed(items):
+                self._insert(item)
+
+    def import_stream(self, items):
+        """
+        Insert items (with ids that no clip uses), committing every settings.IMPORT_BATCH rows;
+        returns the number inserted. Rows inserted so far are visible to has_fingerprint()
+        while items is still being consumed.
+        """
+        count = 0
+        with self.lock:
+            try:
+                for item in items:
+                    self._insert(item)
+                    count += 1
+                    if count % settings.IMPORT_BATCH == 0:
+                        self.conn.commit()
+            finally:
+                self.conn.commit()
+        return count
+
+    @tracing.traced("save_copies")
+    def compact(self, items=None):
+        """Replace all rows with items if given, then checkpoint the WAL."""
+        with self.lock:
+            if items is not None:
+                if not isinstance(items, ClipHistory):
+                    items = ClipHistory(items)
+                with self.conn:
+                    self.conn.execute("DELETE FROM clips")
+                    for item in reversed(items):
+                        self._insert(item)
+                self.items = items
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return True
+
+    def close(self):
+        with self.read_lock:
+            self.reader.close()
+        with self.lock:
+            self.conn.close()
+
+class PersistWorker:
+    """
+    Applies history writes on a background thread so the GUI thread never blocks on disk.
+    append/edit/remove/set_meta/evict only enqueue; a burst of changes is coalesced into one batch once no
+    new change has arrived for debounce_ms (or after PERSIST_MAX_DELAY_MS at the latest).
+    Clips and fields are copied when queued: the worker writes them as they were at that point,
+    not as later edits on the GUI thread leave them. Reads are passed straight through to the wrapped store.
+    """
+    def __init__(self, store, debounce_ms=settings.PERSIST_DEBOUNCE_MS):
+        import threading
+        self.store = store
+        self.debounce = debounce_ms / 1000
+        self.last_write_ms = None  # Duration of the most recent batch write
+        self.writes = 0            # Number of batch writes performed
+        self._queue = []
+        self._in_flight = 0
+        self._since_compact = 0
+        self._flush = False
+        self._closing = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="quickclip-persist", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        # load, recent, search, fingerprints, paged, ... come from the wrapped store
+        return getattr(self.store, name)
+
+    @property
+    def pending(self):
+        """Number of queued writes not yet on disk."""
+        with self._cond:
+            return len(self._queue) + self._in_flight
+
+    def _enqueue(self, op, *args):
+        with self._cond:
+            self._queue.append((op, args))
+            if op != "compact":
+                self._since_compact += 1
+                if self._since_compact >= self.store.compact_every:
+                    self._since_compact = 0
+                    # Snapshot taken now, in queue order, so it matches the journal records before it
+                    self._queue.append(("compact", (self.store.snapshot(),)))
+            self._cond.notify_all()
+
+    def append(self, item):
+        self._enqueue("append", item.copy())
+
+    def edit(self, item):
+        self._enqueue("edit", item.copy())
+
+    def remove(self, clip_id):
+        self._enqueue("remove", clip_id)
+
+    def set_meta(self, clip_id, fields):
+        self._enqueue("meta", clip_id, dict(fields))
+
+    def evict(self, clip_id, blob=None, image=None):
+        self._enqueue("evict", clip_id)
+        self.release(blob, image)
+
+    def release(self, blob=None, image=None):
+        if blob:
+            self._enqueue("delete_blob", blob)
+        if image:
+            self._enqueue("delete_image", image)
+
+    def compact(self, items=None):
+        self._enqueue("compact", self.store.snapshot() if items is None else items)
+
+    def flush(self):
+        """Block until every queued write has been applied."""
+        with self._cond:
+            self._flush = True
+            self._cond.notify_all()
+            while self._queue or self._in_flight:
+                self._cond.wait()
+            self._flush = False
+
+    def close(self):
+        """Flush pending writes, stop the worker thread and close the store (call on app quit)."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.store.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                # Debounce: wait for the burst to settle before writing
+                deadline = time.monotonic() + settings.PERSIST_MAX_DELAY_MS / 1000
+                while not (self._flush or self._closing):
+                    queued = len(self._queue)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(min(self.debounce, remaining))
+                    if len(self._queue) == queued:
+                        break
+                ops = self._queue
+                self._queue = []
+                self._in_flight = len(ops)
+            start = time.perf_counter()
+            try:
+                self.store.apply(ops)
+            except Exception as e:
+                log.error("Saving history failed: %s", e)
+            with self._cond:
+                self.last_write_ms = (time.perf_counter() - start) * 1000
+                if tracing.enabled:
+                    tracing.record("store_write", self.last_write_ms)
+                self.writes += 1
+                self._in_flight = 0
+                self._cond.notify_all()
+
+_store = None
+
+def get_store():
+    """Return the shared history store for this process, as chosen by HISTORY_BACKEND."""
+    global _store
+    if _store is None:
+        if settings.HISTORY_BACKEND == "sqlite":
+            fresh = not os.path.exists(settings.HISTORY_DB_FILE)
+            _store = SqliteStore(settings.HISTORY_DB_FILE)
+            if fresh and (os.path.exists(settings.COPY_FILE) or os.path.exists(settings.COPY_JOURNAL_FILE)):
+                # Migrate the existing JSON history into the new database
+                legacy = JournalStore(settings.COPY_FILE, settings.COPY_JOURNAL_FILE, compact_every=float('inf'))
+                _store.import_items(legacy.load())
+        else:
+            _store = JournalStore(settings.COPY_FILE, settings.COPY_JOURNAL_FILE)
+    return _store
@@ -0,0 +1,56 @@
+# conftest.py
+# Quick-Clip Clipboard Popup App
+#
+# Shared fixtures: every test runs offscreen against its own temporary copy.json / copy.db /
+# blobs / config, set up the way benchmark.py sets up its synthetic runs.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, sys
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Point all persistent state at tmp_path (journal backend, fake paste backend, no retention)."""
+    import settings, store, config, benchmark
+    for name in ("COPY_FILE", "COPY_JOURNAL_FILE", "HISTORY_DB_FILE", "BLOB_DIR", "CONFIG_PATH", "IMAGE_DIR", "TRACE_FILE",
+                 "HISTORY_BACKEND", "PASTE_BACKEND", "RETENTION_MAX_ITEMS", "RETENTION_MAX_BYTES", "RETENTION_MAX_AGE_DAYS"):
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+    monkeypatch.setattr(config, "_config", config._config)
+    benchmark.configure(str(tmp_path))
+    monkeypatch.setattr(store, "_store", None)
+    yield tmp_path
+    if config._config is not None:
+        # Deleted here, on the GUI thread, rather than by a garbage collection on a worker thread
+        import shiboken6
+        shiboken6.delete(config._config)
+
+@pytest.fixture(scope="session")
+def app():
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture
+def listener(app, workdir):
+    """A HotkeyListener without the global hotkeys, closed (writes flushed) after the test."""
+    from text import HotkeyListener
+    listener = HotkeyListener(hotkeys=False)
+    yield listener
+    if listener.popup is not None:
+        listener.popup.hide()
+        listener.popup.deleteLater()
+    listener.close()
+    app.processEvents()
+
+def wait_for(app, condition, timeout=5.0):
+    """Process events until condition() is true; returns its final value."""
+    import time
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    return condition()
@@ -0,0 +1,76 @@
+# test_archive.py
+# Quick-Clip Clipboard Popup App
+#
+# Streamed export / import: round trips through NDJSON and copy.json, dedup and filters.
+#
+# Author: Tof-O
+# License: MIT
+
+import os
+import pytest
+import settings
+from archive import export_history, import_history, read_records, FingerprintIndex
+from blobs import make_item, item_text
+from store import JournalStore, SqliteStore
+
+TEXTS = ["https://example.com/page", "plain words", "x" * (settings.BLOB_THRESHOLD + 10), "/usr/local/bin"]
+
+@pytest.fixture
+def source(workdir):
+    """A journal history of TEXTS (oldest first), one of them pinned."""
+    target = JournalStore(settings.COPY_FILE, settings.COPY_JOURNAL_FILE)
+    items = target.load()
+    for i, text in enumerate(TEXTS):
+        item = make_item(text, 1700000000 + i * 86400)
+        item["id"] = items.new_id()
+        items.prepend(item)
+        target.append(item)
+    items.get(2)["pinned"] = True
+    target.set_meta(2, {"pinned": True})
+    return target
+
+def export(target, path, **filters):
+    with open(path, 'w', encoding='utf-8') as out:
+        return export_history(target, out, **filters)
+
+def destination(workdir, backend):
+    if backend == "sqlite":
+        return SqliteStore(os.path.join(workdir, "other.db"))
+    return JournalStore(os.path.join(workdir, "other.json"), os.path.join(workdir, "other.journal"))
+
+@pytest.mark.parametrize("backend", ["journal", "sqlite"])
+def test_round_trip(source, workdir, backend):
+    path = os.path.join(workdir, "export.ndjson")
+    assert export(source, path) == len(TEXTS)
+    assert "blob" not in next(r for r in read_records(path) if len(r["text"]) > settings.BLOB_THRESHOLD)
+    target = destination(workdir, backend)
+    assert import_history(target, path) == {"imported": 4, "duplicates": 0, "filtered": 0, "invalid": 0}
+    loaded = target.load()
+    assert [item_text(item) for item in loaded] == TEXTS[::-1]
+    assert [item["time"] for item in loaded] == [item["time"] for item in source.load()]
+    assert [item["id"] for item in loaded if item.get("pinned")] == [2]
+    # Importing the same file again only finds duplicates
+    assert import_history(target, path)["duplicates"] == 4
+    if backend == "sqlite":
+        target.close()
+
+def test_snapshot_import_with_filters(source, workdir):
+    source.compact(source.load())
+    target = destination(workdir, "journal")
+    report = import_history(target, settings.COPY_FILE, kinds={"url", "path"})
+    assert report == {"imported": 2, "duplicates": 0, "filtered": 2, "invalid": 0}
+    assert [item_text(item) for item in target.load()] == ["/usr/local/bin", "https://example.com/page"]
+
+def test_export_date_filter(source, workdir):
+    path = os.path.join(workdir, "export.ndjson")
+    assert export(source, path, since=1700000000 + 86400, until=1700000000 + 2 * 86400) == 2
+    assert [r["text"][:5] for r in read_records(path)] == ["xxxxx", "plain"]
+
+def test_fingerprint_index():
+    index = FingerprintIndex(i.to_bytes(16, "big") for i in range(3000))  # More than one IMPORT_BATCH
+    try:
+        assert (2999).to_bytes(16, "big") in index and b"x" * 16 not in index
+        index.add(b"x" * 16)
+        assert b"x" * 16 in index
+    finally:
+        index.close()
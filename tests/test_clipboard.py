@@ -0,0 +1,100 @@
+# test_clipboard.py
+# Quick-Clip Clipboard Popup App
+#
+# ClipboardWatcher against a fake clipboard: the capture mode "auto" picks, the poll backoff
+# and the per-mode read counters.
+#
+# Author: Tof-O
+# License: MIT
+
+import pytest
+from PySide6.QtCore import QObject, QMimeData, Signal
+from PySide6.QtGui import QGuiApplication
+import text
+from settings import CLIPBOARD_POLL_MIN_MS, CLIPBOARD_POLL_MAX_MS, CLIPBOARD_POLL_BACKOFF
+from text import ClipboardWatcher
+
+class FakeClipboard(QObject):
+    """The part of QClipboard the watcher uses; set_text() changes it like a copy would."""
+    dataChanged = Signal()
+    def __init__(self):
+        super().__init__()
+        self._mime = QMimeData()
+    def set_text(self, value):
+        self._mime = QMimeData()
+        self._mime.setText(value)
+        self.dataChanged.emit()
+    def mimeData(self):
+        return self._mime
+    def text(self):
+        return self._mime.text()
+
+@pytest.fixture
+def clipboard(app, monkeypatch):
+    monkeypatch.setattr(text, "_clipboard_sequence_number", lambda: None)
+    return FakeClipboard()
+
+def watch(clipboard, mode):
+    watcher = ClipboardWatcher(clipboard, mode)
+    captured = []
+    watcher.text_changed.connect(captured.append)
+    return watcher, captured
+
+@pytest.mark.parametrize("platform, mode", [("wayland", "poll"), ("xcb", "signal"), ("offscreen", "signal")])
+def test_auto_mode_polls_on_unreliable_platforms(clipboard, monkeypatch, platform, mode):
+    monkeypatch.setattr(QGuiApplication, "platformName", staticmethod(lambda: platform))
+    watcher = ClipboardWatcher(clipboard, "auto")
+    assert watcher.mode == mode
+    assert (watcher.timer is not None) == (mode == "poll")
+
+def test_signal_mode_reads_once_per_change(clipboard):
+    watcher, captured = watch(clipboard, "signal")
+    clipboard.set_text("alpha")
+    clipboard.set_text("bravo")
+    clipboard.dataChanged.emit()  # Spurious: same text, so read but not reported
+    assert captured == ["alpha", "bravo"]
+    assert watcher.reads == {"signal": 3, "poll": 0}
+
+def test_poll_backs_off_while_idle(clipboard):
+    watcher, captured = watch(clipboard, "poll")
+    watcher.timer.stop()  # Polls are driven by hand below
+    expected, intervals = CLIPBOARD_POLL_MIN_MS, []
+    for _ in range(12):
+        watcher._on_poll()
+        intervals.append(watcher.interval)
+    for interval in intervals:
+        expected = min(int(expected * CLIPBOARD_POLL_BACKOFF), CLIPBOARD_POLL_MAX_MS)
+        assert interval == expected
+    assert intervals[-1] == CLIPBOARD_POLL_MAX_MS
+    # A change drops the interval back to the minimum
+    clipboard.set_text("alpha")
+    watcher._on_poll()
+    assert watcher.interval == CLIPBOARD_POLL_MIN_MS
+    assert captured == ["alpha"]
+    assert watcher.reads == {"signal": 0, "poll": 1}
+    watcher.timer.stop()
+
+def test_poll_skips_reads_while_the_sequence_number_stands(clipboard, monkeypatch):
+    watcher, captured = watch(clipboard, "poll")
+    watcher.timer.stop()
+    monkeypatch.setattr(text, "_clipboard_sequence_number", lambda: 7)
+    clipboard.set_text("alpha")
+    for _ in range(5):
+        watcher._on_poll()
+    assert captured == ["alpha"]
+    assert watcher.reads == {"signal": 0, "poll": 1}
+    watcher.timer.stop()
+
+def test_failed_sequence_import_is_cached(monkeypatch):
+    import builtins
+    attempts = []
+    real_import = builtins.__import__
+    def fake_import(name, *args, **kwargs):
+        if name == "win32clipboard":
+            attempts.append(name)
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+    monkeypatch.setattr(builtins, "__import__", fake_import)
+    monkeypatch.setattr(text, "_win32clipboard", None)
+    assert [text._clipboard_sequence_number() for _ in range(3)] == [None] * 3
+    assert attempts == ["win32clipboard"]
@@ -0,0 +1,33 @@
+# test_clipmeta.py
+# Quick-Clip Clipboard Popup App
+#
+# Capture-time metadata: kind detection, including copied file lists.
+#
+# Author: Tof-O
+# License: MIT
+
+import pytest
+from blobs import make_item
+from clipmeta import detect_kind
+from history import Clip
+
+@pytest.mark.parametrize("text, kind", [
+    ("https://example.com/a?b=c", "url"),
+    ('{"a": [1, 2]}', "json"),
+    ("def f(x):\n    return x\n", "code"),
+    ("/usr/local/bin", "path"),
+    ("C:\\Program Files\\App", "path"),
+    ("just some words", "plain"),
+])
+def test_detect_kind(text, kind):
+    assert detect_kind(text) == kind
+
+def test_file_list_is_a_path_even_with_spaces():
+    uris = ["file:///home/me/My Documents/notes 1.txt", "file:///home/me/photo 2.png"]
+    text = "/home/me/My Documents/notes 1.txt\n/home/me/photo 2.png"
+    assert make_item(text, extras={"uris": uris})["kind"] == "path"
+    # Clips saved before kinds existed get theirs from the URI list too
+    assert Clip({"text": text, "uris": uris}).kind == "path"
+
+def test_link_with_uri_list_keeps_its_kind():
+    assert make_item("https://example.com", extras={"uris": ["https://example.com"]})["kind"] == "url"
@@ -0,0 +1,62 @@
+# test_config.py
+# Quick-Clip Clipboard Popup App
+#
+# ConfigService: the theme is saved to CONFIG_PATH, and edits other programs make to the file
+# are picked up through the file watcher.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, json
+import pytest
+import settings
+from config import ConfigService, get_config
+from tests.conftest import wait_for
+
+@pytest.fixture
+def service(app, workdir):
+    return get_config()
+
+def watch_themes(service):
+    themes = []
+    service.theme_changed.connect(themes.append)
+    return themes
+
+def write_config(data, replace=False):
+    """Change the config file as another program would: in place, or by replacing it like many editors."""
+    path = settings.CONFIG_PATH + ".tmp" if replace else settings.CONFIG_PATH
+    with open(path, "w") as f:
+        json.dump(data, f)
+    if replace:
+        os.replace(path, settings.CONFIG_PATH)
+
+def test_theme_is_saved(service):
+    assert service.theme == settings.DEFAULT_THEME
+    themes = watch_themes(service)
+    service.set_theme("dark")
+    service.set_theme("dark")
+    assert themes == ["dark"]
+    with open(settings.CONFIG_PATH) as f:
+        assert json.load(f) == {"theme": "dark"}
+    reloaded = ConfigService()
+    try:
+        assert reloaded.theme == "dark"
+    finally:
+        import shiboken6
+        shiboken6.delete(reloaded)
+
+def test_unknown_theme_falls_back_to_default(service):
+    service.set_theme("neon")
+    assert service.theme == settings.DEFAULT_THEME
+
+def test_external_edits_are_reloaded(app, service):
+    service.set_theme("light")
+    themes = watch_themes(service)
+    write_config({"theme": "dark"})
+    assert wait_for(app, lambda: service.theme == "dark")
+    # A replaced file drops out of the watcher; it is watched again after the reload
+    write_config({"theme": "light"}, replace=True)
+    assert wait_for(app, lambda: service.theme == "light")
+    write_config({"theme": "dark"})
+    assert wait_for(app, lambda: service.theme == "dark")
+    assert themes == ["dark", "light", "dark"]
@@ -0,0 +1,38 @@
+# test_dedup.py
+# Quick-Clip Clipboard Popup App
+#
+# DedupIndex: normalized membership, and staying in sync with captures, edits and removals.
+#
+# Author: Tof-O
+# License: MIT
+
+from blobs import make_item, item_fingerprint
+from text import DedupIndex
+
+def test_membership_ignores_whitespace_and_case():
+    index = DedupIndex([make_item("Hello  World")])
+    assert "hello world\n" in index
+    assert "HelloWorld" in index
+    assert "hello there" not in index
+
+def test_built_from_stored_fingerprints():
+    items = [make_item("one"), make_item("two")]
+    index = DedupIndex(fingerprints=[item_fingerprint(item) for item in items])
+    assert "one" in index and "two" in index and len(index) == 2
+
+def test_duplicates_are_counted():
+    index = DedupIndex([make_item("same"), make_item("same")])
+    index.discard("same")
+    assert "same" in index  # One copy left
+    index.discard("same")
+    assert "same" not in index
+
+def test_replace_follows_an_edit():
+    index = DedupIndex([make_item("before")])
+    index.replace("before", "after")
+    assert "after" in index and "before" not in index
+
+def test_listener_skips_duplicates(listener):
+    assert listener.add_text("copied twice") is not None
+    assert listener.add_text("Copied  twice") is None
+    assert len(listener.items) == 1
@@ -0,0 +1,53 @@
+# test_edit.py
+# Quick-Clip Clipboard Popup App
+#
+# EditPage saves: an unchanged clip writes nothing, a changed one a single edit record.
+#
+# Author: Tof-O
+# License: MIT
+
+import os
+import pytest
+import settings
+from blobs import item_text
+from edit import EditPage
+
+@pytest.fixture
+def page(listener):
+    item = listener.add_text("alpha bravo")
+    saved = []
+    page = EditPage(item_text(item), listener.items, item["id"], lambda clip_id: None, dedup=listener.dedup,
+                    store=listener.store, search_index=listener.search_index, on_saved=saved.append)
+    page.saved = saved
+    yield page
+    page.deleteLater()
+
+def type_text(page, text):
+    """Replace the editor's text the way typing does (setPlainText() would clear the modified flag)."""
+    page.text_edit.selectAll()
+    page.text_edit.insertPlainText(text)
+
+def journal_size(store):
+    store.flush()
+    return os.path.getsize(settings.COPY_JOURNAL_FILE)
+
+def test_unchanged_save_writes_nothing(listener, page):
+    before = journal_size(listener.store)
+    assert page.save() is False
+    # Typed over with the same text: modified, but still nothing to save
+    type_text(page, "alpha bravo")
+    assert page.text_edit.document().isModified()
+    assert page.save() is False
+    assert listener.store.pending == 0
+    assert journal_size(listener.store) == before
+    assert page.saved == []
+
+def test_changed_save_writes_the_clip(listener, page):
+    before = journal_size(listener.store)
+    type_text(page, "alpha charlie")
+    assert page.save() is True
+    assert journal_size(listener.store) > before
+    assert item_text(listener.items.get(page.clip_id)) == "alpha charlie"
+    assert page.saved == [page.clip_id]
+    # Saving again without further changes is a no-op
+    assert page.save() is False
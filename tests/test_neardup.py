@@ -0,0 +1,84 @@
+# test_neardup.py
+# Quick-Clip Clipboard Popup App
+#
+# NearDupIndex: clustering at capture, and keeping clusters in step with edits and removals.
+#
+# Author: Tof-O
+# License: MIT
+
+import pytest
+
+from blobs import make_item
+from history import ClipHistory
+from neardup import NearDupIndex, cluster_key
+
+LOG = ("ERROR connection refused by primary database host {} while running nightly backup job for the customer "
+       "accounts table retrying in thirty seconds")
+OTHER = "Remember to buy milk, eggs, flour and coffee beans on the way home tonight"
+
+@pytest.fixture
+def clustering(monkeypatch):
+    """Turns clustering on for a HotkeyListener created after it."""
+    import settings
+    monkeypatch.setattr(settings, "NEARDUP_ENABLED", True)
+
+def capture(items, clusters, text):
+    item = make_item(text)
+    item["id"] = items.new_id()
+    clusters.add(item)
+    return items.prepend(item)
+
+def setup(*texts):
+    items = ClipHistory()
+    clusters = NearDupIndex(items)
+    return items, clusters, [capture(items, clusters, text) for text in texts]
+
+def edit(clusters, item, text):
+    item.update(make_item(text))
+    return clusters.update(item)
+
+def test_near_duplicates_share_a_cluster():
+    items, clusters, (a, b, c) = setup(LOG.format("db01"), LOG.format("db04"), OTHER)
+    assert cluster_key(b) == a["id"]
+    assert cluster_key(c) == c["id"]
+    assert [m["id"] for m in clusters.members(a["id"])] == [b["id"], a["id"]]
+
+def test_edit_moves_clip_out_of_its_cluster():
+    items, clusters, (a, b) = setup(LOG.format("db01"), LOG.format("db04"))
+    assert edit(clusters, b, OTHER) == {b["id"]: None}
+    assert cluster_key(b) == b["id"]
+    assert clusters.size(a["id"]) == 1
+    # ... and back into it
+    assert edit(clusters, b, LOG.format("db10")) == {b["id"]: a["id"]}
+    assert clusters.size(a["id"]) == 2
+
+def test_edit_of_first_clip_hands_cluster_to_oldest_member():
+    items, clusters, (a, b, c) = setup(LOG.format("db01"), LOG.format("db04"), LOG.format("db10"))
+    assert edit(clusters, a, OTHER) == {b["id"]: None, c["id"]: b["id"]}
+    assert cluster_key(a) == a["id"] and cluster_key(b) == b["id"] and cluster_key(c) == b["id"]
+    assert [m["id"] for m in clusters.members(b["id"])] == [c["id"], b["id"]]
+    assert clusters.members(a["id"]) == [a]
+
+def test_removed_clip_is_no_match():
+    items, clusters, (a,) = setup(LOG.format("db01"))
+    items.delete(a["id"])
+    clusters.remove(a["id"])
+    b = capture(items, clusters, LOG.format("db04"))
+    assert cluster_key(b) == b["id"]
+
+def test_numbered_clips_stay_apart():
+    items, clusters, added = setup(*("clip number {} alpha bravo charlie".format(n) for n in range(500)))
+    assert all(cluster_key(item) == item["id"] for item in added)
+
+def test_edited_cluster_is_saved(clustering, listener):
+    from store import JournalStore
+    import settings
+    from text import update_clipboard_item
+    a = listener.add_text(LOG.format("db01"))
+    b = listener.add_text(LOG.format("db04"))
+    assert cluster_key(b) == a["id"]
+    update_clipboard_item(listener.items, b["id"], OTHER, listener.dedup, listener.store, listener.search_index,
+                          listener.clusters)
+    listener.store.close()
+    loaded = JournalStore(settings.COPY_FILE, settings.COPY_JOURNAL_FILE).load()
+    assert cluster_key(loaded.get(b["id"])) == b["id"]
@@ -0,0 +1,53 @@
+# test_paste.py
+# Quick-Clip Clipboard Popup App
+#
+# PasteDispatcher with the fake backend: pasting once focus is back, pasting anyway after
+# PASTE_READY_TIMEOUT_MS, and the Ctrl+V-to-paste latency it reports and traces.
+#
+# Author: Tof-O
+# License: MIT
+
+import time
+import pytest
+import settings, tracing
+from paste import FakePasteBackend, PasteDispatcher
+from tests.conftest import wait_for
+
+@pytest.fixture
+def tracing_on(monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_FILE", None)
+    monkeypatch.setattr(tracing, "enabled", True)
+    tracing.reset()
+    yield
+    tracing.reset()
+
+def dispatch(app, backend, hotkey_time=None):
+    dispatcher = PasteDispatcher(backend)
+    pasted = []
+    dispatcher.pasted.connect(lambda name, ms: pasted.append((name, ms)))
+    dispatcher.remember_target()
+    start = time.perf_counter()
+    dispatcher.paste(hotkey_time)
+    assert wait_for(app, lambda: pasted)
+    return dispatcher, pasted[0], (time.perf_counter() - start) * 1000
+
+def test_pastes_once_focus_is_back(app):
+    backend = FakePasteBackend(ready_after_ms=30)
+    dispatcher, (name, latency), elapsed = dispatch(app, backend)
+    assert name == "fake" and latency == -1.0  # Not opened by the hotkey: no latency
+    assert len(backend.pastes) == 1 and dispatcher.timeouts == 0
+    assert 30 <= elapsed < settings.PASTE_READY_TIMEOUT_MS
+
+def test_pastes_anyway_after_the_timeout(app, monkeypatch):
+    monkeypatch.setattr(settings, "PASTE_READY_TIMEOUT_MS", 60)
+    backend = FakePasteBackend(ready_after_ms=None)  # Focus never comes back
+    dispatcher, _, elapsed = dispatch(app, backend)
+    assert len(backend.pastes) == 1 and dispatcher.timeouts == 1
+    assert elapsed >= 60
+
+def test_latency_is_reported_and_traced(app, tracing_on):
+    hotkey_time = time.perf_counter()
+    dispatcher, (name, latency), _ = dispatch(app, FakePasteBackend(), hotkey_time)
+    assert latency > 0 and latency == dispatcher.last_latency_ms
+    traced = tracing.stats()["hotkey_to_paste.fake"]
+    assert traced["count"] == 1 and traced["latest_ms"] == latency
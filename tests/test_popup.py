@@ -0,0 +1,36 @@
+# test_popup.py
+# Quick-Clip Clipboard Popup App
+#
+# Ctrl+V-to-visible latency: the popup must be painted within POPUP_SHOW_TARGET_MS of the hotkey.
+#
+# Author: Tof-O
+# License: MIT
+
+from settings import POPUP_SHOW_TARGET_MS
+from tests.conftest import wait_for
+
+def show(app, listener):
+    shown = []
+    on_shown = shown.append
+    listener.popup_shown.connect(on_shown)
+    listener.on_ctrl_v()
+    assert wait_for(app, lambda: shown), "popup was never painted"
+    listener.popup_shown.disconnect(on_shown)
+    return shown[0]
+
+def test_popup_painted_within_target(app, listener):
+    for i in range(500):
+        listener.check_clipboard(f"clip number {i} with some words")
+    listener._create_popup()  # Pre-built in the background after startup
+    app.processEvents()
+    for _ in range(3):
+        latency = show(app, listener)
+        assert latency <= POPUP_SHOW_TARGET_MS
+        assert listener.popup.isVisible()
+        listener.popup.hide()
+        app.processEvents()
+
+def test_popup_on_empty_history(app, listener):
+    listener._create_popup()
+    assert show(app, listener) <= POPUP_SHOW_TARGET_MS
+    assert listener.popup.history_model.rowCount() == 1
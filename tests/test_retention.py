@@ -0,0 +1,57 @@
+# test_retention.py
+# Quick-Clip Clipboard Popup App
+#
+# Retention: which clips plan_eviction() picks, and applying a plan to the history.
+#
+# Author: Tof-O
+# License: MIT
+
+from blobs import make_item
+from history import ClipHistory
+from retention import item_row, plan_eviction
+from text import DedupIndex, evict_clipboard_items
+
+NOW = 1700000000
+DAY = 86400
+
+def row(clip_id, days_ago, size=10, pinned=False):
+    return {"id": clip_id, "blob": None, "image": None, "fp": b"", "bytes": size,
+            "recency": NOW - days_ago * DAY, "pinned": pinned}
+
+def plan(rows, **limits):
+    limits = dict({"max_items": None, "max_bytes": None, "max_age_days": None}, **limits)
+    return [(r["id"], r["reason"]) for r in plan_eviction(rows, NOW, **limits)]
+
+def test_no_limits_evict_nothing():
+    assert plan([row(i, i) for i in range(5)]) == []
+
+def test_count_limit_evicts_least_recently_used_first():
+    assert plan([row(1, 3), row(2, 1), row(3, 2), row(4, 4)], max_items=2) == [(4, "count"), (1, "count")]
+
+def test_bytes_and_age_limits():
+    rows = [row(1, 1, size=60), row(2, 2, size=60), row(3, 40, size=1)]
+    assert plan(rows, max_bytes=100, max_age_days=30) == [(3, "age"), (2, "bytes")]
+
+def test_pinned_clips_are_kept_and_not_counted():
+    assert plan([row(1, 1), row(2, 5, pinned=True), row(3, 2)], max_items=2) == []
+
+def test_recent_paste_keeps_a_clip():
+    items = ClipHistory()
+    for i, created in enumerate((NOW - 3 * DAY, NOW - 2 * DAY, NOW - DAY), 1):
+        items.prepend(make_item(f"clip {i}", created))
+    items.get(1)["last_paste"] = NOW
+    rows = [item_row(item, NOW) for item in items]
+    assert plan(rows, max_items=2) == [(2, "count")]
+
+def test_evict_skips_clips_pinned_since_the_plan():
+    items = ClipHistory()
+    for i in range(3):
+        items.prepend(make_item(f"clip {i}", NOW + i))
+    dedup = DedupIndex(items)
+    rows = plan_eviction([item_row(item, NOW) for item in items], NOW, max_items=1, max_bytes=None, max_age_days=None)
+    assert [r["id"] for r in rows] == [1, 2]
+    items.get(1)["pinned"] = True
+    evicted = evict_clipboard_items(items, rows, dedup)
+    assert [r["id"] for r in evicted] == [2]
+    assert [item["id"] for item in items] == [3, 1]
+    assert "clip 1" not in dedup and "clip 0" in dedup
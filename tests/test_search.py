@@ -0,0 +1,88 @@
+# test_search.py
+# Quick-Clip Clipboard Popup App
+#
+# TrigramIndex: exact and fuzzy matches, kind filters, and keeping up with edits and removals.
+#
+# Author: Tof-O
+# License: MIT
+
+import pytest
+from blobs import make_item, set_item_text
+from search import TrigramIndex, parse_query
+
+def history(texts):
+    """Clips for texts, given oldest first; returned newest first with ids 1..n."""
+    items = []
+    for i, text in enumerate(texts, 1):
+        item = make_item(text, 1700000000 + i)
+        item["id"] = i
+        items.append(item)
+    return items[::-1]
+
+def ids(results):
+    return [item["id"] for item in results]
+
+@pytest.fixture
+def index():
+    return TrigramIndex(history([
+        "https://example.com/alpha",                # 1 url
+        "alpha bravo charlie",                      # 2 plain
+        "def alpha(x):\n    return x\n",            # 3 code
+        "https://example.com/bravo",                # 4 url
+        "delta echo alpha",                         # 5 plain
+    ]))
+
+def test_kind_filter(index):
+    assert ids(index.search("alpha", kind="url")) == [1]
+    assert ids(index.search("", kind="url")) == [4, 1]
+    assert ids(index.search("", kind="code")) == [3]
+    assert ids(index.search("al", kind="plain")) == [5, 2]
+    assert index.search("alpha", kind="json") == []
+
+def test_kind_filter_follows_edits_and_removals(index):
+    item = index._docs[2][2]
+    set_item_text(item, "https://example.com/charlie")
+    index.update(item)
+    assert ids(index.search("", kind="url")) == [2, 4, 1]
+    assert 2 not in ids(index.search("", kind="plain"))
+    index.remove(4)
+    assert ids(index.search("", kind="url")) == [2, 1]
+
+def test_parse_query():
+    assert parse_query("kind:url github") == ("github", "url")
+    assert parse_query("github KIND:Code") == ("github", "code")
+    assert parse_query("kind:nope x") == ("kind:nope x", None)
+
+def test_exact_matches_newest_first_then_fuzzy():
+    index = TrigramIndex(history(["alpha bravo", "bravo alpha", "the alpha bravo show", "alphabet"]))
+    assert ids(index.search("alpha bravo")) == [3, 1, 2]
+    assert ids(index.search("alpha")) == [4, 3, 2, 1]
+
+@pytest.mark.parametrize("query", ["alpah brvo", "alpha bravvo", "aplha", "chralie", "(bravo"])
+def test_typos_match(query):
+    index = TrigramIndex(history(["alpha, bravo and charlie", "nothing to see here", "delta echo foxtrot"]))
+    assert ids(index.search(query)) == [1]
+
+def test_fuzzy_needs_every_word():
+    index = TrigramIndex(history(["alpha only", "bravo only", "alpha and bravo"]))
+    assert ids(index.search("alpah brvo")) == [3]
+
+def test_search_stops_at_the_time_budget(monkeypatch):
+    import search
+    index = TrigramIndex(history([f"clip {i} alpha bravo" for i in range(2000)]))
+    monkeypatch.setattr(search, "SEARCH_TIME_BUDGET_MS", 0)
+    # The exact walk gives up after its first batch of candidates instead of finding all 2000
+    assert len(index.search("alpha bravo", limit=5000)) < 2000
+
+def test_long_queries_within_budget():
+    import random, time, benchmark
+    from settings import SEARCH_TIME_BUDGET_MS
+    rng = random.Random(0)
+    index = TrigramIndex(history([benchmark.synthetic_text(rng, i, "small") for i in range(20000)]))
+    for query in ("alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima", "alpah brvo chralie"):
+        times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            index.search(query, 100)
+            times.append((time.perf_counter() - start) * 1000)
+        assert sorted(times)[2] < SEARCH_TIME_BUDGET_MS + 2  # The budget plus the last batch of candidates
@@ -0,0 +1,83 @@
+# test_service.py
+# Quick-Clip Clipboard Popup App
+#
+# History service protocol, answered in-process through HistoryService.handle_line().
+#
+# Author: Tof-O
+# License: MIT
+
+import json, os
+import pytest
+from service import HistoryService, service_running
+
+@pytest.fixture
+def service(listener):
+    for text in ("https://example.com/alpha", "alpha bravo", "charlie delta"):
+        listener.add_text(text)
+    listener.search_index.build_step(None)
+    return HistoryService(listener, name=f"quickclip-test-{os.getpid()}")
+
+def call(service, request):
+    reply = service.handle_line(json.dumps(request).encode('utf-8'))
+    assert reply.endswith(b"\n")
+    return json.loads(reply)
+
+def result(service, op, **args):
+    response = call(service, dict(args, op=op))
+    assert response["ok"], response
+    return response["result"]
+
+def test_query_and_get(service):
+    assert [row["id"] for row in result(service, "query")] == [3, 2, 1]
+    assert [row["id"] for row in result(service, "query", q="alpha")] == [2, 1]
+    assert [row["id"] for row in result(service, "query", q="alpha kind:url")] == [1]
+    assert [row["id"] for row in result(service, "query", limit=1, offset=1)] == [2]
+    assert [clip and clip["text"] for clip in result(service, "get", ids=[3, 99])] == ["charlie delta", None]
+    assert result(service, "count") == 3
+
+def test_insert_edit_and_paste(service):
+    assert result(service, "insert", text="echo") == {"id": 4, "duplicate": False}
+    assert result(service, "insert", text="Echo ") == {"id": None, "duplicate": True}
+    assert result(service, "edit", id=4, text="echo edited")["id"] == 4
+    assert result(service, "get", id=4)[0]["text"] == "echo edited"
+    assert [row["id"] for row in result(service, "query", q="edited")] == [4]
+    assert result(service, "paste", id=4)["last_paste"] == service.listener.items.get(4)["last_paste"]
+
+def test_paste_count(service, workdir):
+    assert result(service, "paste", id=2)["pastes"] == 1
+    assert result(service, "paste", id=2)["pastes"] == 2
+    assert [row["pastes"] for row in result(service, "query")] == [0, 2, 0]
+    service.listener.store.close()
+    from store import JournalStore
+    import settings
+    assert JournalStore(settings.COPY_FILE, settings.COPY_JOURNAL_FILE).load().get(2)["pastes"] == 2
+
+def test_delete(service):
+    assert result(service, "delete", id=2) == {"id": 2}
+    assert [row["id"] for row in result(service, "query")] == [3, 1]
+    assert result(service, "query", q="bravo") == []
+    # Its fingerprint is gone too, so the text can be captured again
+    assert result(service, "insert", text="alpha bravo")["duplicate"] is False
+    assert "no clip 2" in call(service, {"op": "delete", "id": 2})["error"]
+
+def test_batch_answers_in_order(service):
+    responses = call(service, [{"op": "count"}, {"op": "insert", "text": "new"}, {"op": "count"}])
+    assert [r["result"] for r in responses] == [3, {"id": 4, "duplicate": False}, 4]
+
+@pytest.mark.parametrize("request_line, error", [
+    (b"{not json", "invalid JSON"),
+    (b'{"op": "drop"}', "unknown op"),
+    (b'{"op": "get"}', "bad get request"),
+    (b'{"op": "insert", "text": ""}', "bad insert request"),
+    (b'{"op": "edit", "id": 99, "text": "x"}', "no clip 99"),
+])
+def test_errors(service, request_line, error):
+    response = json.loads(service.handle_line(request_line))
+    assert not response["ok"] and error in response["error"]
+
+def test_second_instance_does_not_take_over(service):
+    assert service.start()
+    assert service_running(service.name)
+    other = HistoryService(service.listener, name=service.name)
+    assert not other.start()
+    service.close()
@@ -0,0 +1,151 @@
+# test_store.py
+# Quick-Clip Clipboard Popup App
+#
+# History stores: journal replay and torn-tail recovery, streaming reads, migration to SQLite,
+# SQLite reads during a write, and the background persistence worker.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, json, sqlite3, threading, time
+import pytest
+import settings, store
+from blobs import make_item, set_item_text, item_text, blob_path
+from store import JournalStore, SqliteStore, PersistWorker
+
+def journal_store():
+    return JournalStore(settings.COPY_FILE, settings.COPY_JOURNAL_FILE)
+
+def journal():
+    with open(settings.COPY_JOURNAL_FILE, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def capture(items, target, text):
+    item = make_item(text)
+    item["id"] = items.new_id()
+    items.prepend(item)
+    target.append(item)
+    return item
+
+def edited_history(workdir):
+    """A journal store whose history went through captures, an edit, a pin and a deletion."""
+    target = journal_store()
+    items = target.load()
+    first = capture(items, target, "first")
+    second = capture(items, target, "second")
+    capture(items, target, "x" * (settings.BLOB_THRESHOLD + 1))  # Large: kept in the blob store
+    set_item_text(first, "first, edited")
+    target.edit(first)
+    first["pinned"] = True
+    target.set_meta(first["id"], {"pinned": True})
+    items.delete(second["id"])
+    target.remove(second["id"])
+    return target, items
+
+def test_journal_replay(workdir):
+    target, items = edited_history(workdir)
+    assert [record["op"] for record in journal()] == ["add", "add", "add", "edit", "meta", "del"]
+    loaded = journal_store().load()
+    assert loaded.to_list() == items.to_list()
+    assert loaded.next_id == items.next_id
+    assert [item_text(item) for item in loaded] == ["x" * (settings.BLOB_THRESHOLD + 1), "first, edited"]
+    assert loaded[-1].get("pinned")
+
+def test_torn_journal_tail(workdir):
+    target, items = edited_history(workdir)
+    with open(settings.COPY_JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        f.write('{"op": "add", "item": {"text": "cut off')  # Crash mid-append
+    loaded = journal_store().load()
+    assert loaded.to_list() == items.to_list()
+    # Recovery compacts: the snapshot holds the history and the torn journal is gone
+    assert os.path.getsize(settings.COPY_JOURNAL_FILE) == 0
+    assert journal_store().load().to_list() == items.to_list()
+
+@pytest.mark.parametrize("backend", ["journal", "sqlite"])
+def test_unused_blobs_are_deleted(workdir, backend):
+    from text import update_clipboard_item, remove_clipboard_item
+    target = journal_store() if backend == "journal" else SqliteStore(settings.HISTORY_DB_FILE)
+    items = target.load()
+    large = "x" * (settings.BLOB_THRESHOLD + 1)
+    edited, removed, twin = (capture(items, target, large + suffix) for suffix in ("a", "b", "b"))
+    old_blob = edited["blob"]
+    update_clipboard_item(items, edited["id"], "small now", store=target)
+    assert not os.path.exists(blob_path(old_blob))
+    # A blob goes with the last clip that uses it
+    remove_clipboard_item(items, removed["id"], store=target)
+    assert os.path.exists(blob_path(twin["blob"]))
+    remove_clipboard_item(items, twin["id"], store=target)
+    assert not os.path.exists(blob_path(twin["blob"]))
+    target.close()
+
+def test_iter_items_matches_load(workdir):
+    target, items = edited_history(workdir)
+    target.compact(items)
+    capture(items, target, "after the snapshot")
+    target.set_meta(items[-1]["id"], {"last_paste": 1700000000})
+    items[-1]["last_paste"] = 1700000000
+    streamed = [item.to_dict() for item in journal_store().iter_items()]
+    assert streamed == journal_store().load().to_list() == items.to_list()
+
+def test_sqlite_migration_keeps_ids(workdir, monkeypatch):
+    target, items = edited_history(workdir)
+    monkeypatch.setattr(settings, "HISTORY_BACKEND", "sqlite")
+    monkeypatch.setattr(store, "_store", None)
+    migrated = store.get_store()
+    loaded = migrated.load()
+    assert [(item["id"], item_text(item)) for item in loaded] == [(item["id"], item_text(item)) for item in items]
+    assert loaded.next_id == items.next_id
+    assert migrated.get(items[-1]["id"]).get("pinned")
+    migrated.close()
+
+def test_sqlite_reads_do_not_wait_for_writes(workdir):
+    target = SqliteStore(settings.HISTORY_DB_FILE)
+    items = target.load()
+    capture(items, target, "committed")
+    writing, done = threading.Event(), threading.Event()
+    def write_batch():
+        # A write batch in progress on the worker: the writer lock held, an uncommitted row
+        with target.lock:
+            target.conn.execute("BEGIN")
+            target._insert(make_item("uncommitted"))
+            writing.set()
+            done.wait(5)
+            target.conn.rollback()
+    writer = threading.Thread(target=write_batch)
+    writer.start()
+    try:
+        assert writing.wait(5)
+        start = time.perf_counter()
+        assert [item_text(item) for item in target.recent(10)] == ["committed"]
+        assert target.count() == 1
+        assert time.perf_counter() - start < 1
+    finally:
+        done.set()
+        writer.join()
+    target.close()
+
+def test_worker_close_closes_the_store(workdir):
+    target = SqliteStore(settings.HISTORY_DB_FILE)
+    worker = PersistWorker(target)
+    capture(target.load(), worker, "first")
+    worker.close()
+    for conn in (target.conn, target.reader):
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    reopened = SqliteStore(settings.HISTORY_DB_FILE)
+    assert reopened.count() == 1
+    reopened.close()
+
+def test_worker_writes_clips_as_queued(workdir):
+    target = journal_store()
+    items = target.load()
+    worker = PersistWorker(target, debounce_ms=10000)
+    item = capture(items, worker, "first")
+    fields = {"pinned": True}
+    worker.set_meta(item["id"], fields)
+    # Changed on the GUI thread while the writes are still queued
+    set_item_text(item, "second")
+    fields["pinned"] = False
+    worker.close()
+    assert [(r["op"], r.get("item", {}).get("text"), r.get("fields")) for r in journal()] == [
+        ("add", "first", None), ("meta", None, {"pinned": True})]
@@ -0,0 +1,65 @@
+# test_tracing.py
+# Quick-Clip Clipboard Popup App
+#
+# Tracing: spans are exported to TRACE_FILE off the recording thread, and history saves are
+# traced where they actually happen, on the persistence worker.
+#
+# Author: Tof-O
+# License: MIT
+
+import os, json, threading, time
+import pytest
+import settings, tracing
+from store import JournalStore, PersistWorker
+
+@pytest.fixture
+def tracing_on(workdir, monkeypatch):
+    monkeypatch.setattr(tracing, "enabled", True)
+    tracing.reset()
+    yield
+    tracing.flush()
+    tracing.reset()
+
+def trace_lines():
+    if not os.path.exists(settings.TRACE_FILE):
+        return []
+    with open(settings.TRACE_FILE, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_full_buffer_is_written_by_the_writer_thread(tracing_on, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_FLUSH_EVERY", 4)
+    writes = []
+    flush = tracing.flush
+    def record_writer():
+        writes.append(threading.current_thread().name)
+        flush()
+    monkeypatch.setattr(tracing, "flush", record_writer)
+    for i in range(3):
+        tracing.record("span", i)
+    assert trace_lines() == []
+    tracing.record("span", 3)
+    assert wait_until(lambda: len(trace_lines()) == 4)
+    assert [line["ms"] for line in trace_lines()] == [0, 1, 2, 3]
+    assert writes and threading.main_thread().name not in writes
+
+def test_flush_writes_the_rest(tracing_on):
+    tracing.record("span", 1.5)
+    tracing.flush()
+    assert [(line["span"], line["ms"]) for line in trace_lines()] == [("span", 1.5)]
+
+def test_save_is_traced_on_the_worker(tracing_on):
+    target = JournalStore(settings.COPY_FILE, settings.COPY_JOURNAL_FILE)
+    items = target.load()
+    worker = PersistWorker(target)
+    worker.compact(items)
+    worker.close()
+    tracing.flush()
+    saves = [line for line in trace_lines() if line["span"] == "save_copies"]
+    assert [line["thread"] for line in saves] == ["quickclip-persist"]
+    assert tracing.stats()["save_copies"]["count"] == 1
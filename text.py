@@ -1,126 +1,700 @@
 # text.py
 # Quick-Clip Clipboard Popup App
 #
-# This file contains clipboard monitoring logic, hotkey listeners, and tab row creation for displaying clipboard items.
-# Manages clipboard history and theme persistence.
+# This file contains clipboard monitoring logic, hotkey listeners, and the list model/delegate for displaying clipboard items.
+# Manages clipboard history; theme settings are held by the config service (config.py).
 #
 # Author: Tof-O
 # License: MIT
 
-from PySide6.QtCore import QTimer, Signal, QObject
+from PySide6.QtCore import QTimer, Signal, QObject, Qt, QAbstractListModel, QModelIndex, QRect, QSize, QEvent
 import keyboard
-from PySide6.QtWidgets import QHBoxLayout, QLabel, QPushButton, QWidget
-from settings import BUTTON_CONFIG
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+from PySide6.QtGui import QColor, QImage
+from settings import (
+    BUTTON_CONFIG, THEME_COLORS, HISTORY_PAGE_SIZE, CLIPBOARD_CAPTURE_MODE, CLIPBOARD_UNRELIABLE_PLATFORMS,
+    CLIPBOARD_POLL_MIN_MS, CLIPBOARD_POLL_MAX_MS, CLIPBOARD_POLL_BACKOFF, RETENTION_CHECK_EVERY, RETENTION_INTERVAL_MS,
+    POPUP_PREWARM_DELAY_MS, CAPTURE_IMAGES, CAPTURE_HTML, CAPTURE_URIS, HTML_MAX_CHARS
+)
+import settings
+from store import clip_fingerprint, set_meta
+from search import TrigramIndex
+from tracing import traced, span
+from images import get_images
+from blobs import make_item, set_item_text, item_text, item_snippet, item_fingerprint
+from history import Clip
+from clipmeta import clip_detail
+from neardup import NearDupIndex, cluster_key
+import hashlib, time, logging
 
-def create_tab_row(text, ts, on_preview, on_paste):
-    tab_row = QHBoxLayout()
-    bullet = QLabel(BUTTON_CONFIG['tab_bullet']['text'])
-    bullet.setStyleSheet("font-size:18px; margin-right:8px;")
-    tab_row.addWidget(bullet)
-    tab_btn = QPushButton(f"{text[:32]}\n{ts}")
-    tab_btn.setStyleSheet("text-align:left;")
-    tab_btn.clicked.connect(lambda checked, i=text: on_preview(i))
-    tab_row.addWidget(tab_btn, stretch=1)
-    paste_btn = QPushButton(BUTTON_CONFIG['tab_paste']['text'])
-    paste_btn.setFixedSize(*BUTTON_CONFIG['tab_paste']['size'])
-    paste_btn.setStyleSheet("margin-left:8px;")
-    paste_btn.clicked.connect(lambda checked, i=text: on_paste(i))
-    tab_row.addWidget(paste_btn)
-    tab_widget = QWidget()
-    tab_widget.setLayout(tab_row)
-    return tab_widget
+log = logging.getLogger(__name__)
+
+class DedupIndex:
+    """
+    Set of normalized fingerprints for the clipboard history.
+    Built once from the loaded items (or precomputed fingerprints) and kept in sync
+    on insert, edit and removal, so a membership check only costs O(len(text)).
+    """
+    def __init__(self, items=(), fingerprints=()):
+        self._counts = {}
+        for key in map(item_fingerprint, items):
+            self._counts[key] = self._counts.get(key, 0) + 1
+        for key in fingerprints:
+            self._counts[key] = self._counts.get(key, 0) + 1
+    def __contains__(self, text):
+        return clip_fingerprint(text) in self._counts
+    def __len__(self):
+        return len(self._counts)
+    def add(self, text):
+        self.add_fingerprint(clip_fingerprint(text))
+    def add_fingerprint(self, key):
+        self._counts[key] = self._counts.get(key, 0) + 1
+    def discard(self, text):
+        self.discard_fingerprint(clip_fingerprint(text))
+    def discard_fingerprint(self, key):
+        count = self._counts.get(key, 0)
+        if count > 1:
+            self._counts[key] = count - 1
+        elif count:
+            del self._counts[key]
+    def replace(self, old_text, new_text):
+        self.discard(old_text)
+        self.add(new_text)
+
+_win32clipboard = None  # The win32clipboard module once imported, False where it is not available
+
+def _clipboard_sequence_number():
+    """Return the OS clipboard change counter, or None where it is unavailable."""
+    global _win32clipboard
+    if _win32clipboard is None:
+        try:
+            import win32clipboard
+            _win32clipboard = win32clipboard
+        except ImportError:
+            # Not retried: a failed import walks sys.path again on every poll
+            _win32clipboard = False
+    if not _win32clipboard:
+        return None
+    try:
+        return _win32clipboard.GetClipboardSequenceNumber()
+    except Exception:
+        return None
+
+class ClipboardWatcher(QObject):
+    """
+    Reports clipboard text changes without re-reading the clipboard on every tick.
+    In "signal" mode it reacts to QClipboard.dataChanged; in "poll" mode it uses a timer
+    that backs off while the clipboard is idle and skips reads when the OS change
+    counter has not moved. A size plus hash guard drops notifications for unchanged text.
+    Plain text is reported through text_changed; text with HTML or a URI list attached,
+    and images, through clip_changed as {"text", "html"/"uris"} or {"image": QImage}.
+    """
+    text_changed = Signal(str)
+    clip_changed = Signal(object)
+    def __init__(self, clipboard, mode=CLIPBOARD_CAPTURE_MODE):
+        super().__init__()
+        self.clipboard = clipboard
+        if mode == "auto":
+            from PySide6.QtGui import QGuiApplication
+            platform = QGuiApplication.platformName().lower()
+            mode = "poll" if platform in CLIPBOARD_UNRELIABLE_PLATFORMS else "signal"
+        self.mode = mode
+        # Number of full clipboard text reads performed per capture mode
+        self.reads = {"signal": 0, "poll": 0}
+        self.interval = CLIPBOARD_POLL_MIN_MS
+        self._last_size = -1
+        self._last_hash = None
+        self._last_seq = None
+        self.timer = None
+        if self.mode == "signal":
+            self.clipboard.dataChanged.connect(self._on_data_changed)
+        else:
+            self.timer = QTimer(self)
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self._on_poll)
+            self.timer.start(self.interval)
+    def read_text(self, mode=None):
+        """Read the clipboard text (None if it holds no text) and count the read."""
+        mime = self.clipboard.mimeData()
+        if mime is None:
+            return None
+        if mime.hasText():
+            self.reads[mode or self.mode] += 1
+            return self.clipboard.text()
+        if CAPTURE_URIS and mime.hasUrls():
+            # A copied file list: its text is one path (or URL) per line
+            self.reads[mode or self.mode] += 1
+            return '\n'.join(url.toLocalFile() or url.toString() for url in mime.urls())
+        return None
+    def _extras(self, mime):
+        """HTML and URI list that came with the clipboard text, if any."""
+        extras = {}
+        if CAPTURE_HTML and mime.hasHtml():
+            html = mime.html()
+            if html and len(html) <= HTML_MAX_CHARS:
+                extras["html"] = html
+        if CAPTURE_URIS and mime.hasUrls():
+            extras["uris"] = [url.toString() for url in mime.urls()]
+        return extras
+    def _image_changed(self, image):
+        """Cheap guard for images: size plus a hash of every 16th scanline."""
+        image = image.convertToFormat(QImage.Format_ARGB32)
+        h = hashlib.blake2b(digest_size=16)
+        for y in range(0, image.height(), 16):
+            h.update(bytes(image.constScanLine(y)))
+        return self._changed_digest(-image.width() * image.height(), h.digest())
+    def _changed(self, text):
+        """Cheap guard: compare size first, hash only when the size matches."""
+        return self._changed_digest(len(text), hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest())
+    def _changed_digest(self, size, digest):
+        if size == self._last_size and digest == self._last_hash:
+            return False
+        self._last_size = size
+        self._last_hash = digest
+        return True
+    def check(self, mode=None):
+        """Read the clipboard once and emit text_changed / clip_changed if its content is new."""
+        text = self.read_text(mode)
+        if text is not None:
+            if not self._changed(text):
+                return False
+            extras = self._extras(self.clipboard.mimeData())
+            if extras:
+                self.clip_changed.emit(dict(extras, text=text))
+            else:
+                self.text_changed.emit(text)
+            return True
+        mime = self.clipboard.mimeData()
+        if CAPTURE_IMAGES and mime is not None and mime.hasImage():
+            image = self.clipboard.image()
+            if image.isNull() or not self._image_changed(image):
+                return False
+            self.reads[mode or self.mode] += 1
+            self.clip_changed.emit({"image": image})
+            return True
+        return False
+    def poke(self):
+        """Reset the poll interval, e.g. right after a copy hotkey."""
+        if self.timer is not None:
+            self.interval = CLIPBOARD_POLL_MIN_MS
+            self.timer.start(self.interval)
+    def _on_data_changed(self):
+        self.check("signal")
+    def _on_poll(self):
+        seq = _clipboard_sequence_number()
+        if seq is not None and seq == self._last_seq:
+            changed = False
+        else:
+            self._last_seq = seq
+            changed = self.check("poll")
+        if changed:
+            self.interval = CLIPBOARD_POLL_MIN_MS
+        else:
+            self.interval = min(int(self.interval * CLIPBOARD_POLL_BACKOFF), CLIPBOARD_POLL_MAX_MS)
+        self.timer.start(self.interval)
+
+class HistoryModel(QAbstractListModel):
+    """
+    List model over the clipboard history items.
+    Rows are exposed a page at a time through canFetchMore/fetchMore, so the view only
+    lays out what has been scrolled into reach; paged stores load older items on demand.
+    With a NearDupIndex (clusters), each near-duplicate cluster is one row, its newest clip;
+    toggle_cluster() expands the cluster's other clips below it.
+    """
+    TextRole = Qt.UserRole + 1
+    TsRole = Qt.UserRole + 2
+    PinnedRole = Qt.UserRole + 3
+    ThumbnailRole = Qt.UserRole + 4
+    IdRole = Qt.UserRole + 5
+    DetailRole = Qt.UserRole + 6
+    SimilarRole = Qt.UserRole + 7  # Other clips in the row's cluster; -1 on the rows of an expanded cluster
+    ExpandedRole = Qt.UserRole + 8
+    def __init__(self, items, store=None, parent=None, clusters=None):
+        super().__init__(parent)
+        self.items = items
+        self.store = store
+        self.clusters = clusters
+        self.expanded = set()  # Keys of the expanded clusters
+        self._reset()
+    def _reset(self):
+        self._exhausted = self.store is None
+        if self.clusters is None:
+            self._rows = min(len(self.items), HISTORY_PAGE_SIZE)
+            return
+        self._visible = []  # (item, is a member row of an expanded cluster)
+        self._cursor = 0  # Next history row to look at
+        self._shown = set()  # Keys of the clusters that have a row
+        self._sizes = {}  # Cluster key -> number of clips, for the rows painted so far
+        self._fill(HISTORY_PAGE_SIZE)
+    def _fill(self, count):
+        """Add up to count cluster rows from the history, newest first (plus members of expanded clusters)."""
+        target = len(self._visible) + count
+        while len(self._visible) < target and self._cursor < len(self.items):
+            item = self.items[self._cursor]
+            self._cursor += 1
+            key = cluster_key(item)
+            if key in self._shown:
+                continue  # An older clip of a cluster already listed
+            self._shown.add(key)
+            self._visible.append((item, False))
+            if key in self.expanded:
+                self._visible.extend((member, True) for member in self.clusters.members(key) if member is not item)
+        self._rows = len(self._visible)
+    def _cluster_rows(self, key):
+        """Row of a cluster and the end of its member rows, or (None, None) if it is not listed."""
+        first = next((row for row, (item, member) in enumerate(self._visible)
+                      if not member and cluster_key(item) == key), None)
+        if first is None:
+            return None, None
+        last = first + 1
+        while last < len(self._visible) and self._visible[last][1]:
+            last += 1
+        return first, last
+    def _similar(self, item):
+        key = cluster_key(item)
+        if key not in self._sizes:
+            self._sizes[key] = self.clusters.size(key)
+        return max(self._sizes[key] - 1, 0)
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._rows:
+            return None
+        if self.clusters is None:
+            item, member = self.items[index.row()], False
+        else:
+            item, member = self._visible[index.row()]
+        if role == self.SimilarRole:
+            if self.clusters is None:
+                return 0
+            return -1 if member else self._similar(item)
+        if role == self.ExpandedRole:
+            return self.clusters is not None and not member and cluster_key(item) in self.expanded
+        if role == Qt.DisplayRole:
+            # Label, kind and counts were computed at capture; painting never touches the text
+            return item.get("label", "")
+        if role == self.TextRole:
+            # Large clips are only loaded from the blob store here, on click
+            return item_text(item)
+        if role == self.IdRole:
+            return item["id"]
+        if role == self.TsRole:
+            # Formatted from the epoch only for rows being painted
+            return item["ts"]
+        if role == self.DetailRole:
+            similar = self._similar(item) if self.clusters is not None and not member else 0
+            return f"+{similar} similar · {clip_detail(item)}" if similar else clip_detail(item)
+        if role == self.PinnedRole:
+            return bool(item.get("pinned"))
+        if role == self.ThumbnailRole:
+            # None until the image worker has the thumbnail; the view repaints on thumbnail_ready
+            return get_images().thumbnail(item["image"]) if "image" in item else None
+        return None
+    def prepend(self, item):
+        """Insert a new item at the top of the history (with clusters: it becomes its cluster's row, moved to the top)."""
+        if self.clusters is None:
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self.items.prepend(item)
+            self._rows += 1
+            self.endInsertRows()
+            return
+        item = self.items.prepend(item)  # Gives it its id, which names its cluster if it joined none
+        key = cluster_key(item)
+        first, last = self._cluster_rows(key) if key in self._shown else (None, None)
+        if first is not None:
+            self.beginRemoveRows(QModelIndex(), first, last - 1)
+            del self._visible[first:last]
+            self._rows = len(self._visible)
+            self.endRemoveRows()
+        self._cursor += 1
+        self._shown.add(key)
+        self._sizes.pop(key, None)
+        rows = [(item, False)]
+        if key in self.expanded:
+            rows.extend((member, True) for member in self.clusters.members(key) if member is not item)
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._visible[0:0] = rows
+        self._rows = len(self._visible)
+        self.endInsertRows()
+    def toggle_cluster(self, clip_id):
+        """Expand or collapse the cluster listed with the clip clip_id."""
+        item = self.items.get(clip_id) if self.clusters is not None else None
+        if item is None:
+            return
+        key = cluster_key(item)
+        first, last = self._cluster_rows(key)
+        if first is None:
+            return
+        if key in self.expanded:
+            self.expanded.discard(key)
+            if last > first + 1:
+                self.beginRemoveRows(QModelIndex(), first + 1, last - 1)
+                del self._visible[first + 1:last]
+                self._rows = len(self._visible)
+                self.endRemoveRows()
+        else:
+            self.expanded.add(key)
+            rep = self._visible[first][0]
+            members = [(member, True) for member in self.clusters.members(key) if member is not rep]
+            self._sizes[key] = len(members) + 1
+            if members:
+                self.beginInsertRows(QModelIndex(), first + 1, first + len(members))
+                self._visible[first + 1:first + 1] = members
+                self._rows = len(self._visible)
+                self.endInsertRows()
+        self.dataChanged.emit(self.index(first), self.index(first))
+    def set_items(self, items):
+        self.beginResetModel()
+        self.items = items
+        self._reset()
+        self.endResetModel()
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        if self.clusters is not None:
+            return self._cursor < len(self.items) or not self._exhausted
+        return self._rows < len(self.items) or not self._exhausted
+    def fetchMore(self, parent=QModelIndex()):
+        loaded = self._cursor if self.clusters is not None else self._rows
+        if loaded >= len(self.items) and not self._exhausted:
+            more = self.store.recent(HISTORY_PAGE_SIZE, offset=len(self.items))
+            if len(more) < HISTORY_PAGE_SIZE:
+                self._exhausted = True
+            self.items.extend(more)
+            if self.clusters is not None:
+                self.clusters.extend(more)
+        if self.clusters is not None:
+            old = self._rows
+            self._fill(HISTORY_PAGE_SIZE)
+            rows, self._rows = self._rows, old
+        else:
+            rows = min(len(self.items), self._rows + HISTORY_PAGE_SIZE)
+        if rows > self._rows:
+            self.beginInsertRows(QModelIndex(), self._rows, rows - 1)
+            self._rows = rows
+            self.endInsertRows()
+
+class HistoryDelegate(QStyledItemDelegate):
+    """
+    Paints a history row (bullet, label, timestamp, kind/size and paste affordance) directly,
+    instead of building a widget tree per clip. Clicks are reported with the clip's id; the
+    bullet of a near-duplicate cluster's row expands or collapses it.
+    """
+    preview_requested = Signal(int)
+    paste_requested = Signal(int)
+    toggle_requested = Signal(int)
+    def __init__(self, theme='light', parent=None):
+        super().__init__(parent)
+        self.theme = theme
+    def sizeHint(self, option, index):
+        # Width is nominal: list-mode rows stretch to the viewport width
+        return QSize(1, 2 * option.fontMetrics.height() + 16)
+    @staticmethod
+    def _paste_rect(rect):
+        w, h = BUTTON_CONFIG['tab_paste']['size']
+        return QRect(rect.right() - w - 4, rect.top() + (rect.height() - h) // 2, w, h)
+    @staticmethod
+    def _bullet_rect(rect):
+        return QRect(rect.left(), rect.top(), 24, rect.height())
+    @staticmethod
+    def _bullet(index):
+        similar = index.data(HistoryModel.SimilarRole)
+        if similar:
+            if similar < 0:
+                return BUTTON_CONFIG['tab_member']['text']
+            return BUTTON_CONFIG['tab_expanded' if index.data(HistoryModel.ExpandedRole) else 'tab_collapsed']['text']
+        return BUTTON_CONFIG['tab_pinned' if index.data(HistoryModel.PinnedRole) else 'tab_bullet']['text']
+    def paint(self, painter, option, index):
+        colors = THEME_COLORS[self.theme]
+        hovered = bool(option.state & QStyle.State_MouseOver)
+        rect = option.rect.adjusted(4, 2, -4, -2)
+        paste_rect = self._paste_rect(rect)
+        row_rect = QRect(rect.left() + 24, rect.top(), paste_rect.left() - rect.left() - 32, rect.height())
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        painter.setPen(QColor(colors['label']))
+        painter.drawText(self._bullet_rect(rect), Qt.AlignCenter, self._bullet(index))
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(colors['btn_hover'] if hovered else colors['btn_bg']))
+        painter.drawRoundedRect(row_rect, 8, 8)
+        painter.drawRoundedRect(paste_rect, 8, 8)
+        painter.setPen(QColor(colors['btn_fg']))
+        text_rect = row_rect.adjusted(8, 4, -8, -4)
+        thumb = index.data(HistoryModel.ThumbnailRole)
+        if thumb is not None and not thumb.isNull():
+            side = text_rect.height()
+            scaled = QSize(thumb.width(), thumb.height()).scaled(side, side, Qt.KeepAspectRatio)
+            painter.drawImage(QRect(text_rect.left(), text_rect.top() + (side - scaled.height()) // 2,
+                                    scaled.width(), scaled.height()), thumb)
+            text_rect.setLeft(text_rect.left() + side + 8)
+        snippet = option.fontMetrics.elidedText(index.data(Qt.DisplayRole), Qt.ElideRight, text_rect.width())
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop, snippet)
+        ts = index.data(HistoryModel.TsRole)
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignBottom, ts)
+        detail_width = text_rect.width() - option.fontMetrics.horizontalAdvance(ts) - 8
+        detail = option.fontMetrics.elidedText(index.data(HistoryModel.DetailRole), Qt.ElideRight, detail_width)
+        painter.drawText(text_rect, Qt.AlignRight | Qt.AlignBottom, detail)
+        painter.drawText(paste_rect, Qt.AlignCenter, BUTTON_CONFIG['tab_paste']['text'])
+        painter.restore()
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            clip_id = index.data(HistoryModel.IdRole)
+            rect = option.rect.adjusted(4, 2, -4, -2)
+            if self._paste_rect(rect).contains(event.position().toPoint()):
+                self.paste_requested.emit(clip_id)
+            elif (index.data(HistoryModel.SimilarRole) or 0) > 0 and self._bullet_rect(rect).contains(event.position().toPoint()):
+                self.toggle_requested.emit(clip_id)
+            else:
+                self.preview_requested.emit(clip_id)
+            return True
+        return False
 
 class HotkeyListener(QObject):
     show_popup_signal = Signal(str)
-    def __init__(self):
+    copy_signal = Signal()
+    popup_ready = Signal(float)  # Popup build time in ms, once it has been pre-built
+    popup_shown = Signal(float)  # Ctrl+V-to-visible latency in ms
+    def __init__(self, hotkeys=True):
+        """hotkeys=False skips the global Ctrl+C / Ctrl+V hooks (headless use, e.g. benchmark.py)."""
         super().__init__()
-        from settings import load_copies
+        from store import get_store, PersistWorker
         from PySide6.QtGui import QGuiApplication
-        # Each copy is a dict: {"text": ..., "ts": ...}
-        self.items = load_copies()  # Persistent clipboard history
-        self.theme = self.load_theme()
+        # Each copy is a Clip record (id, text, epoch time, ...), held in a ClipHistory
+        # Writes are queued to a background thread; see close() for the flush on quit
+        self.store = PersistWorker(get_store())
+        with span("load_copies"):
+            self.items = self.store.load()  # Persistent clipboard history (most recent page for sqlite)
+        self.dedup = DedupIndex(fingerprints=self.store.fingerprints())
+        # Built in chunks after the event loop starts so a large history doesn't delay startup
+        self.search_index = TrigramIndex(self.items, deferred=True)
+        # Near-duplicate clusters; their band index is built alongside the search index
+        self.clusters = NearDupIndex(self.items, deferred=True) if settings.NEARDUP_ENABLED else None
+        self.search_index_timer = QTimer(self)
+        self.search_index_timer.timeout.connect(self._build_search_index)
+        self.search_index_timer.start(0)
+        from config import get_config
+        self.config = get_config()  # Read once; later changes arrive through the file watcher
         self.popup = None
+        self.popup_build_ms = None
+        self.hotkey_time = None
+        self.last_popup_latency_ms = None
+        self._show_start = None
         # Set last_clipboard to current clipboard content, not just first item in history
         clipboard = QGuiApplication.instance().clipboard()
-        if clipboard.mimeData().hasText():
+        mime = clipboard.mimeData()
+        if mime is not None and mime.hasText():
             self.last_clipboard = clipboard.text().strip()
         elif self.items:
-            self.last_clipboard = self.items[0]["text"]
+            self.last_clipboard = item_snippet(self.items[0])
         else:
             self.last_clipboard = ""
         self.show_popup_signal.connect(self.show_popup)
-        keyboard.add_hotkey('ctrl+v', self.on_ctrl_v, suppress=True)
-        keyboard.add_hotkey('ctrl+c', self.on_ctrl_c)
-        self.clipboard_timer = QTimer()
-        self.clipboard_timer.timeout.connect(self.check_clipboard)
-        self.clipboard_timer.start(100)
-    def load_theme(self):
-        import os, json
-        config_path = os.path.join(os.path.expanduser("~"), ".clipboard_popup_theme.json")
-        if os.path.exists(config_path):
-            try:
-                with open(config_path, "r") as f:
-                    data = json.load(f)
-                    return data.get("theme", "light")
-            except Exception:
-                return "light"
-        return "light"
-    def check_clipboard(self):
-        from PySide6.QtGui import QGuiApplication
-        from settings import save_copies
-        clipboard = QGuiApplication.instance().clipboard()
-        if clipboard.mimeData().hasText():
-            text = clipboard.text()
-            # Normalize: remove all whitespace and null chars for deduplication
-            def normalize(s):
-                return ''.join(c for c in s if not c.isspace() and c != '\u0000').lower()
-            normalized_text = normalize(text)
-            already_exists = any(normalize(item["text"]) == normalized_text for item in self.items)
-            if text and not already_exists:
-                from datetime import datetime
-                ts = datetime.now().strftime(' %d-%m-%Y, %H:%M')
-                self.items.insert(0, {"text": text, "ts": ts})
-                self.last_clipboard = text
-                save_copies(self.items)
-                if self.popup and self.popup.isVisible():
-                    self.popup.items = self.items
-                    self.popup._init_ui()
-                    self.popup.apply_theme()
+        if hotkeys:
+            keyboard.add_hotkey('ctrl+v', self.on_ctrl_v, suppress=True)
+            keyboard.add_hotkey('ctrl+c', self.on_ctrl_c)
+        self.clipboard_watcher = ClipboardWatcher(clipboard)
+        self.clipboard_watcher.text_changed.connect(self.check_clipboard)
+        self.clipboard_watcher.clip_changed.connect(self.capture_clip)
+        self.images = get_images()
+        self.images.stored.connect(self._on_image_stored)
+        self.copy_signal.connect(self.clipboard_watcher.poke)
+        # Capture whatever is on the clipboard at startup
+        QTimer.singleShot(0, self.clipboard_watcher.check)
+        # Evict clips beyond the retention limits at startup, periodically and every few captures
+        from retention import RetentionManager
+        self.retention = RetentionManager(self.items, self.store, self._evict, self)
+        self.retention.evicted.connect(self._on_evicted)
+        self.retention_timer = QTimer(self)
+        self.retention_timer.timeout.connect(self.retention.schedule)
+        self.retention_timer.start(RETENTION_INTERVAL_MS)
+        self._captured_since_retention = 0
+        QTimer.singleShot(0, self.retention.schedule)
+        # Build the popup hidden once the app is listening, so the first Ctrl+V only has to show it
+        QTimer.singleShot(POPUP_PREWARM_DELAY_MS, self._create_popup)
+    def close(self):
+        """Flush queued history writes; connected to QApplication.aboutToQuit."""
+        self.store.close()
+    def _evict(self, rows):
+        evicted = evict_clipboard_items(self.items, rows, self.dedup, self.store, self.search_index, self.clusters)
+        if self.popup is not None:
+            self.popup.history_model.set_items(self.items)
+        return evicted
+    def _on_evicted(self, report):
+        if report["evicted"]:
+            log.info("Retention evicted %d clips, reclaiming %.0f KB", report['evicted'], report['bytes'] / 1024)
+    def _build_search_index(self):
+        pending = self.search_index.build_step()
+        if self.clusters is not None:
+            pending = self.clusters.build_step() or pending
+        if not pending:
+            self.search_index_timer.stop()
+    @traced("check_clipboard")
+    def check_clipboard(self, text=None, extras=None):
+        if text is None:
+            text = self.clipboard_watcher.read_text()
+        if text is not None:
             # Always update last_clipboard to current clipboard
-            elif text:
+            if self.add_text(text, extras) is None and text:
                 self.last_clipboard = text
+    def add_text(self, text, extras=None):
+        """Add a clip for text unless the history already has it; returns the new clip, or None for a duplicate."""
+        # Dedup on the normalized fingerprint (whitespace/NUL stripped, lowercase)
+        if not text or text in self.dedup:
+            return None
+        item = make_item(text, extras=extras)
+        self._add_item(item, text)
+        return item
+    def capture_clip(self, clip):
+        """Capture a rich clip: images are stored by the image worker, HTML / URI lists go through check_clipboard."""
+        if "image" in clip:
+            self.images.store(clip["image"], int(time.time()))
+        else:
+            self.check_clipboard(clip["text"], {k: v for k, v in clip.items() if k != "text"})
+    def _on_image_stored(self, item):
+        # The label includes the pixel hash, so the dedup index catches repeated images
+        if item["text"] not in self.dedup:
+            self._add_item(item, item["text"])
+    def _add_item(self, item, text):
+        # Stable id from capture on: edits, pins, pastes and deletions refer to the clip by it
+        item["id"] = self.items.new_id()
+        if self.clusters is not None:
+            self.clusters.add(item)  # Sets its cluster before the list shows it
+        self._prepend_item(item)
+        self.dedup.add_fingerprint(item_fingerprint(item))
+        self.search_index.add(item)
+        self.last_clipboard = text
+        self.store.append(item)
+        self._captured_since_retention += 1
+        if self._captured_since_retention >= RETENTION_CHECK_EVERY:
+            self._captured_since_retention = 0
+            self.retention.schedule()
     def on_ctrl_c(self):
-        pass
+        self.copy_signal.emit()
     def on_ctrl_v(self):
+        self.hotkey_time = time.perf_counter()
         self.show_popup_signal.emit("")
+    def _prepend_item(self, item):
+        """Insert a clip at the top of the history, through the popup's model once it exists."""
+        if self.popup is not None:
+            self.popup.add_item(item)
+        else:
+            self.items.prepend(item)
+    def _create_popup(self):
+        """Build the popup (hidden) unless it already exists: widgets, styling and native window."""
+        if self.popup is not None:
+            return
+        start = time.perf_counter()
+        from preview import PopupWindow
+        self.popup = PopupWindow(self.items, theme=self.config.theme, dedup=self.dedup, store=self.store, search_index=self.search_index,
+                                 clusters=self.clusters)
+        self.popup.ensurePolished()
+        self.popup.centralWidget().layout().activate()
+        self.popup.winId()
+        self.popup.painted.connect(self._on_popup_painted)
+        self.popup_build_ms = (time.perf_counter() - start) * 1000
+        self.popup_ready.emit(self.popup_build_ms)
     def show_popup(self, _):
         if not self.items:
-            self.items.append({"text": "(No copied items yet)", "ts": ""})
-        self.theme = self.load_theme()
-        if self.popup is None:
-            from preview import PopupWindow
-            self.popup = PopupWindow(self.items, theme=self.theme)
-            def update_theme():
-                self.theme = self.popup.theme
-                self.save_theme(self.theme)
-            self.popup.theme_btn.clicked.connect(update_theme)
-        else:
-            self.popup.items = self.items
-            self.popup.theme = self.theme
-            self.popup._init_ui()
-            self.popup.apply_theme()
+            self._prepend_item(Clip(text="(No copied items yet)"))
+        self._create_popup()
+        self.popup.hotkey_time = self.hotkey_time
+        self._show_start = self.hotkey_time if self.hotkey_time is not None else time.perf_counter()
+        self.hotkey_time = None
         self.popup.show_at_cursor()
-    def save_theme(self, theme):
-        import os, json
-        config_path = os.path.join(os.path.expanduser("~"), ".clipboard_popup_theme.json")
-        try:
-            with open(config_path, "w") as f:
-                json.dump({"theme": theme}, f)
-        except Exception:
-            pass
-def update_clipboard_item(items, old_text, new_text):
-    for idx, item in enumerate(items):
-        if item["text"] == old_text:
-            items[idx]["text"] = new_text
-            return idx
-    return -1
+    def _on_popup_painted(self):
+        # Ctrl+V-to-first-paint latency; tests/test_popup.py holds it to POPUP_SHOW_TARGET_MS
+        self.last_popup_latency_ms = (time.perf_counter() - self._show_start) * 1000
+        self.popup_shown.emit(self.last_popup_latency_ms)
+def find_clip(items, clip_id, store=None):
+    """Return the clip with id clip_id from the history or, for a paged store, the database (None if gone)."""
+    item = items.get(clip_id)
+    if item is None and store is not None and store.paged:
+        item = store.get(clip_id)
+    return item
+
+def update_clipboard_item(items, clip_id, new_text, dedup=None, store=None, search_index=None, clusters=None):
+    """Replace the content of a clip with new_text, re-clustering it by its new text; returns the clip, or None if it is gone."""
+    item = find_clip(items, clip_id, store)
+    if item is None:
+        return None
+    old_fingerprint = item_fingerprint(item)
+    old_blob, old_image = item.get("blob"), item.get("image")
+    set_item_text(item, new_text)
+    if dedup is not None:
+        dedup.discard_fingerprint(old_fingerprint)
+        dedup.add(new_text)
+    if store is not None:
+        store.edit(item)
+        if old_blob or old_image:
+            # The old content's file goes once the edit is saved, unless a clip (this one included) still uses it
+            store.release(old_blob, old_image)
+    if search_index is not None:
+        search_index.update(item)
+    if clusters is not None:
+        for changed_id, key in clusters.update(item).items():
+            if store is not None:
+                store.set_meta(changed_id, {"cluster": key})
+    return item
+
+def remove_clipboard_item(items, clip_id, dedup=None, store=None, search_index=None, clusters=None):
+    """Delete a clip (from the database only, for an older page of a paged store); returns it, or None if it is gone."""
+    item = items.delete(clip_id)
+    if item is None and store is not None and store.paged:
+        item = store.get(clip_id)
+    if item is None:
+        return None
+    if dedup is not None:
+        dedup.discard_fingerprint(item_fingerprint(item))
+    if store is not None:
+        store.remove(clip_id)
+        store.release(item.get("blob"), item.get("image"))
+    if search_index is not None:
+        search_index.remove(clip_id)
+    if clusters is not None:
+        clusters.remove(clip_id)
+    return item
+
+def set_clipboard_item_meta(items, clip_id, fields, store=None):
+    """Set metadata (pinned, last_paste) on a clip; None removes a field."""
+    item = items.get(clip_id)
+    if item is not None:
+        set_meta(item, fields)
+    if store is not None:
+        # The clip may only be in the store (older pages of a paged history)
+        store.set_meta(clip_id, fields)
+    return item
+
+def record_paste(items, clip_id, store=None):
+    """Record a paste of a clip: its last_paste time (retention keeps recently pasted clips longest) and paste count."""
+    item = find_clip(items, clip_id, store)
+    if item is None:
+        return None
+    fields = {"last_paste": time.time(), "pastes": (item.get("pastes") or 0) + 1}
+    set_meta(item, fields)
+    if store is not None:
+        store.set_meta(clip_id, fields)
+    return item
+
+def evict_clipboard_items(items, rows, dedup=None, store=None, search_index=None, clusters=None):
+    """
+    Remove the clips planned for eviction by retention.plan_eviction() from the history,
+    its indexes and the store. Clips pinned since the plan was made are kept.
+    Returns the rows actually evicted.
+    """
+    evicted = []
+    for row in rows:
+        item = items.get(row["id"])
+        if item is not None:
+            if item.get("pinned"):
+                continue
+            items.delete(row["id"])
+        evicted.append(row)
+        if dedup is not None:
+            dedup.discard_fingerprint(row["fp"])
+        if search_index is not None:
+            search_index.remove(row["id"])
+        if clusters is not None:
+            clusters.remove(row["id"])
+        if store is not None:
+            store.evict(row["id"], row["blob"], row.get("image"))
+    return evicted
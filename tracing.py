@@ -0,0 +1,138 @@
+# tracing.py
+# Quick-Clip Clipboard Popup App
+#
+# Lightweight hot-path tracing. Timing spans feed in-process latency histograms (p50/p95/p99 over
+# the most recent TRACE_WINDOW samples per span) and can be exported to a JSON-lines file.
+# When tracing is disabled a span is a single flag check, so the instrumentation can stay in place.
+# Exported spans are buffered and appended to the file by a background thread, so a span ending on
+# the GUI thread never waits on disk.
+#
+# Usage:
+#   with span("load_copies"): ...
+#   @traced("check_clipboard")
+#   def check_clipboard(...): ...
+#   record("hotkey_to_paste.win32", ms)   # for durations measured elsewhere
+#
+# Author: Tof-O
+# License: MIT
+
+import json, time, threading, functools, logging
+from collections import deque
+import settings
+
+log = logging.getLogger(__name__)
+
+enabled = settings.TRACING_ENABLED
+overlay = False  # Set by enable(with_overlay=True); settings.TRACE_OVERLAY also turns the overlay on
+_lock = threading.Lock()
+_samples = {}  # span name -> deque of recent durations (ms)
+_counts = {}   # span name -> total number of samples
+_latest = {}   # span name -> most recent duration (ms)
+_pending = []  # JSON lines not yet written to TRACE_FILE
+_write_lock = threading.Lock()  # Keeps appends to TRACE_FILE in order
+_wake = threading.Event()       # Set when _pending holds TRACE_FLUSH_EVERY lines
+_writer = None                  # The thread writing _pending out, started with the first full buffer
+
+def enable(on=True, with_overlay=False):
+    global enabled, overlay
+    enabled = on
+    overlay = with_overlay
+
+def record(name, ms):
+    """Add a duration (ms) to the histogram of span name and queue it for export."""
+    with _lock:
+        samples = _samples.get(name)
+        if samples is None:
+            samples = _samples[name] = deque(maxlen=settings.TRACE_WINDOW)
+        samples.append(ms)
+        _counts[name] = _counts.get(name, 0) + 1
+        _latest[name] = ms
+        if settings.TRACE_FILE:
+            _pending.append(json.dumps({"span": name, "ms": round(ms, 3), "ts": round(time.time(), 3),
+                                        "thread": threading.current_thread().name}))
+            if len(_pending) >= settings.TRACE_FLUSH_EVERY:
+                _start_writer_locked()
+                _wake.set()
+
+class _Span:
+    __slots__ = ("name", "start")
+    def __init__(self, name):
+        self.name = name
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name):
+    """Context manager timing its body as span name (a shared no-op while tracing is disabled)."""
+    return _Span(name) if enabled else _NO_SPAN
+
+def traced(name):
+    """Decorator timing every call of a function as span name."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorate
+
+def percentile(sorted_samples, q):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+def stats():
+    """Return {span name: {"count", "latest_ms", "p50_ms", "p95_ms", "p99_ms"}}."""
+    with _lock:
+        snapshot = {name: (sorted(samples), _counts[name], _latest[name]) for name, samples in _samples.items()}
+    return {name: {"count": count, "latest_ms": latest, "p50_ms": percentile(samples, 0.5),
+                   "p95_ms": percentile(samples, 0.95), "p99_ms": percentile(samples, 0.99)}
+            for name, (samples, count, latest) in snapshot.items()}
+
+def _start_writer_locked():
+    global _writer
+    if _writer is None:
+        _writer = threading.Thread(target=_write_loop, name="quickclip-trace", daemon=True)
+        _writer.start()
+
+def _write_loop():
+    while True:
+        _wake.wait()
+        _wake.clear()
+        flush()
+
+def flush():
+    """Write queued spans to TRACE_FILE (on the writer thread, and on app quit for the rest)."""
+    global _pending
+    with _write_lock:
+        with _lock:
+            lines, _pending = _pending, []
+        if not lines:
+            return
+        try:
+            with open(settings.TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        except Exception as e:
+            log.warning("Writing trace file failed: %s", e)
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+        _latest.clear()
+        _pending.clear()